@@ -1,17 +1,33 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import Config
 from .extensions import db, login_manager, migrate, csrf
 from .scheduler import init_scheduler
+from .cache import init_cache
+from .db_profiles import init_db
+from .cli import register_commands
+from .hashing import init_hashing
+from .metrics import init_metrics
+from .slow_queries import init_slow_query_log
+from .user_cache import init_user_cache
+from .pagination import page_url
+from .utils import DEFAULT_TIMEZONE
+from .ratelimit import init_ratelimit
+from .live_feed import init_live_feed
+from .search import include_object as search_include_object
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    if app.config["PROXY_FIX_X_FOR"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
 
     # Extensions
-    db.init_app(app)
+    init_db(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, include_object=search_include_object)
     csrf.init_app(app)
+    init_hashing(app)
 
     # Blueprints
     from .routes.auth import auth_bp
@@ -20,6 +36,7 @@ def create_app():
     from .routes.templates import templates_bp
     from .routes.wishes import wishes_bp
     from .routes.group_cards import group_cards_bp
+    from .routes.search import search_bp
     from .routes.errors import errors_bp
 
     app.register_blueprint(auth_bp)
@@ -28,11 +45,32 @@ def create_app():
     app.register_blueprint(templates_bp, url_prefix="/templates")
     app.register_blueprint(wishes_bp, url_prefix="/wishes")
     app.register_blueprint(group_cards_bp, url_prefix="/cards")
+    app.register_blueprint(search_bp, url_prefix="/search")
     app.register_blueprint(errors_bp)
 
+    app.add_template_global(page_url)
+    app.add_template_global(DEFAULT_TIMEZONE, "DEFAULT_TIMEZONE")
+
+    # Rate limits go ahead of every other before_request hook except the metrics timer
+    init_ratelimit(app)
+
+    # Request, SQL and dispatcher metrics; opt-in slow-query log
+    init_metrics(app)
+    init_slow_query_log(app)
+
+    # Fragment cache and the logged-in user cache
+    init_cache(app)
+    init_user_cache(app)
+
+    # Server-Sent Events of new card contributions
+    init_live_feed(app)
+
     # Scheduler (optional)
     init_scheduler(app)
 
+    # CLI commands
+    register_commands(app)
+
     @app.shell_context_processor
     def make_shell_context():
         from . import models
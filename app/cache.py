@@ -0,0 +1,227 @@
+"""Rendered-fragment cache with versioned keys.
+
+Every cached fragment is keyed by the current version of the scopes it depends on
+("card:12", "friend:3", "user:1", plus the global "*"). Versions live in the
+cache_versions table and are bumped by ORM flush events in the same transaction
+as the change itself, so a fragment can never be served after the data behind it
+changes, in any process. Core statements that bypass the ORM (bulk UPDATEs,
+repairs) must call `bump_versions` themselves.
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from flask import current_app, request
+from markupsafe import Markup
+from sqlalchemy import event, inspect, select
+from werkzeug.utils import import_string
+
+from .counters import increment
+from .extensions import db
+from .models import CacheVersion, CardContribution, Friend, GroupCard, Wish
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+class LRUCache:
+    """Thread-safe in-process LRU with per-entry TTL and entry/byte limits."""
+
+    def __init__(self, max_entries=1024, max_bytes=None, default_ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            expires_at, _, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        size = sys.getsizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes and size > self.max_bytes:
+                return
+            self._data[key] = (time.monotonic() + ttl if ttl else None, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+class RedisCache:
+    """Shared backend so all workers reuse one another's fragments.
+
+    Eviction is left to Redis (configure `maxmemory-policy allkeys-lru`), so only
+    hits and misses are counted here.
+    """
+
+    def __init__(self, url, default_ttl=None, prefix="bwh:fragment:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("FRAGMENT_CACHE_BACKEND=redis needs the `redis` package installed") from e
+        self._client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key, default=None):
+        value = self._client.get(self.prefix + key)
+        if value is None:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return value.decode()
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._client.set(self.prefix + key, value, ex=ttl or None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+class NullCache:
+    """Disables caching (every lookup misses) while keeping the same interface."""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key, default=None):
+        self.stats.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+BACKENDS = {
+    "memory": lambda config: LRUCache(
+        config["FRAGMENT_CACHE_MAX_ENTRIES"], config["FRAGMENT_CACHE_MAX_BYTES"], config["FRAGMENT_CACHE_TTL"],
+    ),
+    "redis": lambda config: RedisCache(config["FRAGMENT_CACHE_REDIS_URL"], config["FRAGMENT_CACHE_TTL"]),
+    "null": lambda config: NullCache(),
+}
+
+def init_cache(app):
+    """Build the FRAGMENT_CACHE_BACKEND (a BACKENDS key or an import path to a factory)."""
+    backend = app.config["FRAGMENT_CACHE_BACKEND"]
+    factory = BACKENDS.get(backend) or import_string(backend)
+    app.extensions["fragment_cache"] = factory(app.config)
+
+def get_cache():
+    return current_app.extensions["fragment_cache"]
+
+def bump_versions(names, connection=None):
+    """Invalidate every fragment that depends on any of the scope `names`."""
+    table = CacheVersion.__table__
+    for name in sorted(set(names)):
+        increment(table, {"name": name}, "version", connection=connection)
+
+def current_versions(names):
+    rows = db.session.execute(
+        select(CacheVersion.name, CacheVersion.version).where(CacheVersion.name.in_(names))
+    ).all()
+    found = dict(rows)
+    return [found.get(name, 0) for name in names]
+
+def cached_fragment(name, scopes, render, *parts, ttl=None):
+    """HTML from `render()`, reused until any of `scopes` changes.
+
+    The key also covers the request path and query string (cursors) and any extra
+    `parts` the fragment depends on, such as the current date.
+    """
+    scopes = ["*", *scopes]
+    versions = current_versions(scopes)
+    digest = hashlib.sha1("|".join(map(str, (request.full_path, *parts))).encode()).hexdigest()
+    key = f"{name}:{','.join(f'{s}={v}' for s, v in zip(scopes, versions))}:{digest}"
+
+    cache = get_cache()
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, ttl)
+    return Markup(html)
+
+def _values(target, attr):
+    """Current and, after an update, previous value of a foreign key attribute."""
+    history = inspect(target).attrs[attr].history
+    return {v for v in (*history.unchanged, *history.added, *history.deleted) if v is not None}
+
+def _scopes_for(connection, target):
+    if isinstance(target, CardContribution):
+        card_ids = _values(target, "card_id")
+        friend_ids = connection.execute(
+            select(GroupCard.friend_id).where(GroupCard.id.in_(card_ids))
+        ).scalars().all()
+        return [*(f"card:{i}" for i in card_ids), *(f"friend:{i}" for i in friend_ids)]
+    scopes = [f"user:{i}" for i in _values(target, "user_id")]
+    if isinstance(target, GroupCard):
+        scopes.append(f"card:{target.id}")
+    if isinstance(target, Friend):
+        scopes.append(f"friend:{target.id}")
+    else:
+        scopes.extend(f"friend:{i}" for i in _values(target, "friend_id"))
+    return scopes
+
+def _bump_on_change(mapper, connection, target):
+    bump_versions(_scopes_for(connection, target), connection=connection)
+
+for _model in (CardContribution, Wish, GroupCard, Friend):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _bump_on_change)
@@ -0,0 +1,109 @@
+"""Per-user iCalendar feed of friends' birthdays.
+
+Calendar apps poll subscriptions every few minutes, so the rendered feed is
+kept in the fragment cache. Each poll still resolves its token against the
+database, in one indexed query that also reads the user's "user:<id>" cache
+version (see app/cache.py). A rotated token therefore stops working at once in
+every worker, and the feed is cached under that version, so any friend change
+is picked up by every worker too. Each birthday is one yearly recurring all-day
+event, so the body only changes when a friend does.
+"""
+import hashlib
+
+from flask import current_app
+from sqlalchemy import String, cast, literal, select
+
+from .cache import get_cache
+from .extensions import db
+from .models import CacheVersion, Friend, User
+from .utils import generate_token
+
+FEED_KEY = "ics:user:{}:v{}"
+PRODID = "-//Birthday Wishes Hub//Birthdays//EN"
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    pieces, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't cut a UTF-8 sequence in half
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        pieces.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(pieces)
+
+def _event(friend):
+    if (friend.birth_date.month, friend.birth_date.day) == (2, 29):
+        # Last day of February: the 29th in leap years, the 28th otherwise (see observed_birthday)
+        rule = "FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=-1"
+    else:
+        rule = "FREQ=YEARLY"
+    return [
+        "BEGIN:VEVENT",
+        f"UID:friend-{friend.id}-birthday@birthday-wishes-hub",
+        f"DTSTAMP:{friend.updated_at:%Y%m%dT%H%M%SZ}",
+        f"DTSTART;VALUE=DATE:{friend.birth_date:%Y%m%d}",
+        f"RRULE:{rule}",
+        f"SUMMARY:{_escape(f'🎂 {friend.full_name}’s birthday')}",
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    ]
+
+def render_feed(user_id) -> str:
+    friends = db.session.execute(
+        select(Friend.id, Friend.full_name, Friend.birth_date, Friend.updated_at)
+        .where(Friend.user_id == user_id)
+        .order_by(Friend.birthday_ordinal, Friend.id)
+    ).all()
+    refresh = f"PT{max(current_app.config['CALENDAR_FEED_CACHE_SECONDS'] // 60, 15)}M"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape('Friends’ birthdays')}",
+        # Polling hints (never under 15 minutes); clients that honour them ask less often
+        f"REFRESH-INTERVAL;VALUE=DURATION:{refresh}",
+        f"X-PUBLISHED-TTL:{refresh}",
+    ]
+    for friend in friends:
+        lines.extend(_event(friend))
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+def get_feed(token):
+    """(etag, body) of the feed behind `token`, or None if no user has it."""
+    version_name = literal("user:").concat(cast(User.id, String))
+    row = db.session.execute(
+        select(User.id, CacheVersion.version)
+        .outerjoin(CacheVersion, CacheVersion.name == version_name)
+        .where(User.calendar_token == token)
+    ).first()
+    if row is None:
+        return None
+    user_id, version = row
+
+    cache = get_cache()
+    key = FEED_KEY.format(user_id, version or 0)
+    cached = cache.get(key)
+    if cached is not None:
+        etag, _, body = cached.partition("\n")
+        return etag, body
+
+    body = render_feed(user_id)
+    etag = hashlib.sha1(body.encode()).hexdigest()
+    cache.set(key, f"{etag}\n{body}", current_app.config["CALENDAR_FEED_CACHE_SECONDS"])
+    return etag, body
+
+def rotate_token(user):
+    """Give `user` a new feed token, retiring the old one; caller commits."""
+    user.calendar_token = generate_token(24)
+    return user.calendar_token
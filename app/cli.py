@@ -0,0 +1,155 @@
+import click
+from flask import current_app
+
+from .db_profiles import use_maintenance_settings
+from .extensions import db
+
+def register_commands(app):
+    app.cli.add_command(dispatch_worker)
+    app.cli.add_command(cards_cli)
+    app.cli.add_command(friends_cli)
+    app.cli.add_command(slow_queries_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(seed_command)
+
+@click.command("dispatch-worker")
+def dispatch_worker():
+    """Run the due-wish dispatcher as a standalone process."""
+    from .scheduler import run_dispatch_worker
+    run_dispatch_worker(current_app._get_current_object())
+
+@click.group("cards")
+def cards_cli():
+    """Group card maintenance."""
+
+@cards_cli.command("repair-counters")
+@click.option("--card-id", "card_ids", type=int, multiple=True, help="Only repair these cards (repeatable).")
+def repair_counters(card_ids):
+    """Recompute contribution and reaction counters from the contribution rows."""
+    from .counters import repair_card_counters
+    use_maintenance_settings(db.engine)
+    result = repair_card_counters(list(card_ids) or None)
+    click.echo(
+        f"Repaired counters; {result.totals} card(s) had a drifted total, "
+        f"{result.reactions} card(s) had drifted reaction tallies."
+    )
+
+@click.group("friends")
+def friends_cli():
+    """Friend list maintenance."""
+
+@friends_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user", "email", required=True, help="Email of the account to import into.")
+@click.option("--format", "fmt", type=click.Choice(["csv", "vcard"]), help="Defaults to the file extension.")
+@click.option("--chunk-size", type=int, help="Rows per transaction (FRIEND_IMPORT_CHUNK_SIZE).")
+def import_friends_command(path, email, fmt, chunk_size):
+    """Import friends from a CSV or vCard file, skipping ones already present."""
+    from .friend_io import detect_format, import_friends
+    from .models import User
+
+    use_maintenance_settings(db.engine)
+    user = User.query.filter_by(email=email.strip().lower()).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}")
+
+    def progress(result):
+        click.echo(f"\r{result.processed:>10,} rows  {result.imported:>10,} imported  "
+                   f"{result.duplicates:>8,} duplicates  {result.invalid:>8,} invalid", nl=False)
+
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        result = import_friends(user.id, f, fmt or detect_format(path), chunk_size, progress)
+    click.echo()
+    for line, message in result.errors:
+        click.echo(f"row {line}: {message}", err=True)
+    if result.invalid > len(result.errors):
+        click.echo(f"... and {result.invalid - len(result.errors)} more invalid rows", err=True)
+    click.echo(f"Imported {result.imported:,} friend(s) for {user.email}.")
+
+@click.group("search")
+def search_cli():
+    """Full-text search index maintenance."""
+
+@search_cli.command("rebuild")
+def rebuild_search():
+    """Recreate the search index and its triggers, then reindex every document."""
+    from .search import rebuild
+
+    use_maintenance_settings(db.engine)
+    counts = rebuild(progress=lambda kind, n: click.echo(f"{kind:>13}: {n:,} indexed"))
+    click.echo(f"Rebuilt the search index with {sum(counts.values()):,} documents.")
+
+@click.group("slow-queries")
+def slow_queries_cli():
+    """Inspect the slow-query log (SLOW_QUERY_LOG)."""
+
+@slow_queries_cli.command("summarize")
+@click.option("--path", help="Configured log path (every process's file is read); defaults to SLOW_QUERY_LOG_PATH or instance/slow_queries.log.")
+@click.option("--top", type=int, default=10, show_default=True)
+@click.option("--hours", type=float, help="Only entries from the last N hours.")
+@click.option("--plans", is_flag=True, help="Print the captured query plan of each shape.")
+def summarize_slow_queries(path, top, hours, plans):
+    """Rank statement shapes by total time spent."""
+    import os
+    from datetime import datetime, timedelta
+    from .slow_queries import read_entries, summarize
+
+    path = path or current_app.config["SLOW_QUERY_LOG_PATH"] or os.path.join(current_app.instance_path, "slow_queries.log")
+    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat() if hours else None
+    shapes = summarize(read_entries(path), since)
+    if not shapes:
+        click.echo(f"No slow queries logged in {path}.")
+        return
+
+    click.echo(f"{'shape':<12} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}  top endpoint / origin")
+    for shape in shapes[:top]:
+        endpoint, _ = shape["endpoints"].most_common(1)[0]
+        origin, _ = shape["origins"].most_common(1)[0]
+        click.echo(
+            f"{shape['fingerprint']:<12} {shape['count']:>7,} {shape['total_ms']:>10,.0f} "
+            f"{shape['total_ms'] / shape['count']:>9,.1f} {shape['max_ms']:>9,.1f}  {endpoint} / {origin}"
+        )
+        click.echo(f"    {shape['shape'][:200]}")
+        if plans and shape.get("plan"):
+            for line in shape["plan"]:
+                click.echo(f"      {line}")
+
+@click.command("seed")
+@click.option("--demo", is_flag=True, help="Create the small demo account instead of bulk data.")
+@click.option("--users", type=int, default=10, show_default=True)
+@click.option("--friends-per-user", type=int, default=50, show_default=True)
+@click.option("--wishes-per-user", type=int, default=100, show_default=True)
+@click.option("--templates-per-user", type=int, default=3, show_default=True)
+@click.option("--cards-per-user", type=int, default=5, show_default=True)
+@click.option("--contributions-per-card", type=int, default=20, show_default=True, help="Average for ordinary cards.")
+@click.option("--sent-ratio", type=float, default=0.8, show_default=True, help="Share of wishes already delivered.")
+@click.option("--viral-ratio", type=float, default=0.02, show_default=True, help="Share of cards that go viral.")
+@click.option("--viral-multiplier", type=int, default=50, show_default=True)
+@click.option("--seed", "seed_value", type=int, default=42, show_default=True, help="Same seed, same data.")
+@click.option("--batch-size", type=int, default=5000, show_default=True)
+@click.option("--fast", is_flag=True, help="SQLite fast-load pragmas (synchronous=OFF) for the load, then ANALYZE.")
+def seed_command(demo, seed_value, fast, **counts):
+    """Generate seed data in bulk (or the demo account with --demo)."""
+    from .seeding import SEED_PASSWORD, SeedSpec, seed, seed_demo
+
+    use_maintenance_settings(db.engine)
+    if demo:
+        if seed_demo():
+            click.echo("Demo account created: demo@bwh.local / password123")
+        else:
+            click.echo("Demo data already exists.")
+        return
+
+    current = []
+
+    def progress(table, rows, elapsed):
+        if current and current[-1] != table:
+            click.echo()
+        current.append(table)
+        click.echo(f"\r{table:<20} {rows:>10,} rows  {rows / elapsed if elapsed else 0:>10,.0f} rows/s", nl=False)
+
+    spec = SeedSpec(seed=seed_value, **counts)
+    written = seed(spec, fast=fast, progress=progress)
+    click.echo()
+    click.echo(", ".join(f"{table}: {rows:,}" for table, rows in written.items()))
+    click.echo(f"Seeded users log in as seed-user-<id>@example.com / {SEED_PASSWORD}")
@@ -7,4 +7,127 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine tuning (see app/db_profiles.py): auto, default, sqlite or postgres
+    DB_PROFILE = os.getenv("DB_PROFILE", "auto")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    # Per worker process: 3 gunicorn workers x (5 + 10) stays well under Postgres' default 100
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", "60000"))
+    # Rows per page on list views (keyset-paginated, see app/pagination.py)
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+    # Largest accepted request body, which bounds friend import uploads
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024)))
+    # Rows validated and committed per transaction by friend imports (see app/friend_io.py)
+    FRIEND_IMPORT_CHUNK_SIZE = int(os.getenv("FRIEND_IMPORT_CHUNK_SIZE", "500"))
+    # s-maxage for public share/reveal pages; always cut short at the friend's local midnight
+    PUBLIC_CACHE_SECONDS = int(os.getenv("PUBLIC_CACHE_SECONDS", "60"))
+
+    # Group-commit public contributions (see app/write_buffer.py)
+    CONTRIBUTION_WRITE_BUFFER = os.getenv("CONTRIBUTION_WRITE_BUFFER", "false").lower() == "true"
+    CONTRIBUTION_BUFFER_WINDOW_MS = int(os.getenv("CONTRIBUTION_BUFFER_WINDOW_MS", "5"))
+    CONTRIBUTION_BUFFER_MAX_BATCH = int(os.getenv("CONTRIBUTION_BUFFER_MAX_BATCH", "200"))
+    # How long a poster waits for the batch holding their contribution to commit
+    CONTRIBUTION_BUFFER_TIMEOUT = int(os.getenv("CONTRIBUTION_BUFFER_TIMEOUT", "10"))
+
+    # Password hashing (see app/hashing.py): any Werkzeug method; older hashes upgrade on login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    # Hashing processes per app process; 0 hashes inline on the request thread
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    # Hashes queued or running per app process before logins get a fast 503
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "8"))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))
+
+    # Token-bucket limits checked before any database work (see app/ratelimit.py).
+    # Storage "memory" is per process, "sqlite" shares buckets between workers on one host,
+    # or an import path to a store factory taking the app
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory")
+    # Defaults to instance/ratelimit.db; keep it on local disk, not a network share
+    RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH")
+    RATE_LIMITS = os.getenv(
+        "RATE_LIMITS",
+        "auth.login=10/minute burst=20, auth.register=5/minute burst=10,"
+        " group_cards.public_card=60/minute burst=30, group_cards.public_card:slug=600/minute burst=200,"
+        " wishes.public_reveal=60/minute burst=30, wishes.public_reveal:token=300/minute burst=100,"
+        " group_cards.card_events=20/minute burst=10",
+    )
+    # Proxies in front of the app that append to X-Forwarded-For (1 behind Nginx); 0 trusts none
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", "0"))
+
+    # Live contribution feed on public cards (see app/live_feed.py); needs gevent workers in production
+    LIVE_FEED_ENABLED = os.getenv("LIVE_FEED_ENABLED", "true").lower() == "true"
+    # How often each worker checks its listened-to cards for rows other workers wrote
+    LIVE_FEED_POLL_SECONDS = float(os.getenv("LIVE_FEED_POLL_SECONDS", "2"))
+    # Recent events kept per card; a listener further behind than this is told to reload
+    LIVE_FEED_BUFFER = int(os.getenv("LIVE_FEED_BUFFER", "200"))
+    LIVE_FEED_MAX_CONNECTIONS = int(os.getenv("LIVE_FEED_MAX_CONNECTIONS", "5000"))
+    LIVE_FEED_HEARTBEAT_SECONDS = int(os.getenv("LIVE_FEED_HEARTBEAT_SECONDS", "15"))
+    # Streams end after this and the browser reconnects from its last event
+    LIVE_FEED_MAX_SECONDS = int(os.getenv("LIVE_FEED_MAX_SECONDS", "300"))
+    LIVE_FEED_RETRY_MS = int(os.getenv("LIVE_FEED_RETRY_MS", "3000"))
+
+    # Logged-in user snapshots kept per worker (see app/user_cache.py)
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    # Sessions from before password-versioned ids are honoured (and upgraded) until this
+    # UTC date, a month after they shipped; empty signs every one of them out
+    LEGACY_SESSION_IDS_UNTIL = os.getenv("LEGACY_SESSION_IDS_UNTIL", "2026-11-17")
+
+    # How long a rendered birthday calendar feed is reused (also the refresh hint sent to clients)
+    CALENDAR_FEED_CACHE_SECONDS = int(os.getenv("CALENDAR_FEED_CACHE_SECONDS", "900"))
+
+    # Rendered-fragment cache: "memory" (per process), "redis" (shared), "null" or an import path
+    FRAGMENT_CACHE_BACKEND = os.getenv("FRAGMENT_CACHE_BACKEND", "memory")
+    FRAGMENT_CACHE_REDIS_URL = os.getenv("FRAGMENT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    FRAGMENT_CACHE_TTL = int(os.getenv("FRAGMENT_CACHE_TTL", "300"))
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "2048"))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    # Prometheus metrics at /metrics (see app/metrics.py): localhost-only unless METRICS_TOKEN is set,
+    # then open to any scraper sending it as a bearer token
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Slow-query log (see app/slow_queries.py); defaults to instance/slow_queries.log
+    SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "false").lower() == "true"
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+    SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH")
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
     SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    # Safety-net poll; scheduled wishes normally wake the dispatcher directly
+    SCHEDULER_POLL_SECONDS = int(os.getenv("SCHEDULER_POLL_SECONDS", "300"))
+    # Upper bound on one dispatch tick; a crashed dispatcher's lease frees up after this
+    SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "90"))
+    # Due wishes claimed per transaction by process_due_wishes
+    SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
+
+    # Links in delivered wishes point here
+    PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://127.0.0.1:5000")
+
+    # Delivery: "console" logs messages, "smtp" sends them, or an import path to a Sender class
+    MAIL_BACKEND = os.getenv("MAIL_BACKEND", "console")
+    MAIL_SENDER_NAME = os.getenv("MAIL_SENDER_NAME", "Birthday Wishes")
+    MAIL_SENDER_EMAIL = os.getenv("MAIL_SENDER_EMAIL", "no-reply@example.com")
+    SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_USER = os.getenv("SMTP_USER")
+    SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+    SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+    SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", "30"))
+
+    DELIVERY_CONCURRENCY = int(os.getenv("DELIVERY_CONCURRENCY", "10"))
+    DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "200"))
+    DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "8"))
+    DELIVERY_BACKOFF_SECONDS = int(os.getenv("DELIVERY_BACKOFF_SECONDS", "30"))
+    DELIVERY_BACKOFF_MAX_SECONDS = int(os.getenv("DELIVERY_BACKOFF_MAX_SECONDS", "3600"))
+    # How long a claimed message may stay "sending" before another worker retries it
+    DELIVERY_CLAIM_SECONDS = int(os.getenv("DELIVERY_CLAIM_SECONDS", "300"))
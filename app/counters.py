@@ -0,0 +1,105 @@
+"""Denormalized counters on GroupCard, kept in step with CardContribution rows.
+
+Counters are bumped with `UPDATE ... SET n = n + 1` (or an upsert for per-emoji
+rows) inside the same transaction as the contribution insert, so concurrent
+posters never lose an increment. `repair_card_counters` recomputes them from
+the source rows if they ever drift.
+"""
+from dataclasses import dataclass
+
+from sqlalchemy import delete, func, insert, select, union, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .extensions import db
+from .live_feed import mark_new_contributions
+from .models import CardContribution, CardReactionCount, GroupCard
+
+_UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+def increment(table, key: dict, column: str, by: int = 1, connection=None):
+    """Atomically add `by` to `column` of the row identified by `key`, creating it if missing.
+
+    Runs on the session by default; pass `connection` from inside flush events.
+    """
+    executor = connection if connection is not None else db.session
+    dialect = connection.dialect if connection is not None else db.session.get_bind().dialect
+    dialect_insert = _UPSERT_DIALECTS.get(dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**key, **{column: by})
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_={column: table.c[column] + by})
+        executor.execute(stmt)
+        return
+
+    # Portable fallback: most calls hit an existing row, so try the UPDATE first
+    criteria = [table.c[name] == value for name, value in key.items()]
+    result = executor.execute(update(table).where(*criteria).values({column: table.c[column] + by}))
+    if not result.rowcount:
+        executor.execute(insert(table).values(**key, **{column: by}))
+
+def record_contributions(card_id: int, total: int, reactions: dict):
+    """Bump a card's counters for `total` new contributions; `reactions` maps emoji -> count."""
+    db.session.execute(
+        update(GroupCard)
+        .where(GroupCard.id == card_id)
+        .values(contributions_count=GroupCard.contributions_count + total)
+        .execution_options(synchronize_session=False)
+    )
+    for reaction, count in reactions.items():
+        increment(CardReactionCount.__table__, {"card_id": card_id, "reaction": reaction}, "count", count)
+    # Every insert path comes through here; wake this process's live listeners at commit
+    mark_new_contributions(card_id)
+
+@dataclass
+class RepairResult:
+    """Cards whose counters `repair_card_counters` had to fix, by kind of drift."""
+    totals: int = 0
+    reactions: int = 0
+
+def repair_card_counters(card_ids=None) -> RepairResult:
+    """Recompute counters from CardContribution rows, counting the cards that had drifted."""
+    result = RepairResult()
+    actual = (
+        select(func.count(CardContribution.id))
+        .where(CardContribution.card_id == GroupCard.id)
+        .correlate(GroupCard)
+        .scalar_subquery()
+    )
+    stmt = update(GroupCard).where(GroupCard.contributions_count != actual)
+    if card_ids is not None:
+        stmt = stmt.where(GroupCard.id.in_(card_ids))
+    result.totals = db.session.execute(
+        stmt.values(contributions_count=actual).execution_options(synchronize_session=False)
+    ).rowcount
+
+    reactions = CardReactionCount.__table__
+    tallies = (
+        select(CardContribution.card_id, CardContribution.reaction, func.count(CardContribution.id))
+        .where(CardContribution.reaction.isnot(None))
+        .group_by(CardContribution.card_id, CardContribution.reaction)
+    )
+    stored = select(reactions.c.card_id, reactions.c.reaction, reactions.c["count"])
+    if card_ids is not None:
+        tallies = tallies.where(CardContribution.card_id.in_(card_ids))
+        stored = stored.where(reactions.c.card_id.in_(card_ids))
+    # A card has drifted if any (reaction, count) row is missing, extra or different
+    missing, extra = tallies.except_(stored).subquery(), stored.except_(tallies).subquery()
+    drifted_ids = db.session.execute(
+        union(select(missing.c.card_id), select(extra.c.card_id))
+    ).scalars().all()
+    result.reactions = len(drifted_ids)
+    if drifted_ids:
+        db.session.execute(delete(reactions).where(reactions.c.card_id.in_(drifted_ids)))
+        db.session.execute(insert(reactions).from_select(
+            ["card_id", "reaction", "count"], tallies.where(CardContribution.card_id.in_(drifted_ids)),
+        ))
+
+    # These Core statements bypass the ORM events that version cached fragments;
+    # repairs are rare, so just invalidate everything
+    from .cache import bump_versions
+    if result.totals or result.reactions:
+        bump_versions(["*"])
+    db.session.commit()
+    return result
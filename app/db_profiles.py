@@ -0,0 +1,125 @@
+"""Named database engine profiles.
+
+DB_PROFILE picks one of PROFILES ("auto", the default, chooses by the
+DATABASE_URL dialect). A profile is the engine options passed to
+create_engine plus statements run on every new DBAPI connection, which is the
+only place SQLite pragmas and Postgres session settings reliably stick.
+"""
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from .extensions import db
+
+@dataclass(frozen=True)
+class EngineProfile:
+    name: str
+    engine_options: dict = field(default_factory=dict)
+    # Run once per new DBAPI connection, in order
+    on_connect: tuple = ()
+
+    def install(self, engine):
+        if not self.on_connect:
+            return
+
+        @event.listens_for(engine, "connect")
+        def _apply_session_settings(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in self.on_connect:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+            # psycopg2 opens a transaction for the SETs; don't leave it pending
+            if engine.dialect.name != "sqlite":
+                dbapi_connection.commit()
+
+def sqlite_profile(config):
+    return EngineProfile(
+        name="sqlite",
+        on_connect=(
+            # WAL lets readers run alongside the single writer instead of blocking on it
+            "PRAGMA journal_mode=WAL",
+            f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+            # Durable at checkpoints; a power loss can only drop the last commits, never corrupt
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']}",
+            # Negative means KiB rather than pages
+            f"PRAGMA cache_size=-{config['SQLITE_CACHE_SIZE_KB']}",
+            "PRAGMA temp_store=MEMORY",
+        ),
+    )
+
+def postgres_profile(config):
+    return EngineProfile(
+        name="postgres",
+        engine_options=dict(
+            pool_size=config["DB_POOL_SIZE"],
+            max_overflow=config["DB_MAX_OVERFLOW"],
+            pool_timeout=config["DB_POOL_TIMEOUT"],
+            # Connections dropped by a restart or a proxy idle timeout are replaced, not handed out
+            pool_pre_ping=True,
+            pool_recycle=config["DB_POOL_RECYCLE"],
+        ),
+        on_connect=(
+            f"SET statement_timeout = {config['DB_STATEMENT_TIMEOUT_MS']}",
+            f"SET idle_in_transaction_session_timeout = {config['DB_IDLE_IN_TRANSACTION_TIMEOUT_MS']}",
+        ),
+    )
+
+# The timeouts above are sized for web requests
+_MAINTENANCE_SETTINGS = (
+    "SET statement_timeout = 0",
+    "SET idle_in_transaction_session_timeout = 0",
+)
+
+def _lift_session_timeouts(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for statement in _MAINTENANCE_SETTINGS:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+    dbapi_connection.commit()
+
+def use_maintenance_settings(engine):
+    """Open this process's connections without the request timeouts from now on.
+
+    For migrations and maintenance commands (imports, seeding, index rebuilds),
+    whose statements and transactions may rightly run for minutes.
+    """
+    if engine.dialect.name != "postgresql" or event.contains(engine, "connect", _lift_session_timeouts):
+        return
+    # Registered after the profile's listener, so it runs last and wins
+    event.listen(engine, "connect", _lift_session_timeouts)
+    # Connections opened so far still carry the request timeouts
+    engine.dispose()
+
+PROFILES = {
+    # Driver defaults, as before profiles existed
+    "default": lambda config: EngineProfile(name="default"),
+    "sqlite": sqlite_profile,
+    "postgres": postgres_profile,
+}
+
+def select_profile(config) -> EngineProfile:
+    name = config["DB_PROFILE"]
+    if name == "auto":
+        backend = make_url(config["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+        name = {"sqlite": "sqlite", "postgresql": "postgres"}.get(backend, "default")
+    try:
+        return PROFILES[name](config)
+    except KeyError:
+        raise RuntimeError(f"Unknown DB_PROFILE {name!r}; choose one of: auto, {', '.join(PROFILES)}") from None
+
+def init_db(app):
+    """Initialise Flask-SQLAlchemy with the configured engine profile."""
+    profile = select_profile(app.config)
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS still win over the profile's
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**profile.engine_options, **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+    app.extensions["db_profile"] = profile
+    db.init_app(app)
+    with app.app_context():
+        profile.install(db.engine)
+    return profile
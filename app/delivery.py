@@ -0,0 +1,325 @@
+"""Outbox-based delivery of sent wishes.
+
+`enqueue_wishes` writes one outbox row per claimed wish inside the dispatcher's
+transaction. `deliver_pending` later claims due rows, hands them to the configured
+`Sender` concurrently and records the outcome: delivered, retried with exponential
+backoff, or dead-lettered once attempts run out.
+"""
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from flask import current_app
+from sqlalchemy import bindparam, update
+from werkzeug.utils import import_string
+
+from .extensions import db
+from .metrics import observe_job
+from .models import Friend, OutboxMessage, User, Wish
+
+class DeliveryError(Exception):
+    """A send failed. `permanent` failures are dead-lettered without retrying."""
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+class Sender:
+    """Delivery backend interface. Must be safe to call `send` from several threads."""
+
+    def send(self, message: OutboxMessage):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class ConsoleSender(Sender):
+    """Development backend: logs each message instead of sending it."""
+
+    def __init__(self, app):
+        self.logger = app.logger
+
+    def send(self, message):
+        self.logger.info("Deliver to %s: %s\n%s", message.recipient, message.subject, message.body)
+
+class SMTPSender(Sender):
+    """SMTP backend keeping a small pool of authenticated connections for reuse."""
+
+    def __init__(self, app):
+        config = app.config
+        self.host = config["SMTP_HOST"]
+        self.port = config["SMTP_PORT"]
+        self.user = config.get("SMTP_USER")
+        self.password = config.get("SMTP_PASSWORD")
+        self.use_tls = config["SMTP_USE_TLS"]
+        self.timeout = config["SMTP_TIMEOUT"]
+        self.from_addr = formataddr((config["MAIL_SENDER_NAME"], config["MAIL_SENDER_EMAIL"]))
+        self._idle = queue.LifoQueue(maxsize=config["DELIVERY_CONCURRENCY"])
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            conn.starttls()
+        if self.user:
+            conn.login(self.user, self.password)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._quit(conn)
+
+    @staticmethod
+    def _quit(conn):
+        try:
+            conn.quit()
+        except smtplib.SMTPException:
+            conn.close()
+        except OSError:
+            pass
+
+    def send(self, message):
+        email = EmailMessage()
+        email["From"] = self.from_addr
+        email["To"] = message.recipient
+        email["Subject"] = message.subject
+        email.set_content(message.body)
+
+        # A pooled connection may have been dropped by the server while idle;
+        # retry once on a fresh one before treating it as a delivery failure.
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.send_message(email)
+            except smtplib.SMTPServerDisconnected as e:
+                conn.close()
+                if attempt:
+                    raise DeliveryError(str(e)) from e
+                continue
+            except smtplib.SMTPResponseException as e:
+                self._release(conn)
+                raise DeliveryError(f"{e.smtp_code} {e.smtp_error!r}", permanent=500 <= e.smtp_code < 600) from e
+            except smtplib.SMTPRecipientsRefused as e:
+                self._release(conn)
+                raise DeliveryError(f"recipient refused: {e.recipients!r}", permanent=True) from e
+            except (smtplib.SMTPException, OSError) as e:
+                conn.close()
+                raise DeliveryError(str(e)) from e
+            self._release(conn)
+            return
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+SENDERS = {
+    "console": ConsoleSender,
+    "smtp": SMTPSender,
+}
+
+_sender_lock = threading.Lock()
+
+def get_sender(app=None) -> Sender:
+    """Process-wide sender for MAIL_BACKEND (a SENDERS key or an import path)."""
+    app = app or current_app._get_current_object()
+    with _sender_lock:
+        sender = app.extensions.get("wish_sender")
+        if sender is None:
+            backend = app.config["MAIL_BACKEND"]
+            cls = SENDERS.get(backend) or import_string(backend)
+            sender = app.extensions["wish_sender"] = cls(app)
+        return sender
+
+def compose_wish_message(row, base_url):
+    """Subject and body for one claimed wish row (see enqueue_wishes)."""
+    reveal_url = f"{base_url.rstrip('/')}/wishes/reveal/{row.reveal_token}"
+    if row.friend_email:
+        subject = f"{row.owner_name} sent you a birthday wish: {row.title}"
+        greeting = f"Hi {row.friend_name},"
+    else:
+        # No address for the friend: remind the owner to pass it on themselves
+        subject = f"Your wish for {row.friend_name} is ready: {row.title}"
+        greeting = f"Hi {row.owner_name}, it's time to send this to {row.friend_name}."
+
+    if row.is_time_capsule:
+        content = "This one is a time capsule and unlocks on the birthday."
+    else:
+        content = row.body
+    return subject, f"{greeting}\n\n{content}\n\nOpen it here: {reveal_url}\n"
+
+def enqueue_wishes(wish_ids, sent_at):
+    """Write outbox rows for wishes this dispatcher just claimed; caller commits.
+
+    Must run in the claiming transaction: matching on the exact `sent_at` we set
+    selects only the rows our UPDATE took, not ones another dispatcher claimed.
+    """
+    rows = (
+        db.session.query(
+            Wish.id, Wish.title, Wish.body, Wish.is_time_capsule, Wish.reveal_token,
+            Friend.full_name.label("friend_name"), Friend.email.label("friend_email"),
+            User.name.label("owner_name"), User.email.label("owner_email"),
+        )
+        .join(Friend, Friend.id == Wish.friend_id)
+        .join(User, User.id == Wish.user_id)
+        .filter(Wish.id.in_(wish_ids), Wish.sent_at == sent_at)
+        .all()
+    )
+    if not rows:
+        return 0
+
+    base_url = current_app.config["PUBLIC_BASE_URL"]
+    messages = []
+    for row in rows:
+        subject, body = compose_wish_message(row, base_url)
+        messages.append(dict(
+            wish_id=row.id,
+            recipient=row.friend_email or row.owner_email,
+            subject=subject[:200],
+            body=body,
+            status=OutboxMessage.PENDING,
+            attempts=0,
+            next_attempt_at=sent_at,
+        ))
+    db.session.execute(OutboxMessage.__table__.insert(), messages)
+    return len(messages)
+
+def backoff_delay(attempts, base, cap):
+    """Exponential backoff with jitter: uniform in [base, min(cap, base * 2**(attempts-1))]."""
+    ceiling = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return random.uniform(min(base, ceiling), ceiling)
+
+@dataclass
+class DeliveryStats:
+    claimed: int = 0
+    delivered: int = 0
+    retried: int = 0
+    dead: int = 0
+    elapsed: float = 0.0
+
+def deliver_pending(batch_size=None):
+    """Claim one batch of due outbox rows, send them concurrently and record outcomes."""
+    config = current_app.config
+    batch_size = batch_size or config["DELIVERY_BATCH_SIZE"]
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    stats = DeliveryStats()
+
+    # Claim: a sending row whose claim expired (worker died mid-send) is fair game again
+    ids = [
+        row.id for row in db.session.query(OutboxMessage.id).filter(
+            OutboxMessage.status.in_([OutboxMessage.PENDING, OutboxMessage.SENDING]),
+            OutboxMessage.next_attempt_at <= now,
+        ).order_by(OutboxMessage.next_attempt_at.asc()).limit(batch_size).with_for_update(skip_locked=True)
+    ]
+    if not ids:
+        db.session.rollback()
+        return stats
+
+    # Repeating the due check makes the UPDATE the real claim: where FOR UPDATE is a
+    # no-op (SQLite) another worker may have claimed some of these rows since the
+    # SELECT, and those no longer match. Only the ids it returns are ours to send.
+    claim_until = now + timedelta(seconds=config["DELIVERY_CLAIM_SECONDS"])
+    ids = db.session.execute(
+        update(OutboxMessage)
+        .where(
+            OutboxMessage.id.in_(ids),
+            OutboxMessage.status.in_([OutboxMessage.PENDING, OutboxMessage.SENDING]),
+            OutboxMessage.next_attempt_at <= now,
+        )
+        .values(status=OutboxMessage.SENDING, next_attempt_at=claim_until, attempts=OutboxMessage.attempts + 1)
+        .returning(OutboxMessage.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    if not ids:
+        return stats
+
+    # Detach so sender threads only ever read plain loaded attributes
+    messages = OutboxMessage.query.filter(OutboxMessage.id.in_(ids)).all()
+    for message in messages:
+        db.session.expunge(message)
+    stats.claimed = len(messages)
+
+    sender = get_sender()
+
+    def _send(message):
+        try:
+            sender.send(message)
+            return message, None
+        except DeliveryError as e:
+            return message, e
+        except Exception as e:
+            return message, DeliveryError(repr(e))
+
+    with ThreadPoolExecutor(max_workers=config["DELIVERY_CONCURRENCY"]) as pool:
+        results = list(pool.map(_send, messages))
+
+    now = datetime.utcnow()
+    delivered = [message.id for message, error in results if error is None]
+    if delivered:
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(delivered))
+            .values(status=OutboxMessage.SENT, delivered_at=now, last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        stats.delivered = len(delivered)
+
+    failures = []
+    for message, error in results:
+        if error is None:
+            continue
+        dead = error.permanent or message.attempts >= config["DELIVERY_MAX_ATTEMPTS"]
+        delay = backoff_delay(message.attempts, config["DELIVERY_BACKOFF_SECONDS"], config["DELIVERY_BACKOFF_MAX_SECONDS"])
+        failures.append(dict(
+            b_id=message.id,
+            b_status=OutboxMessage.DEAD if dead else OutboxMessage.PENDING,
+            b_next=now if dead else now + timedelta(seconds=delay),
+            b_error=str(error)[:2000],
+        ))
+        if dead:
+            stats.dead += 1
+            current_app.logger.warning("Outbox message %s dead after %d attempts: %s", message.id, message.attempts, error)
+        else:
+            stats.retried += 1
+
+    if failures:
+        outbox = OutboxMessage.__table__
+        db.session.execute(
+            outbox.update()
+            .where(outbox.c.id == bindparam("b_id"))
+            .values(status=bindparam("b_status"), next_attempt_at=bindparam("b_next"), last_error=bindparam("b_error")),
+            failures,
+        )
+    db.session.commit()
+
+    stats.elapsed = time.perf_counter() - started
+    observe_job("deliver_pending", stats.elapsed)
+    current_app.logger.info(
+        "Delivered %d/%d outbox messages (%d retrying, %d dead) in %.2fs",
+        stats.delivered, stats.claimed, stats.retried, stats.dead, stats.elapsed,
+    )
+    return stats
+
+def next_delivery_at():
+    """Earliest instant a pending outbox row becomes due, for the dispatcher's heap."""
+    return db.session.query(db.func.min(OutboxMessage.next_attempt_at)).filter(
+        OutboxMessage.status.in_([OutboxMessage.PENDING, OutboxMessage.SENDING]),
+    ).scalar()
@@ -1,6 +1,13 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, DateField, SelectField, BooleanField, DateTimeLocalField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional, URL
+from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional, URL, ValidationError
+
+from .utils import is_valid_timezone
+
+def valid_timezone(form, field):
+    if field.data and not is_valid_timezone(field.data.strip()):
+        raise ValidationError("Unknown timezone. Use an IANA name such as Europe/Dublin.")
 
 class RegisterForm(FlaskForm):
     name = StringField("Full Name", validators=[DataRequired(), Length(max=120)])
@@ -17,13 +24,20 @@ class LoginForm(FlaskForm):
 class FriendForm(FlaskForm):
     full_name = StringField("Full Name", validators=[DataRequired(), Length(max=120)])
     nickname = StringField("Nickname", validators=[Optional(), Length(max=80)])
+    email = StringField("Email (for scheduled wishes)", validators=[Optional(), Email(), Length(max=180)])
     relationship = StringField("Relationship", validators=[Optional(), Length(max=80)])
-    timezone = StringField("Timezone", validators=[Optional(), Length(max=64)])
+    timezone = StringField("Timezone", validators=[Optional(), Length(max=64), valid_timezone])
     birth_date = DateField("Birth Date", validators=[DataRequired()], format="%Y-%m-%d")
     photo_url = StringField("Photo URL", validators=[Optional(), URL(), Length(max=500)])
     notes = TextAreaField("Notes / Memories", validators=[Optional(), Length(max=2000)])
     submit = SubmitField("Save")
 
+class FriendImportForm(FlaskForm):
+    file = FileField("CSV or vCard file", validators=[
+        FileRequired(), FileAllowed(["csv", "vcf", "vcard"], "Upload a .csv or .vcf file."),
+    ])
+    submit = SubmitField("Import")
+
 class TemplateForm(FlaskForm):
     title = StringField("Template Title", validators=[DataRequired(), Length(max=120)])
     tone = SelectField("Tone", choices=[
@@ -0,0 +1,280 @@
+"""Bulk friend import and export in CSV and vCard.
+
+Imports read the upload one record at a time, validate each with FriendForm's
+rules, skip rows whose (full_name, birth_date) the user already has, and insert
+in chunks of FRIEND_IMPORT_CHUNK_SIZE, committing each, so a large address book
+never sits in memory and a bad row late in the file doesn't lose the rows before it.
+Exports walk the user's friends in keyset batches and yield the file as it goes.
+"""
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+
+from .cache import bump_versions
+from .extensions import db
+from .forms import FriendForm
+from .models import Friend
+from .pagination import rows_after
+from .utils import DEFAULT_TIMEZONE, birthday_ordinal
+
+FORMATS = ("csv", "vcard")
+
+# Export columns; imports also accept the aliases below
+CSV_COLUMNS = ["full_name", "nickname", "email", "relationship", "timezone", "birth_date", "photo_url", "notes"]
+CSV_ALIASES = {
+    "name": "full_name", "full name": "full_name", "display name": "full_name",
+    "birthday": "birth_date", "birth date": "birth_date", "dob": "birth_date",
+    "e-mail": "email", "email address": "email", "e-mail address": "email",
+    "photo": "photo_url", "note": "notes",
+}
+
+# Errors kept for the report; the count covers the rest
+MAX_REPORTED_ERRORS = 100
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    # (line or card number, message)
+    errors: list = field(default_factory=list)
+
+    @property
+    def processed(self) -> int:
+        return self.imported + self.duplicates + self.invalid
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+def detect_format(filename) -> str:
+    return "vcard" if filename.lower().endswith((".vcf", ".vcard")) else "csv"
+
+def parse_csv(stream):
+    """Yield (line number, fields) per CSV record; header names are case-insensitive."""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = []
+    for name in header:
+        name = name.strip().lower().replace("_", " ")
+        columns.append(CSV_ALIASES.get(name, name.replace(" ", "_")))
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, dict(zip(columns, row))
+
+def _unfold(stream):
+    """vCard content lines with RFC 6350 folding undone."""
+    current = None
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+def _unescape(value):
+    return value.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+def _vcard_birthday(value):
+    value = value.strip()
+    # BDAY may carry a time part (19990110T000000Z); only the date matters
+    value = value.split("T", 1)[0]
+    if value.startswith("--"):
+        return value  # no year, which FriendForm rejects
+    for fmt in ("%Y-%m-%d", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return value
+
+def parse_vcard(stream):
+    """Yield (card number, fields) per BEGIN:VCARD ... END:VCARD block."""
+    card, number = None, 0
+    for line in _unfold(stream):
+        name, _, value = line.partition(":")
+        # Drop parameters (EMAIL;TYPE=home) and group prefixes (item1.EMAIL)
+        prop = name.split(";", 1)[0].rsplit(".", 1)[-1].upper()
+        if prop == "BEGIN" and value.strip().upper() == "VCARD":
+            card, number = {}, number + 1
+        elif card is None:
+            continue
+        elif prop == "END":
+            if card:
+                yield number, card
+            card = None
+        elif prop == "FN":
+            card["full_name"] = _unescape(value)
+        elif prop == "N" and "full_name" not in card:
+            parts = [_unescape(p) for p in value.split(";")]
+            card["full_name"] = " ".join(p for p in (parts[1:2] + parts[:1]) if p)
+        elif prop == "NICKNAME":
+            card["nickname"] = _unescape(value).split(",")[0]
+        elif prop == "EMAIL" and "email" not in card:
+            card["email"] = value
+        elif prop == "BDAY":
+            card["birth_date"] = _vcard_birthday(value)
+        elif prop == "TZ" and "/" in value:
+            card["timezone"] = value
+        elif prop in ("X-RELATIONSHIP", "ROLE") and "relationship" not in card:
+            card["relationship"] = _unescape(value)
+        elif prop == "PHOTO" and value.startswith(("http://", "https://")):
+            card["photo_url"] = value
+        elif prop == "URL" and "photo_url" not in card and value.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".webp")):
+            card["photo_url"] = value
+        elif prop == "NOTE":
+            card["notes"] = _unescape(value)
+
+def _clean(value):
+    value = value.strip() if value else None
+    return value or None
+
+def validate_row(fields):
+    """Friend column values for one record, or a list of error messages."""
+    form = FriendForm(formdata=MultiDict({k: v for k, v in fields.items() if k in CSV_COLUMNS}), meta={"csrf": False})
+    if not form.validate():
+        errors = dict(form.errors)
+        # DataRequired reports an unparseable date as missing
+        if "birth_date" in errors and (fields.get("birth_date") or "").strip():
+            errors["birth_date"] = [f"{fields['birth_date'].strip()!r} is not a YYYY-MM-DD date."]
+        return [f"{form[name].label.text}: {' '.join(dict.fromkeys(messages))}" for name, messages in errors.items()]
+    email = _clean(form.email.data)
+    return dict(
+        full_name=form.full_name.data.strip(),
+        nickname=_clean(form.nickname.data),
+        email=email.lower() if email else None,
+        relationship=_clean(form.relationship.data),
+        timezone=_clean(form.timezone.data) or DEFAULT_TIMEZONE,
+        birth_date=form.birth_date.data,
+        notes=_clean(form.notes.data),
+        photo_url=_clean(form.photo_url.data),
+    )
+
+def _existing_keys(user_id, rows):
+    names = {row["full_name"] for row in rows}
+    found = db.session.execute(
+        select(Friend.full_name, Friend.birth_date)
+        .where(Friend.user_id == user_id, Friend.full_name.in_(names))
+    ).all()
+    return set(map(tuple, found))
+
+def _insert_chunk(user_id, rows, result):
+    existing = _existing_keys(user_id, rows)
+    now = datetime.utcnow()
+    fresh = []
+    for row in rows:
+        key = (row["full_name"], row["birth_date"])
+        if key in existing:
+            result.duplicates += 1
+            continue
+        # Also catches repeats within the chunk; earlier chunks are already committed
+        existing.add(key)
+        fresh.append(dict(
+            row, user_id=user_id, birthday_ordinal=birthday_ordinal(row["birth_date"]),
+            created_at=now, updated_at=now,
+        ))
+    if fresh:
+        # Core insert fires no ORM events, so version the cached fragments here
+        db.session.execute(Friend.__table__.insert(), fresh)
+        bump_versions([f"user:{user_id}"])
+    db.session.commit()
+    result.imported += len(fresh)
+
+def import_friends(user_id, stream, fmt="csv", chunk_size=None, progress=None) -> ImportResult:
+    """Import friends for `user_id` from a text stream.
+
+    `progress(result)` is called after every committed chunk.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; choose one of: {', '.join(FORMATS)}")
+    chunk_size = chunk_size or current_app.config["FRIEND_IMPORT_CHUNK_SIZE"]
+    records = parse_vcard(stream) if fmt == "vcard" else parse_csv(stream)
+    result = ImportResult()
+
+    def valid_rows():
+        for line, fields in records:
+            row = validate_row(fields)
+            if isinstance(row, list):
+                result.add_error(line, "; ".join(row))
+            else:
+                yield row
+
+    rows = valid_rows()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _insert_chunk(user_id, chunk, result)
+        if progress:
+            progress(result)
+    return result
+
+def _friend_batches(user_id, batch_size):
+    """Every friend of `user_id` by (full_name, id), one short query per batch."""
+    last = None
+    while True:
+        query = select(Friend).where(Friend.user_id == user_id)
+        if last is not None:
+            query = query.where(rows_after((Friend.full_name, Friend.id), last, descending=False))
+        batch = db.session.execute(query.order_by(Friend.full_name, Friend.id).limit(batch_size)).scalars().all()
+        if not batch:
+            return
+        yield batch
+        last = (batch[-1].full_name, batch[-1].id)
+        # Exported rows are not needed again; keep the identity map small
+        db.session.expunge_all()
+
+def _csv_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return "" if value is None else value
+
+def export_csv(user_id, batch_size=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for batch in _friend_batches(user_id, batch_size):
+        for friend in batch:
+            writer.writerow([_csv_value(getattr(friend, column)) for column in CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace(",", "\\,").replace(";", "\\;")
+
+def _vcard(friend):
+    lines = ["BEGIN:VCARD", "VERSION:4.0", f"FN:{_escape(friend.full_name)}", f"BDAY:{friend.birth_date:%Y%m%d}"]
+    if friend.nickname:
+        lines.append(f"NICKNAME:{_escape(friend.nickname)}")
+    if friend.email:
+        lines.append(f"EMAIL:{friend.email}")
+    if friend.timezone:
+        lines.append(f"TZ:{friend.timezone}")
+    if friend.relationship:
+        lines.append(f"X-RELATIONSHIP:{_escape(friend.relationship)}")
+    if friend.photo_url:
+        lines.append(f"PHOTO:{friend.photo_url}")
+    if friend.notes:
+        lines.append(f"NOTE:{_escape(friend.notes)}")
+    lines.append("END:VCARD")
+    return "\r\n".join(lines) + "\r\n"
+
+def export_vcard(user_id, batch_size=500):
+    for batch in _friend_batches(user_id, batch_size):
+        yield "".join(_vcard(friend) for friend in batch)
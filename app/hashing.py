@@ -0,0 +1,104 @@
+"""Password hashing off the request thread.
+
+scrypt and PBKDF2 are deliberately CPU-bound. Run inline, a burst of logins
+holds the GIL and the worker's CPU, and every other route stalls behind it. Each
+app process therefore sends hashing to a small process pool of
+PASSWORD_HASH_WORKERS. At most PASSWORD_HASH_MAX_PENDING hashes may be queued or
+running; past that, `HashingBusy` is raised at once and becomes a 503 with
+Retry-After, so a credential-stuffing burst is shed cheaply instead of queueing.
+
+The pool is created on first use, after gunicorn has forked, and uses the spawn
+start method so the children don't inherit the dispatcher's threads. Spawned
+children re-import the main script, so entry points need an
+`if __name__ == "__main__":` guard. Set PASSWORD_HASH_WORKERS=0 to hash inline
+(tests, one-off scripts).
+
+PASSWORD_HASH_METHOD is any Werkzeug method string ("scrypt",
+"pbkdf2:sha256:600000", ...). Stored hashes made with other parameters are
+re-hashed on the user's next successful login.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Password hashing is saturated; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class HashPool:
+    def __init__(self, workers, max_pending, timeout, retry_after):
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy(self.retry_after)
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the hash finishes, even if this request gave up waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise HashingBusy(self.retry_after) from None
+        except BrokenProcessPool:
+            # A child died (OOM killer, bad start); start a fresh pool next time
+            current_app.logger.exception("Password hashing pool broke; hashing this one inline")
+            self.shutdown()
+            return fn(*args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+def init_hashing(app):
+    config = app.config
+    app.extensions["hash_pool"] = HashPool(
+        config["PASSWORD_HASH_WORKERS"], config["PASSWORD_HASH_MAX_PENDING"],
+        config["PASSWORD_HASH_TIMEOUT"], config["PASSWORD_HASH_RETRY_AFTER"],
+    )
+
+def _pool():
+    return current_app.extensions["hash_pool"]
+
+def hash_password(password):
+    return _pool().run(generate_password_hash, password, current_app.config["PASSWORD_HASH_METHOD"])
+
+def verify_password(pwhash, password):
+    return _pool().run(check_password_hash, pwhash, password)
+
+@lru_cache(maxsize=8)
+def _stored_prefix(method):
+    # Werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"); the cheapest
+    # way to learn them is one throwaway hash per configured method
+    return generate_password_hash("", method).split("$", 1)[0]
+
+def needs_rehash(pwhash):
+    """True if `pwhash` wasn't made with the configured PASSWORD_HASH_METHOD."""
+    return pwhash.split("$", 1)[0] != _stored_prefix(current_app.config["PASSWORD_HASH_METHOD"])
@@ -0,0 +1,89 @@
+"""Conditional GET support for the public share and reveal pages.
+
+Views build a `PageValidators` from whatever drives the page (row versions,
+counters, the friend's birthday state) before running the expensive queries and
+rendering; a matching `If-None-Match` / `If-Modified-Since` gets a bare 304.
+"""
+import hashlib
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from flask import current_app, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+from .utils import local_today, local_to_utc, utcnow
+
+def local_day_bounds(zone_name, now=None):
+    """Naive UTC instants where the current local day in `zone_name` starts and ends.
+
+    Anything that depends on "is it the birthday?" can only change at these
+    boundaries, so they bound both Last-Modified and how long a proxy may cache.
+    """
+    today = local_today(zone_name, now)
+    start = local_to_utc(datetime.combine(today, dt_time.min), zone_name)
+    end = local_to_utc(datetime.combine(today + timedelta(days=1), dt_time.min), zone_name)
+    return start, end
+
+def _csrf_marker():
+    """Session CSRF secret plus the signing window, for pages that embed a token.
+
+    A 304 reuses a page whose token was signed when it was first rendered, so the
+    ETag rolls over every half token lifetime to keep cached forms submittable.
+    """
+    generate_csrf()
+    limit = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    window = int(time.time() // (limit / 2)) if limit else 0
+    return f"{session.get('csrf_token')}:{window}"
+
+class PageValidators:
+    """ETag, Last-Modified and Cache-Control for one public page.
+
+    `parts` must cover everything the rendered page depends on. Pages with a form
+    (`per_session=True`) embed the visitor's CSRF token, so they get a weak ETag and
+    are only cacheable by the browser; the rest are shared through a reverse proxy
+    until the next local-midnight boundary in `zone_name`.
+    """
+
+    def __init__(self, parts, updated_at, zone_name, per_session=False):
+        self.per_session = per_session
+        # Flashed messages are one-shot, per-visitor content: always render them
+        self.cacheable = "_flashes" not in session
+
+        parts = [*parts, request.full_path, current_app.config["PAGE_SIZE"], current_user.get_id()]
+        if per_session:
+            parts.append(_csrf_marker())
+        self.etag = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+        now = utcnow()
+        day_start, day_end = local_day_bounds(zone_name, now)
+        self.last_modified = max(updated_at, day_start)
+        self.fresh_for = int((day_end - now.replace(tzinfo=None)).total_seconds())
+
+    def not_modified(self):
+        """A 304 response if the client's copy is current, else None."""
+        if not self.cacheable:
+            return None
+        if is_resource_modified(request.environ, etag=self.etag, last_modified=self.last_modified):
+            return None
+        return self.apply(Response(status=304))
+
+    def apply(self, response):
+        response.vary.add("Cookie")
+        if not self.cacheable:
+            response.cache_control.private = True
+            response.cache_control.no_store = True
+            return response
+
+        response.set_etag(self.etag, weak=self.per_session)
+        response.last_modified = self.last_modified
+        response.cache_control.max_age = 0
+        response.cache_control.must_revalidate = True
+        if self.per_session:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.s_maxage = max(0, min(self.fresh_for, current_app.config["PUBLIC_CACHE_SECONDS"]))
+        return response
@@ -0,0 +1,286 @@
+"""Server-Sent Events feed of new contributions on public group cards.
+
+Open card pages subscribe to /cards/share/<slug>/events and insert new wishes
+as they arrive instead of reloading the whole wall. Each process runs one
+LiveFeedBroker. A single fetcher thread reads new rows for every card that has
+listeners. It runs straight after a local commit adds contributions (see
+`record_contributions`), and every LIVE_FEED_POLL_SECONDS to pick up rows
+written by other workers. Fetched rows go into a per-card ring of
+LIVE_FEED_BUFFER events.
+
+A connection holds only its position in that ring. It never has a queue of its
+own, so a slow reader costs no memory. If one falls further behind than the
+ring, it gets a `reset` event and the page offers a reload. Event ids are
+(created_at, id) cursors. A reconnecting browser sends its last one back as
+Last-Event-ID, and the rows it missed are read once before it joins the ring.
+
+Each connection is held open for up to LIVE_FEED_MAX_SECONDS. Serve it with an
+async worker (`gunicorn -k gevent`, see gunicorn.conf.py): a sync worker would
+be tied up by a single listener.
+"""
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, has_app_context
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .metrics import LIVE_FEED_CONNECTIONS
+from .models import CardContribution
+from .pagination import encode_cursor, rows_after
+
+CURSOR_COLUMNS = (CardContribution.created_at, CardContribution.id)
+
+# created_at is set before the INSERT waits for the write lock, so a row can commit
+# slightly after a newer one; re-read this far back and drop ids already seen
+COMMIT_SKEW = timedelta(seconds=5)
+
+@dataclass(frozen=True)
+class FeedEvent:
+    seq: int
+    id: int
+    # (created_at, id), the decoded form of `cursor`, for ordering
+    key: tuple
+    cursor: str
+    data: str
+
+def cursor_of(contribution):
+    return encode_cursor([contribution.created_at, contribution.id])
+
+def _event_for(seq, row):
+    data = json.dumps({
+        "author_name": row.author_name,
+        "message": row.message,
+        "reaction": row.reaction,
+        "date": row.created_at.strftime("%Y-%m-%d"),
+    }, ensure_ascii=False)
+    return FeedEvent(seq, row.id, (row.created_at, row.id), encode_cursor([row.created_at, row.id]), data)
+
+class CardFeed:
+    def __init__(self, lock, size):
+        self.changed = threading.Condition(lock)
+        self.events = deque(maxlen=size)
+        self.seq = 0
+        self.listeners = 0
+        # Re-read from here on the next fetch; ids inside the skew window already sent
+        self.since = datetime.utcnow() - COMMIT_SKEW
+        self.recent = {}
+
+    def add(self, rows):
+        fresh = [row for row in rows if row.id not in self.recent]
+        for row in fresh:
+            self.seq += 1
+            self.events.append(_event_for(self.seq, row))
+            self.recent[row.id] = row.created_at
+        if rows:
+            self.since = max(self.since, rows[-1].created_at - COMMIT_SKEW)
+            self.recent = {i: at for i, at in self.recent.items() if at >= self.since}
+        if fresh:
+            self.changed.notify_all()
+
+class Subscription:
+    def __init__(self, broker, card_id, feed):
+        self.broker = broker
+        self.card_id = card_id
+        self.feed = feed
+        self.position = feed.seq
+        self.closed = False
+
+    def wait(self, timeout):
+        """Events past our position, [] on timeout, or None if we fell out of the ring."""
+        feed = self.feed
+        with feed.changed:
+            feed.changed.wait_for(lambda: feed.seq > self.position, timeout)
+            if feed.seq == self.position:
+                return []
+            oldest = feed.events[0].seq
+            behind = oldest > self.position + 1
+            events = [e for e in feed.events if e.seq > self.position]
+            self.position = feed.seq
+        return None if behind else events
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self.card_id)
+
+class LiveFeedBroker:
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.poll_seconds = config["LIVE_FEED_POLL_SECONDS"]
+        self.buffer_size = config["LIVE_FEED_BUFFER"]
+        self.max_connections = config["LIVE_FEED_MAX_CONNECTIONS"]
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._feeds = {}  # card_id -> CardFeed
+        self._pending = False
+        self._connections = 0
+        self._thread = None
+
+    def subscribe(self, card_id):
+        """A Subscription for `card_id`, or None when this process is at LIVE_FEED_MAX_CONNECTIONS."""
+        with self._lock:
+            if self._connections >= self.max_connections:
+                return None
+            self._connections += 1
+            feed = self._feeds.get(card_id)
+            if feed is None:
+                feed = self._feeds[card_id] = CardFeed(self._lock, self.buffer_size)
+            feed.listeners += 1
+            if self._thread is None:
+                # Started on first use, so it runs in the gunicorn worker rather than the master
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+        LIVE_FEED_CONNECTIONS.inc()
+        return Subscription(self, card_id, feed)
+
+    def unsubscribe(self, card_id):
+        with self._lock:
+            self._connections -= 1
+            feed = self._feeds[card_id]
+            feed.listeners -= 1
+            if not feed.listeners:
+                del self._feeds[card_id]
+        LIVE_FEED_CONNECTIONS.dec()
+
+    def publish(self, card_ids):
+        """New contributions on `card_ids` were committed by this process; fetch them now."""
+        with self._lock:
+            if any(card_id in self._feeds for card_id in card_ids):
+                self._pending = True
+                self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._wake.wait_for(lambda: self._feeds)
+                self._wake.wait_for(lambda: self._pending, self.poll_seconds)
+                self._pending = False
+                since = {card_id: feed.since for card_id, feed in self._feeds.items()}
+            if not since:
+                continue
+            try:
+                with self.app.app_context():
+                    rows = self._fetch(since)
+            except Exception:
+                self.app.logger.exception("Live feed fetch failed")
+                time.sleep(self.poll_seconds)
+                continue
+            by_card = {}
+            for row in rows:
+                by_card.setdefault(row.card_id, []).append(row)
+            with self._lock:
+                for card_id, card_rows in by_card.items():
+                    feed = self._feeds.get(card_id)
+                    if feed is not None:
+                        feed.add(card_rows)
+
+    def _fetch(self, since):
+        # One query for every card with listeners; each seeks its own (card_id, created_at) index range
+        criteria = [
+            and_(CardContribution.card_id == card_id, CardContribution.created_at >= at)
+            for card_id, at in since.items()
+        ]
+        return db.session.execute(
+            select(CardContribution)
+            .where(or_(*criteria))
+            .order_by(CardContribution.card_id, CardContribution.created_at, CardContribution.id)
+        ).scalars().all()
+
+def catch_up(card_id, after, limit):
+    """Rows past the client's cursor `after` (None: all), oldest first, at most `limit` + 1."""
+    query = select(CardContribution).where(CardContribution.card_id == card_id)
+    if after is not None:
+        query = query.where(rows_after(CURSOR_COLUMNS, after, descending=False))
+    return db.session.execute(
+        query.order_by(*CURSOR_COLUMNS).limit(limit + 1)
+    ).scalars().all()
+
+def _message(event_name, data, event_id=None):
+    lines = [f"event: {event_name}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines += [f"data: {line}" for line in data.splitlines() or [""]]
+    return "\n".join(lines) + "\n\n"
+
+def _stream(subscription, after, backlog, reset, config):
+    heartbeat = config["LIVE_FEED_HEARTBEAT_SECONDS"]
+    deadline = time.monotonic() + config["LIVE_FEED_MAX_SECONDS"]
+    # The ring re-reads COMMIT_SKEW back, so it can repeat rows the client had
+    # before reconnecting (at or before `after`) or just got from the backlog
+    after = tuple(after) if after is not None else None
+    sent = {e.id for e in backlog}
+
+    def unseen(e):
+        return e.id not in sent and (after is None or e.key > after)
+    try:
+        yield f"retry: {config['LIVE_FEED_RETRY_MS']}\n\n"
+        if reset:
+            yield _message("reset", "{}")
+            return
+        for e in backlog:
+            yield _message("contribution", e.data, e.cursor)
+        while time.monotonic() < deadline:
+            events = subscription.wait(min(heartbeat, max(0, deadline - time.monotonic())))
+            if events is None:
+                yield _message("reset", "{}")
+                return
+            chunk = "".join(_message("contribution", e.data, e.cursor) for e in events if unseen(e))
+            # Comments keep proxies from timing the stream out and reveal dead connections
+            yield chunk or ": ping\n\n"
+    finally:
+        subscription.close()
+
+def event_stream(card_id, after):
+    """SSE response of contributions on `card_id` after the client's cursor `after`.
+
+    Reads the backlog within the current app context; the body then runs without
+    one, so no database connection is held while the stream is idle.
+    """
+    broker = current_app.extensions["live_feed"]
+    config = current_app.config
+    subscription = broker.subscribe(card_id)
+    if subscription is None:
+        return Response("Too many live connections.\n", 503, {"Retry-After": "30"}, mimetype="text/plain")
+    try:
+        rows = catch_up(card_id, after, broker.buffer_size)
+    except Exception:
+        subscription.close()
+        raise
+    reset = len(rows) > broker.buffer_size
+    backlog = [] if reset else [_event_for(0, row) for row in rows]
+
+    response = Response(_stream(subscription, after, backlog, reset, config), mimetype="text/event-stream")
+    # If the body is never iterated, the generator's cleanup never runs
+    response.call_on_close(subscription.close)
+    response.headers["Cache-Control"] = "no-store"
+    # Stop Nginx from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+def mark_new_contributions(card_id):
+    """Record that this transaction adds contributions to `card_id`; listeners hear at commit."""
+    db.session.info.setdefault("live_feed_cards", set()).add(card_id)
+
+@event.listens_for(Session, "after_commit")
+def _publish_new_contributions(session):
+    card_ids = session.info.pop("live_feed_cards", None)
+    if card_ids and has_app_context():
+        broker = current_app.extensions.get("live_feed")
+        if broker is not None:
+            broker.publish(card_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_new_contributions(session):
+    session.info.pop("live_feed_cards", None)
+
+def init_live_feed(app):
+    if app.config["LIVE_FEED_ENABLED"]:
+        app.extensions["live_feed"] = LiveFeedBroker(app)
@@ -0,0 +1,125 @@
+"""Prometheus metrics for requests, SQL and the dispatcher.
+
+Under gunicorn every worker records into its own files in
+PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py) and /metrics merges all
+of them, so a scrape sees the whole server whichever worker answers it. Without
+that variable metrics stay in process, which is what `flask run` wants.
+"""
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+from .extensions import db
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+
+REQUESTS = Counter(
+    "bwh_http_requests_total", "HTTP responses by endpoint, method and status.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "bwh_http_request_duration_seconds", "Time to produce a response (streamed bodies excluded).",
+    ["endpoint", "method"],
+)
+REQUEST_QUERIES = Histogram(
+    "bwh_http_request_db_queries", "SQL statements executed per request.",
+    ["endpoint"], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "bwh_http_request_db_seconds", "Time spent in SQL statements per request.",
+    ["endpoint"],
+)
+USER_CACHE_LOOKUPS = Counter(
+    "bwh_user_cache_lookups_total", "Logged-in user lookups served from the user cache (hit) or the database (miss).",
+    ["result"],
+)
+RATE_LIMITED = Counter(
+    "bwh_rate_limited_total", "Requests refused with 429 by a rate-limit bucket.", ["endpoint", "scope"],
+)
+LIVE_FEED_CONNECTIONS = Gauge(
+    "bwh_live_feed_connections", "Open Server-Sent Events streams of card contributions.",
+    multiprocess_mode="livesum",
+)
+JOB_SECONDS = Histogram(
+    "bwh_scheduler_job_duration_seconds", "Duration of dispatcher jobs.",
+    ["job"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+JOB_LAST_SECONDS = Gauge(
+    "bwh_scheduler_job_last_duration_seconds", "Duration of the latest run of each dispatcher job.",
+    ["job"], multiprocess_mode="mostrecent",
+)
+DISPATCH_LAG = Histogram(
+    "bwh_scheduler_dispatch_lag_seconds", "sent_at - scheduled_for of dispatched wishes.",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900, 3600),
+)
+DISPATCH_LAG_LAST = Gauge(
+    "bwh_scheduler_dispatch_lag_max_seconds", "Largest sent_at - scheduled_for in the latest dispatch.",
+    multiprocess_mode="mostrecent",
+)
+
+def observe_job(job, seconds):
+    JOB_SECONDS.labels(job).observe(seconds)
+    JOB_LAST_SECONDS.labels(job).set(seconds)
+
+def observe_dispatch_lag(sent_at, scheduled):
+    """Record the lag of wishes claimed at `sent_at` that were due at `scheduled`."""
+    lags = [(sent_at - due).total_seconds() for due in scheduled]
+    for lag in lags:
+        DISPATCH_LAG.observe(lag)
+    if lags:
+        DISPATCH_LAG_LAST.set(max(lags))
+
+def _endpoint():
+    # Unmatched URLs share one label so scanners can't blow up the series count
+    return request.endpoint or "unmatched"
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_db_seconds = 0.0
+
+def _after_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None or request.endpoint == "metrics.metrics":
+        return response
+    endpoint = _endpoint()
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    REQUEST_QUERIES.labels(endpoint).observe(g.metrics_queries)
+    REQUEST_DB_SECONDS.labels(endpoint).observe(g.metrics_db_seconds)
+    return response
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_query_started"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statements from the dispatcher or CLI have no request to charge them to
+    if has_request_context() and "metrics_started" in g:
+        g.metrics_queries += 1
+        g.metrics_db_seconds += time.perf_counter() - conn.info["metrics_query_started"]
+
+def render_metrics():
+    """(body, content type) for a scrape."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def init_metrics(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+    from .routes.metrics import metrics_bp
+
+    # First in line so the timings cover the other hooks, and requests they turn away
+    app.before_request_funcs.setdefault(None, []).insert(0, _before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+    app.register_blueprint(metrics_bp)
@@ -1,23 +1,27 @@
+import hashlib
 from datetime import datetime, date
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from .extensions import db, login_manager
-from .utils import generate_token
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import validates
+from .extensions import db
+from .hashing import hash_password, verify_password
+from .utils import (
+    DEFAULT_TIMEZONE, generate_token, birthday_ordinal, birthday_ordinals_on, next_birthday,
+    is_birthday, local_today, local_to_utc, zones_by_local_date,
+)
 
 class TimestampMixin:
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
 class User(UserMixin, TimestampMixin, db.Model):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(180), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
+    # Secret in the birthday calendar feed URL; None until the user turns the feed on
+    calendar_token = db.Column(db.String(64), unique=True, nullable=True, index=True)
 
     friends = db.relationship("Friend", backref="owner", lazy=True, cascade="all, delete-orphan")
     templates = db.relationship("WishTemplate", backref="owner", lazy=True, cascade="all, delete-orphan")
@@ -25,45 +29,132 @@ class User(UserMixin, TimestampMixin, db.Model):
     group_cards = db.relationship("GroupCard", backref="owner", lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    @property
+    def password_version(self) -> str:
+        # Every new hash has a fresh salt, so this changes with each password change
+        return hashlib.sha256(self.password_hash.encode()).hexdigest()[:12]
+
+    def get_id(self):
+        # Sessions are pinned to the password they were opened with (see app/user_cache.py)
+        return f"{self.id}:{self.password_version}"
 
     def __repr__(self):
         return f"<User {self.email}>"
 
 class Friend(TimestampMixin, db.Model):
     __tablename__ = "friends"
+    __table_args__ = (
+        db.Index("ix_friends_user_birthday_ordinal", "user_id", "birthday_ordinal"),
+        db.Index("ix_friends_user_timezone_birthday_ordinal", "user_id", "timezone", "birthday_ordinal"),
+        db.Index("ix_friends_user_full_name_id", "user_id", "full_name", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     full_name = db.Column(db.String(120), nullable=False)
     nickname = db.Column(db.String(80), nullable=True)
+    email = db.Column(db.String(180), nullable=True)
     relationship = db.Column(db.String(80), nullable=True)
-    timezone = db.Column(db.String(64), nullable=True, default="Europe/Dublin")
+    timezone = db.Column(db.String(64), nullable=True, default=DEFAULT_TIMEZONE)
 
     birth_date = db.Column(db.Date, nullable=False)
+    # Month/day of birth_date packed as MMDD; kept in sync by _sync_birthday_ordinal
+    birthday_ordinal = db.Column(db.Integer, nullable=False)
     notes = db.Column(db.Text, nullable=True)
     photo_url = db.Column(db.String(500), nullable=True)
 
     wishes = db.relationship("Wish", backref="friend", lazy=True, cascade="all, delete-orphan")
     cards = db.relationship("GroupCard", backref="friend", lazy=True, cascade="all, delete-orphan")
 
-    def days_until_birthday(self):
-        today = date.today()
-        this_year = date(today.year, self.birth_date.month, self.birth_date.day)
-        if this_year < today:
-            next_bday = date(today.year + 1, self.birth_date.month, self.birth_date.day)
-        else:
-            next_bday = this_year
-        return (next_bday - today).days
+    @validates("birth_date")
+    def _sync_birthday_ordinal(self, key, value):
+        self.birthday_ordinal = birthday_ordinal(value) if value else None
+        return value
+
+    def local_today(self, now=None):
+        return local_today(self.timezone, now)
+
+    def is_birthday_today(self, now=None):
+        return is_birthday(self.birth_date, self.local_today(now))
+
+    def days_until_birthday(self, today=None):
+        """Days to the next birthday, counted from `today` (default: the friend's local date)."""
+        today = today or self.local_today()
+        return (next_birthday(self.birth_date, today) - today).days
+
+    @classmethod
+    def _in_zones(cls, names):
+        in_zone = cls.timezone.in_([name for name in names if name is not None])
+        if None in names:
+            in_zone = or_(in_zone, cls.timezone.is_(None))
+        return in_zone
+
+    @classmethod
+    def upcoming_birthdays(cls, user_id, limit=5, now=None):
+        """Next `limit` birthdays, each counted from the friend's own local date.
+
+        As in birthdays_today, zones are bucketed by local date; each date is two
+        ordinal-index range scans (rest of the year, then wrapping into the next).
+        """
+        zones = [name for (name,) in db.session.query(cls.timezone).filter(cls.user_id == user_id).distinct()]
+        order = (cls.birthday_ordinal.asc(), cls.id.asc())
+
+        found = []
+        for day, names in zones_by_local_date(zones, now).items():
+            start = birthday_ordinal(day)
+            base = cls.query.filter(cls.user_id == user_id, cls._in_zones(names))
+            upcoming = base.filter(cls.birthday_ordinal >= start).order_by(*order).limit(limit).all()
+            if len(upcoming) < limit:
+                upcoming += base.filter(cls.birthday_ordinal < start).order_by(*order).limit(limit - len(upcoming)).all()
+            found += upcoming
+        found.sort(key=lambda f: (f.days_until_birthday(f.local_today(now)), f.birthday_ordinal, f.id))
+        return found[:limit]
+
+    @classmethod
+    def birthdays_on(cls, user_id, day=None):
+        day = day or date.today()
+        return (
+            cls.query
+            .filter(cls.user_id == user_id, cls.birthday_ordinal.in_(birthday_ordinals_on(day)))
+            .order_by(cls.full_name.asc())
+            .all()
+        )
+
+    @classmethod
+    def birthdays_today(cls, user_id, now=None):
+        """Friends whose birthday it is right now in their own timezone.
+
+        Zones are bucketed by local date, so this is one indexed lookup per distinct
+        date (at most three) rather than a timezone conversion per friend.
+        """
+        zones = [name for (name,) in db.session.query(cls.timezone).filter(cls.user_id == user_id).distinct()]
+
+        criteria = []
+        for day, names in zones_by_local_date(zones, now).items():
+            criteria.append(and_(cls._in_zones(names), cls.birthday_ordinal.in_(birthday_ordinals_on(day))))
+        if not criteria:
+            return []
+
+        return (
+            cls.query
+            .filter(cls.user_id == user_id, or_(*criteria))
+            .order_by(cls.full_name.asc())
+            .all()
+        )
 
     def __repr__(self):
         return f"<Friend {self.full_name}>"
 
 class WishTemplate(TimestampMixin, db.Model):
     __tablename__ = "wish_templates"
+    __table_args__ = (
+        db.Index("ix_wish_templates_user_created_at_id", "user_id", "created_at", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
@@ -76,6 +167,17 @@ class WishTemplate(TimestampMixin, db.Model):
 
 class Wish(TimestampMixin, db.Model):
     __tablename__ = "wishes"
+    __table_args__ = (
+        # Due-wish queue: only unsent rows are indexed, so it stays small as history grows
+        db.Index(
+            "ix_wishes_due", "scheduled_for", "id",
+            sqlite_where=db.text("sent_at IS NULL"),
+            postgresql_where=db.text("sent_at IS NULL"),
+        ),
+        # Keyset pagination of the wish list and a friend's page
+        db.Index("ix_wishes_user_created_at_id", "user_id", "created_at", "id"),
+        db.Index("ix_wishes_friend_created_at_id", "friend_id", "created_at", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     friend_id = db.Column(db.Integer, db.ForeignKey("friends.id"), nullable=False)
@@ -88,20 +190,34 @@ class Wish(TimestampMixin, db.Model):
 
     # Scheduling + Time capsule
     is_time_capsule = db.Column(db.Boolean, default=False, nullable=False)
+    # Wall-clock send time as entered, in the friend's timezone
+    scheduled_local = db.Column(db.DateTime, nullable=True)
+    # The same moment as a naive UTC instant; this is what the dispatcher compares
     scheduled_for = db.Column(db.DateTime, nullable=True)
     sent_at = db.Column(db.DateTime, nullable=True)
 
     # Public reveal token (for surprise share)
     reveal_token = db.Column(db.String(120), unique=True, nullable=False, default=lambda: generate_token(12))
 
+    outbox_messages = db.relationship("OutboxMessage", backref="wish", lazy=True, cascade="all, delete-orphan")
+
     def is_sent(self):
         return self.sent_at is not None
 
+    def schedule(self, local_dt, zone_name):
+        """Set the local send time and resolve it to a UTC instant once, at save time."""
+        self.scheduled_local = local_dt
+        self.scheduled_for = local_to_utc(local_dt, zone_name) if local_dt else None
+
     def __repr__(self):
         return f"<Wish {self.title}>"
 
 class GroupCard(TimestampMixin, db.Model):
     __tablename__ = "group_cards"
+    __table_args__ = (
+        db.Index("ix_group_cards_user_created_at_id", "user_id", "created_at", "id"),
+        db.Index("ix_group_cards_friend_created_at_id", "friend_id", "created_at", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     friend_id = db.Column(db.Integer, db.ForeignKey("friends.id"), nullable=False)
@@ -114,12 +230,23 @@ class GroupCard(TimestampMixin, db.Model):
     is_locked_until_bday = db.Column(db.Boolean, default=False, nullable=False)
 
     contributions = db.relationship("CardContribution", backref="card", lazy=True, cascade="all, delete-orphan")
+    reaction_counts = db.relationship(
+        "CardReactionCount", lazy=True, cascade="all, delete-orphan",
+        order_by="CardReactionCount.count.desc()",
+    )
+
+    # Denormalized; maintained by app.counters alongside every contribution insert
+    contributions_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self):
         return f"<GroupCard {self.title}>"
 
 class CardContribution(TimestampMixin, db.Model):
     __tablename__ = "card_contributions"
+    __table_args__ = (
+        # Serves both per-card lookups and the paginated contribution wall
+        db.Index("ix_card_contributions_card_created_at_id", "card_id", "created_at", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     card_id = db.Column(db.Integer, db.ForeignKey("group_cards.id"), nullable=False)
 
@@ -129,3 +256,61 @@ class CardContribution(TimestampMixin, db.Model):
 
     def __repr__(self):
         return f"<CardContribution {self.author_name}>"
+
+class CardReactionCount(db.Model):
+    """Per-emoji reaction tally for a group card (see app.counters)."""
+    __tablename__ = "card_reaction_counts"
+    card_id = db.Column(db.Integer, db.ForeignKey("group_cards.id"), primary_key=True)
+    reaction = db.Column(db.String(10), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CardReactionCount {self.card_id} {self.reaction}={self.count}>"
+
+class OutboxMessage(TimestampMixin, db.Model):
+    """A delivery owed for a sent wish, written in the same transaction that marks it sent."""
+    __tablename__ = "outbox"
+    __table_args__ = (
+        db.Index("ix_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+    id = db.Column(db.Integer, primary_key=True)
+    wish_id = db.Column(db.Integer, db.ForeignKey("wishes.id"), nullable=False, index=True)
+
+    recipient = db.Column(db.String(180), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default=PENDING)  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When a pending row is next eligible; for a sending row, when its claim expires
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.status}>"
+
+class SchedulerLease(db.Model):
+    """Leader lease so only one process runs a given scheduler job at a time."""
+    __tablename__ = "scheduler_leases"
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(120), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} held by {self.holder}>"
+
+class CacheVersion(db.Model):
+    """Version counter for a cache scope such as "card:12"; bumped on every change (see app.cache)."""
+    __tablename__ = "cache_versions"
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
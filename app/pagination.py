@@ -0,0 +1,100 @@
+"""Keyset (seek) pagination with opaque URL cursors.
+
+A cursor holds the sort-key values of the last row shown. The next page resumes
+strictly after it, so page 500 costs the same index range scan as page 1 and no
+rows are skipped or repeated when new rows arrive between requests.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import and_, or_
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: str = None
+    # True when this page was reached through a cursor, i.e. it is not the first page
+    is_paged: bool = False
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def _dump(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _load(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(token, columns):
+    """Sort-key values from `token`, typed like `columns`. Aborts 400 on a bad cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(token)
+        return [_load(col, v) for col, v in zip(columns, values)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        abort(400)
+
+def rows_after(columns, values, descending):
+    """WHERE clause for rows strictly after `values` in (columns) order."""
+    clauses = []
+    for i, (col, value) in enumerate(zip(columns, values)):
+        beyond = col < value if descending else col > value
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], beyond))
+    return or_(*clauses)
+
+def paginate(query, *columns, descending=False, param="cursor", per_page=None):
+    """Fetch one page of `query` ordered by `columns` (the last must be unique, e.g. id).
+
+    The cursor is read from `request.args[param]`; all columns sort in the same
+    direction so a composite index on them serves both the seek and the order.
+    """
+    per_page = per_page or current_app.config["PAGE_SIZE"]
+    token = request.args.get(param)
+    if token:
+        query = query.filter(rows_after(columns, decode_cursor(token, columns), descending))
+
+    order = [col.desc() if descending else col.asc() for col in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    page = Page(items=rows[:per_page], is_paged=bool(token))
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        page.next_cursor = encode_cursor([getattr(last, col.key) for col in columns])
+    return page
+
+def page_url(param="cursor", cursor=None):
+    """URL of the current view with `param` set to `cursor` (or dropped when None)."""
+    args = request.args.to_dict()
+    args.pop(param, None)
+    if cursor is not None:
+        args[param] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
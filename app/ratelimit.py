@@ -0,0 +1,212 @@
+"""Token-bucket rate limits on public and auth endpoints.
+
+RATE_LIMITS is a comma-separated list of rules, one bucket per rule and key:
+
+    auth.login=10/minute burst=20, group_cards.public_card:slug=600/minute
+
+`endpoint[:scope]=N/period [burst=M]` refills N tokens per period (second,
+minute, hour or day) up to M (default N). The scope is "ip" (the default), or
+the name of a URL variable such as slug or token, which gives one bucket per
+card or wish whoever asks. A request is checked against its client's "ip"
+buckets first and stops at the first one that refuses it, so refused requests
+never spend a shared bucket's tokens. Limits are checked in a before_request
+hook, ahead of the session, the user lookup and the view, so a rejected request
+costs no database work. It gets a plain 429 with Retry-After.
+
+RATE_LIMIT_STORAGE "memory" keeps buckets per process. "sqlite" keeps them in a
+small SQLite file of its own (RATE_LIMIT_SQLITE_PATH, not the app database)
+that every gunicorn worker on the host shares. Behind Nginx set PROXY_FIX_X_FOR=1 so
+the client address comes from X-Forwarded-For (gunicorn.conf.py does); otherwise
+every visitor shares the proxy's "ip" buckets, and the first proxied request
+logs an error saying so.
+"""
+import ipaddress
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from flask import Response, current_app, request
+from werkzeug.utils import import_string
+
+from .metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RULE = re.compile(
+    r"^\s*(?P<endpoint>[\w.]+)(?::(?P<scope>\w+))?\s*=\s*(?P<count>\d+)\s*/\s*(?P<period>second|minute|hour|day)"
+    r"(?:\s+burst\s*=\s*(?P<burst>\d+))?\s*$"
+)
+
+@dataclass(frozen=True)
+class Limit:
+    endpoint: str
+    scope: str
+    rate: float  # tokens per second
+    burst: int
+
+def parse_limits(spec):
+    """Rules from a RATE_LIMITS string, grouped by endpoint."""
+    limits = {}
+    for rule in filter(str.strip, spec.split(",")):
+        match = _RULE.match(rule)
+        if match is None:
+            raise RuntimeError(f"Bad RATE_LIMITS rule {rule.strip()!r}; expected endpoint[:scope]=N/period [burst=M]")
+        count = int(match["count"])
+        limit = Limit(
+            endpoint=match["endpoint"], scope=match["scope"] or "ip",
+            rate=count / PERIODS[match["period"]], burst=int(match["burst"] or count),
+        )
+        limits.setdefault(limit.endpoint, []).append(limit)
+    for endpoint_limits in limits.values():
+        endpoint_limits.sort(key=lambda limit: limit.scope != "ip")
+    return limits
+
+def _refill(tokens, updated, now, rate, burst):
+    """Take one token; returns (tokens left, seconds to wait or 0)."""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+class MemoryStore:
+    """Buckets in this process only; the least recently used are dropped past `max_keys`."""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens, wait = _refill(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+class SQLiteStore:
+    """Buckets in a local SQLite file, so every worker on the host shares them."""
+
+    # Delete buckets idle this long (they would be full again anyway) every PRUNE_EVERY takes
+    PRUNE_AFTER_SECONDS = 86400
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        conn = self._connection()
+        # Take the write lock up front so concurrent workers can't both spend the last token
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = _refill(*(row or (burst, now)), now, rate, burst)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.PRUNE_AFTER_SECONDS,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+STORES = {
+    "memory": lambda app: MemoryStore(),
+    "sqlite": lambda app: SQLiteStore(
+        app.config["RATE_LIMIT_SQLITE_PATH"] or os.path.join(app.instance_path, "ratelimit.db")
+    ),
+}
+
+def _warn_untrusted_proxy():
+    """Log once per process when a local proxy forwards requests that PROXY_FIX_X_FOR ignores."""
+    state = current_app.extensions["rate_limit_proxy_check"]
+    if state["done"] or "X-Forwarded-For" not in request.headers:
+        return
+    try:
+        address = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        return
+    if address.is_loopback or address.is_private:
+        state["done"] = True
+        logger.error(
+            "Requests arrive through a proxy at %s with X-Forwarded-For, but PROXY_FIX_X_FOR is 0: "
+            "every client shares that proxy's rate-limit buckets. Set PROXY_FIX_X_FOR=1 behind Nginx.",
+            request.remote_addr,
+        )
+
+def _bucket_key(limit):
+    if limit.scope == "ip":
+        value = request.remote_addr or "unknown"
+    else:
+        value = (request.view_args or {}).get(limit.scope)
+        if value is None:
+            return None
+    return f"{limit.endpoint}:{limit.scope}:{value}"
+
+def _check_limits():
+    limits = current_app.extensions["rate_limits"].get(request.endpoint)
+    if not limits:
+        return None
+    if "rate_limit_proxy_check" in current_app.extensions:
+        _warn_untrusted_proxy()
+    store = current_app.extensions["rate_limit_store"]
+    wait = 0.0
+    # Per-client buckets go first (parse_limits orders them so) and the first refusal ends
+    # the check: a request already turned away must not drain a card's or wish's shared bucket
+    for limit in limits:
+        key = _bucket_key(limit)
+        if key is None:
+            continue
+        wait = store.take(key, limit.rate, limit.burst)
+        if wait:
+            RATE_LIMITED.labels(limit.endpoint, limit.scope).inc()
+            break
+    if not wait:
+        return None
+    # Plain text on purpose: a template would load the session user from the database
+    return Response(
+        "Too many requests. Please slow down and try again shortly.\n", 429,
+        {"Retry-After": str(math.ceil(wait))}, mimetype="text/plain",
+    )
+
+def init_ratelimit(app):
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return
+    storage = app.config["RATE_LIMIT_STORAGE"]
+    factory = STORES.get(storage) or import_string(storage)
+    app.extensions["rate_limits"] = parse_limits(app.config["RATE_LIMITS"])
+    app.extensions["rate_limit_store"] = factory(app)
+    if not app.config["PROXY_FIX_X_FOR"]:
+        app.extensions["rate_limit_proxy_check"] = {"done": False}
+    # Ahead of the session, CSRF and view work; create_app puts only the metrics timer earlier
+    app.before_request_funcs.setdefault(None, []).insert(0, _check_limits)
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 
 from ..extensions import db
+from ..hashing import needs_rehash
 from ..models import User
 from ..forms import RegisterForm, LoginForm
 
@@ -48,6 +49,11 @@ def login():
             flash("Invalid email or password.", "danger")
             return render_template("auth/login.html", form=form)
 
+        # The plaintext is only ever available here, so upgrade old hash parameters now
+        if needs_rehash(user.password_hash):
+            user.set_password(form.password.data)
+            db.session.commit()
+
         login_user(user, remember=True)
         flash("Welcome back!", "success")
         next_page = request.args.get("next")
@@ -1,29 +1,39 @@
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
-from datetime import date
 
+from ..cache import cached_fragment
 from ..models import Friend, Wish, GroupCard
+from ..utils import utcnow
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+# Every UTC offset is a multiple of 15 minutes, so friends' local dates (and with
+# them today's birthdays) can only change on a quarter-hour boundary.
+LOCAL_DATE_BUCKET_SECONDS = 15 * 60
+
 @dashboard_bp.route("/dashboard")
 @login_required
 def index():
-    friends = Friend.query.filter_by(user_id=current_user.id).all()
-    upcoming = sorted(friends, key=lambda f: f.days_until_birthday())[:5]
-
-    wishes_count = Wish.query.filter_by(user_id=current_user.id).count()
-    cards_count = GroupCard.query.filter_by(user_id=current_user.id).count()
-
-    # Today's birthdays
-    today = date.today()
-    todays = [f for f in friends if f.birth_date.month == today.month and f.birth_date.day == today.day]
-
-    return render_template(
-        "dashboard/index.html",
-        friends_count=len(friends),
-        wishes_count=wishes_count,
-        cards_count=cards_count,
-        upcoming=upcoming,
-        todays=todays,
-    )
+    def render_widgets():
+        # Both lists go by each friend's own local date
+        upcoming = Friend.upcoming_birthdays(current_user.id, limit=5)
+
+        friends_count = Friend.query.filter_by(user_id=current_user.id).count()
+        wishes_count = Wish.query.filter_by(user_id=current_user.id).count()
+        cards_count = GroupCard.query.filter_by(user_id=current_user.id).count()
+
+        # Today's birthdays, each in the friend's own timezone
+        todays = Friend.birthdays_today(current_user.id)
+
+        return render_template(
+            "dashboard/_widgets.html",
+            friends_count=friends_count,
+            wishes_count=wishes_count,
+            cards_count=cards_count,
+            upcoming=upcoming,
+            todays=todays,
+        )
+
+    bucket = int(utcnow().timestamp() // LOCAL_DATE_BUCKET_SECONDS)
+    widgets = cached_fragment("dashboard", [f"user:{current_user.id}"], render_widgets, bucket)
+    return render_template("dashboard/index.html", widgets=widgets)
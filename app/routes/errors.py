@@ -1,5 +1,8 @@
 from flask import Blueprint, render_template
 
+from ..hashing import HashingBusy
+from ..write_buffer import ContributionUnconfirmed
+
 errors_bp = Blueprint("errors", __name__)
 
 @errors_bp.app_errorhandler(404)
@@ -9,3 +12,15 @@ def not_found(e):
 @errors_bp.app_errorhandler(403)
 def forbidden(e):
     return render_template("403.html"), 403
+
+@errors_bp.app_errorhandler(HashingBusy)
+def hashing_busy(e):
+    return render_template("503.html"), 503, {"Retry-After": str(e.retry_after)}
+
+@errors_bp.app_errorhandler(ContributionUnconfirmed)
+def contribution_unconfirmed(e):
+    message = (
+        "We couldn't confirm that your wish was saved. It may still appear on the card, "
+        "so please check the card before posting it again."
+    )
+    return render_template("503.html", message=message), 503, {"Retry-After": str(e.retry_after)}
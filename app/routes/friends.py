@@ -1,16 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, abort
+import io
+
+from flask import Blueprint, Response, current_app, render_template, redirect, request, stream_with_context, url_for, flash, abort
 from flask_login import login_required, current_user
 
+from ..cache import cached_fragment
+from ..calendar_feed import get_feed, rotate_token
 from ..extensions import db
-from ..models import Friend, Wish, GroupCard
-from ..forms import FriendForm
+from ..models import Friend, GroupCard, User, Wish
+from ..forms import FriendForm, FriendImportForm
+from ..friend_io import detect_format, export_csv, export_vcard, import_friends
+from ..pagination import paginate
+from ..scheduler import wake_dispatcher
+from ..utils import DEFAULT_TIMEZONE
 
 friends_bp = Blueprint("friends", __name__)
 
 @friends_bp.route("/")
 @login_required
 def list_friends():
-    friends = Friend.query.filter_by(user_id=current_user.id).order_by(Friend.full_name.asc()).all()
+    friends = paginate(Friend.query.filter_by(user_id=current_user.id), Friend.full_name, Friend.id)
     return render_template("friends/list.html", friends=friends)
 
 @friends_bp.route("/create", methods=["GET", "POST"])
@@ -22,8 +30,9 @@ def create_friend():
             user_id=current_user.id,
             full_name=form.full_name.data.strip(),
             nickname=form.nickname.data.strip() if form.nickname.data else None,
+            email=form.email.data.strip().lower() if form.email.data else None,
             relationship=form.relationship.data.strip() if form.relationship.data else None,
-            timezone=form.timezone.data.strip() if form.timezone.data else "Europe/Dublin",
+            timezone=form.timezone.data.strip() if form.timezone.data else DEFAULT_TIMEZONE,
             birth_date=form.birth_date.data,
             notes=form.notes.data.strip() if form.notes.data else None,
             photo_url=form.photo_url.data.strip() if form.photo_url.data else None,
@@ -34,6 +43,70 @@ def create_friend():
         return redirect(url_for("friends.list_friends"))
     return render_template("friends/form.html", form=form, mode="create")
 
+@friends_bp.route("/import", methods=["GET", "POST"])
+@login_required
+def import_friends_upload():
+    form = FriendImportForm()
+    result = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        # utf-8-sig drops the BOM spreadsheet apps like to prepend
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", errors="replace", newline="")
+        result = import_friends(current_user.id, stream, detect_format(upload.filename or ""))
+        flash(
+            f"Imported {result.imported} friend(s); skipped {result.duplicates} duplicate(s) "
+            f"and {result.invalid} invalid row(s).",
+            "success" if result.imported or not result.invalid else "warning",
+        )
+        if not result.errors:
+            return redirect(url_for("friends.list_friends"))
+    return render_template("friends/import.html", form=form, result=result)
+
+@friends_bp.route("/export.<fmt>")
+@login_required
+def export_friends(fmt):
+    exporters = {"csv": (export_csv, "text/csv"), "vcf": (export_vcard, "text/vcard")}
+    if fmt not in exporters:
+        abort(404)
+    export, mimetype = exporters[fmt]
+    return Response(
+        stream_with_context(export(current_user.id)),
+        mimetype=f"{mimetype}; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename=friends.{fmt}"},
+    )
+
+@friends_bp.route("/calendar")
+@login_required
+def calendar_settings():
+    feed_url = None
+    if current_user.calendar_token:
+        path = url_for("friends.calendar_feed", token=current_user.calendar_token)
+        feed_url = current_app.config["PUBLIC_BASE_URL"].rstrip("/") + path
+    return render_template("friends/calendar.html", feed_url=feed_url)
+
+@friends_bp.route("/calendar/token", methods=["POST"])
+@login_required
+def reset_calendar_token():
+    user = db.session.get(User, current_user.id)
+    replaced = bool(user.calendar_token)
+    rotate_token(user)
+    db.session.commit()
+    flash("New calendar link created; the old one no longer works." if replaced else "Calendar link created.", "success")
+    return redirect(url_for("friends.calendar_settings"))
+
+@friends_bp.route("/calendar.ics")
+def calendar_feed():
+    feed = get_feed(request.args.get("token", ""))
+    if feed is None:
+        abort(404)
+    etag, body = feed
+    response = Response(body, mimetype="text/calendar")
+    response.set_etag(etag)
+    # The URL is a credential; keep the feed out of shared caches
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config["CALENDAR_FEED_CACHE_SECONDS"]
+    return response.make_conditional(request)
+
 def _get_friend_or_404(friend_id: int):
     friend = Friend.query.get_or_404(friend_id)
     if friend.user_id != current_user.id:
@@ -46,15 +119,29 @@ def edit_friend(friend_id):
     friend = _get_friend_or_404(friend_id)
     form = FriendForm(obj=friend)
     if form.validate_on_submit():
+        old_timezone = friend.timezone
         friend.full_name = form.full_name.data.strip()
         friend.nickname = form.nickname.data.strip() if form.nickname.data else None
+        friend.email = form.email.data.strip().lower() if form.email.data else None
         friend.relationship = form.relationship.data.strip() if form.relationship.data else None
         friend.timezone = form.timezone.data.strip() if form.timezone.data else friend.timezone
         friend.birth_date = form.birth_date.data
         friend.notes = form.notes.data.strip() if form.notes.data else None
         friend.photo_url = form.photo_url.data.strip() if form.photo_url.data else None
 
+        # Pending wishes keep their wall-clock time; re-resolve it in the new zone
+        rescheduled = []
+        if friend.timezone != old_timezone:
+            rescheduled = Wish.query.filter(
+                Wish.friend_id == friend.id,
+                Wish.sent_at.is_(None),
+                Wish.scheduled_local.isnot(None),
+            ).all()
+            for wish in rescheduled:
+                wish.schedule(wish.scheduled_local, friend.timezone)
+
         db.session.commit()
+        wake_dispatcher(*rescheduled)
         flash("Friend updated.", "success")
         return redirect(url_for("friends.list_friends"))
     return render_template("friends/form.html", form=form, mode="edit", friend=friend)
@@ -63,9 +150,20 @@ def edit_friend(friend_id):
 @login_required
 def view_friend(friend_id):
     friend = _get_friend_or_404(friend_id)
-    wishes = Wish.query.filter_by(friend_id=friend.id, user_id=current_user.id).order_by(Wish.created_at.desc()).all()
-    cards = GroupCard.query.filter_by(friend_id=friend.id, user_id=current_user.id).order_by(GroupCard.created_at.desc()).all()
-    return render_template("friends/view.html", friend=friend, wishes=wishes, cards=cards)
+
+    def render_wall():
+        wishes = paginate(
+            Wish.query.filter_by(friend_id=friend.id, user_id=current_user.id),
+            Wish.created_at, Wish.id, descending=True, param="wishes_cursor",
+        )
+        cards = paginate(
+            GroupCard.query.filter_by(friend_id=friend.id, user_id=current_user.id),
+            GroupCard.created_at, GroupCard.id, descending=True, param="cards_cursor",
+        )
+        return render_template("friends/_wall.html", wishes=wishes, cards=cards)
+
+    wall = cached_fragment("friend_wall", [f"friend:{friend.id}"], render_wall)
+    return render_template("friends/view.html", friend=friend, wall=wall)
 
 @friends_bp.route("/<int:friend_id>/delete", methods=["POST"])
 @login_required
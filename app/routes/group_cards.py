@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, abort, request
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, abort, request, make_response
 from flask_login import login_required, current_user
-from datetime import date
+from sqlalchemy.orm import joinedload
 
+from ..cache import cached_fragment
+from ..counters import record_contributions
 from ..extensions import db
 from ..models import GroupCard, CardContribution, Friend
 from ..forms import GroupCardForm, ContributionForm
+from ..http_cache import PageValidators
+from ..live_feed import CURSOR_COLUMNS, cursor_of, event_stream
+from ..pagination import decode_cursor, paginate
+from ..write_buffer import get_contribution_buffer
 
 group_cards_bp = Blueprint("group_cards", __name__)
 
@@ -14,7 +20,10 @@ def _get_friend_choices():
 @group_cards_bp.route("/")
 @login_required
 def list_cards():
-    cards = GroupCard.query.filter_by(user_id=current_user.id).order_by(GroupCard.created_at.desc()).all()
+    cards = paginate(
+        GroupCard.query.filter_by(user_id=current_user.id).options(joinedload(GroupCard.friend)),
+        GroupCard.created_at, GroupCard.id, descending=True,
+    )
     return render_template("cards/list.html", cards=cards)
 
 @group_cards_bp.route("/create", methods=["GET", "POST"])
@@ -59,7 +68,11 @@ def _get_card_or_404(card_id):
 def view_card(card_id):
     card = _get_card_or_404(card_id)
     share_url = url_for("group_cards.public_card", slug=card.slug, _external=True)
-    return render_template("cards/view.html", card=card, share_url=share_url)
+    contributions = paginate(
+        CardContribution.query.filter_by(card_id=card.id),
+        CardContribution.created_at, CardContribution.id,
+    )
+    return render_template("cards/view.html", card=card, contributions=contributions, share_url=share_url)
 
 @group_cards_bp.route("/<int:card_id>/delete", methods=["POST"])
 @login_required
@@ -73,36 +86,88 @@ def delete_card(card_id):
 # Public share page (no login required)
 @group_cards_bp.route("/share/<slug>", methods=["GET", "POST"])
 def public_card(slug):
-    card = GroupCard.query.filter_by(slug=slug).first_or_404()
+    card = GroupCard.query.filter_by(slug=slug).options(joinedload(GroupCard.friend)).first_or_404()
     friend = card.friend
 
-    today = date.today()
-    is_bday_today = (friend.birth_date.month == today.month and friend.birth_date.day == today.day)
+    is_bday_today = friend.is_birthday_today()
 
     locked = card.is_locked_until_bday and not is_bday_today
 
+    validators = None
+    if request.method == "GET":
+        # Everything the page shows; answer revalidations before loading the wall
+        validators = PageValidators(
+            (card.id, card.updated_at, card.contributions_count, friend.updated_at, locked, is_bday_today),
+            max(card.updated_at, friend.updated_at),
+            friend.timezone,
+            per_session=not locked,
+        )
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return not_modified
+
     form = ContributionForm()
     if form.validate_on_submit():
         if locked:
             flash("This card is locked until the birthday.", "warning")
             return redirect(url_for("group_cards.public_card", slug=slug))
 
-        c = CardContribution(
+        row = dict(
             card_id=card.id,
             author_name=form.author_name.data.strip(),
             message=form.message.data.strip(),
             reaction=form.reaction.data if form.reaction.data else None,
         )
-        db.session.add(c)
-        db.session.commit()
+        if current_app.config["CONTRIBUTION_WRITE_BUFFER"]:
+            # Hand our connection back while the writer commits this with its batch
+            db.session.rollback()
+            get_contribution_buffer().write(row, current_app.config["CONTRIBUTION_BUFFER_TIMEOUT"])
+        else:
+            db.session.add(CardContribution(**row))
+            record_contributions(card.id, 1, {row["reaction"]: 1} if row["reaction"] else {})
+            db.session.commit()
         flash("Your wish was added! 🎉", "success")
         return redirect(url_for("group_cards.public_card", slug=slug))
 
-    return render_template(
+    wall = None
+    if not locked:
+        wall = cached_fragment("card_wall", [f"card:{card.id}"], lambda: _render_wall(card))
+
+    response = make_response(render_template(
         "cards/public.html",
         card=card,
+        wall=wall,
         friend=friend,
         form=form,
         locked=locked,
         is_bday_today=is_bday_today,
+        # Live wishes land on top of the first page only
+        live=current_app.config["LIVE_FEED_ENABLED"] and "cursor" not in request.args,
+    ))
+    # A failed POST re-renders the form with errors; never cache that
+    return validators.apply(response) if validators else response
+
+def _render_wall(card):
+    # Newest wishes first; older ones are a cursor away
+    contributions = paginate(
+        CardContribution.query.filter_by(card_id=card.id),
+        CardContribution.created_at, CardContribution.id, descending=True,
     )
+    # The first page is where live wishes land; they continue from its newest row
+    live_cursor = None
+    if contributions and not contributions.is_paged:
+        live_cursor = cursor_of(contributions.items[0])
+    return render_template("cards/_wall.html", contributions=contributions, live_cursor=live_cursor)
+
+# Live feed of new wishes for the public share page (Server-Sent Events)
+@group_cards_bp.route("/share/<slug>/events")
+def card_events(slug):
+    if not current_app.config["LIVE_FEED_ENABLED"]:
+        abort(404)
+    card = GroupCard.query.filter_by(slug=slug).options(joinedload(GroupCard.friend)).first_or_404()
+    if card.is_locked_until_bday and not card.friend.is_birthday_today():
+        # 204 tells EventSource to stop reconnecting
+        return "", 204
+    token = request.headers.get("Last-Event-ID") or request.args.get("after")
+    after = decode_cursor(token, CURSOR_COLUMNS) if token else None
+    return event_stream(card.id, after)
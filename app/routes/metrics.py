@@ -0,0 +1,30 @@
+import hmac
+import ipaddress
+
+from flask import Blueprint, Response, abort, current_app, request
+
+from ..extensions import csrf
+from ..metrics import render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+def _is_local_scrape():
+    # A proxy on this host connects from loopback too, so anything it forwarded is remote
+    if "X-Forwarded-For" in request.headers:
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+@metrics_bp.route("/metrics")
+@csrf.exempt
+def metrics():
+    token = current_app.config["METRICS_TOKEN"]
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            abort(403)
+    elif not _is_local_scrape():
+        abort(403)
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
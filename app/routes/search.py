@@ -0,0 +1,22 @@
+from flask import Blueprint, abort, current_app, render_template, request
+from flask_login import current_user, login_required
+
+from ..pagination import decode_cursor
+from ..search import CURSOR_COLUMNS, KINDS, search
+
+search_bp = Blueprint("search", __name__)
+
+@search_bp.route("/")
+@login_required
+def results():
+    query = request.args.get("q", "").strip()
+    kind = request.args.get("kind") or None
+    if kind is not None and kind not in KINDS:
+        abort(400)
+    token = request.args.get("cursor")
+    hits = search(
+        current_user.id, query, kind,
+        after=decode_cursor(token, CURSOR_COLUMNS) if token else None,
+        per_page=current_app.config["PAGE_SIZE"],
+    )
+    return render_template("search/results.html", query=query, kind=kind, kinds=KINDS, hits=hits)
@@ -4,13 +4,17 @@ from flask_login import login_required, current_user
 from ..extensions import db
 from ..models import WishTemplate
 from ..forms import TemplateForm
+from ..pagination import paginate
 
 templates_bp = Blueprint("templates", __name__)
 
 @templates_bp.route("/")
 @login_required
 def list_templates():
-    items = WishTemplate.query.filter_by(user_id=current_user.id).order_by(WishTemplate.created_at.desc()).all()
+    items = paginate(
+        WishTemplate.query.filter_by(user_id=current_user.id),
+        WishTemplate.created_at, WishTemplate.id, descending=True,
+    )
     return render_template("templates/list.html", items=items)
 
 @templates_bp.route("/create", methods=["GET", "POST"])
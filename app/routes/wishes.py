@@ -1,17 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, abort, request
+from flask import Blueprint, render_template, redirect, url_for, flash, abort, request, make_response
 from flask_login import login_required, current_user
-from datetime import datetime, date
+from sqlalchemy.orm import joinedload
+from datetime import datetime
 
 from ..extensions import db
 from ..models import Wish, Friend, WishTemplate
 from ..forms import WishForm
+from ..http_cache import PageValidators
+from ..pagination import paginate
+from ..scheduler import wake_dispatcher
 
 wishes_bp = Blueprint("wishes", __name__)
 
 @wishes_bp.route("/")
 @login_required
 def list_wishes():
-    wishes = Wish.query.filter_by(user_id=current_user.id).order_by(Wish.created_at.desc()).all()
+    wishes = paginate(
+        Wish.query.filter_by(user_id=current_user.id).options(joinedload(Wish.friend)),
+        Wish.created_at, Wish.id, descending=True,
+    )
     return render_template("wishes/list.html", wishes=wishes)
 
 def _get_friend_choices():
@@ -45,7 +52,6 @@ def create_wish():
             flash("Invalid friend selected.", "danger")
             return redirect(url_for("wishes.create_wish"))
 
-        scheduled_for = form.scheduled_for.data
         wish = Wish(
             user_id=current_user.id,
             friend_id=friend.id,
@@ -54,11 +60,12 @@ def create_wish():
             body=form.body.data.strip(),
             image_url=form.image_url.data.strip() if form.image_url.data else None,
             is_time_capsule=bool(form.is_time_capsule.data),
-            scheduled_for=scheduled_for if scheduled_for else None,
         )
+        wish.schedule(form.scheduled_for.data or None, friend.timezone)
 
         db.session.add(wish)
         db.session.commit()
+        wake_dispatcher(wish)
         flash("Wish created!", "success")
         return redirect(url_for("wishes.list_wishes"))
 
@@ -76,8 +83,8 @@ def view_wish(wish_id):
     wish = _get_wish_or_404(wish_id)
     friend = wish.friend
 
-    today = date.today()
-    is_bday_today = (friend.birth_date.month == today.month and friend.birth_date.day == today.day)
+    # Birthday is judged in the friend's own timezone
+    is_bday_today = friend.is_birthday_today()
 
     # Time capsule rule: hide body if enabled and not birthday yet
     hide_body = wish.is_time_capsule and not is_bday_today
@@ -90,6 +97,9 @@ def edit_wish(wish_id):
     wish = _get_wish_or_404(wish_id)
     friends = _get_friend_choices()
     form = WishForm(obj=wish)
+    if request.method == "GET":
+        # The form edits wall-clock time in the friend's timezone, not the stored UTC instant
+        form.scheduled_for.data = wish.scheduled_local
 
     if form.validate_on_submit():
         friend_id = int(request.form.get("friend_id"))
@@ -104,9 +114,10 @@ def edit_wish(wish_id):
         wish.body = form.body.data.strip()
         wish.image_url = form.image_url.data.strip() if form.image_url.data else None
         wish.is_time_capsule = bool(form.is_time_capsule.data)
-        wish.scheduled_for = form.scheduled_for.data if form.scheduled_for.data else None
+        wish.schedule(form.scheduled_for.data or None, friend.timezone)
 
         db.session.commit()
+        wake_dispatcher(wish)
         flash("Wish updated.", "success")
         return redirect(url_for("wishes.view_wish", wish_id=wish.id))
 
@@ -137,9 +148,21 @@ def delete_wish(wish_id):
 # Public surprise reveal page
 @wishes_bp.route("/reveal/<token>")
 def public_reveal(token):
-    wish = Wish.query.filter_by(reveal_token=token).first_or_404()
+    wish = Wish.query.filter_by(reveal_token=token).options(joinedload(Wish.friend)).first_or_404()
     friend = wish.friend
-    today = date.today()
-    is_bday_today = (friend.birth_date.month == today.month and friend.birth_date.day == today.day)
+    is_bday_today = friend.is_birthday_today()
     hide_body = wish.is_time_capsule and not is_bday_today
-    return render_template("wishes/reveal_public.html", wish=wish, hide_body=hide_body, is_bday_today=is_bday_today)
+
+    validators = PageValidators(
+        (wish.id, wish.updated_at, friend.updated_at, hide_body, is_bday_today),
+        max(wish.updated_at, friend.updated_at),
+        friend.timezone,
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    response = make_response(
+        render_template("wishes/reveal_public.html", wish=wish, hide_body=hide_body, is_bday_today=is_bday_today)
+    )
+    return validators.apply(response)
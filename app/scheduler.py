@@ -1,57 +1,421 @@
-from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
+import heapq
+import os
+import select
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from flask import current_app
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy import select as sql_select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from .delivery import deliver_pending, enqueue_wishes, next_delivery_at
 from .extensions import db
-from .models import Wish
+from .metrics import observe_dispatch_lag, observe_job
+from .models import Wish, SchedulerLease
 
-scheduler = BackgroundScheduler()
+DISPATCH_LEASE = "due_wishes"
 
-def process_due_wishes():
-    # Run inside app context when invoked by scheduler
+# How far ahead the safety poll loads scheduled instants into the heap
+HORIZON_SIZE = 100
+
+# Retry delay when another process is mid-dispatch and holds the lease
+LEASE_RETRY_SECONDS = 1
+
+# Identifies this process as a lease holder; unique across hosts and restarts
+HOLDER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Postgres NOTIFY channel carrying newly scheduled instants to every dispatcher
+WAKE_CHANNEL = "wish_due"
+
+# How often a SQLite dispatcher checks whether another process committed
+DATA_VERSION_CHECK_SECONDS = 0.5
+
+def acquire_lease(name: str, holder: str, ttl_seconds: int) -> bool:
+    """Take or renew the named lease. Returns True if `holder` owns it afterwards."""
     now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+
+    # Renew our own lease or steal an expired one in a single atomic UPDATE
+    result = db.session.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.name == name,
+            (SchedulerLease.holder == holder) | (SchedulerLease.expires_at < now),
+        )
+        .values(holder=holder, expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.session.commit()
+        return True
+
+    # No row yet: first one to insert wins, everyone else hits the primary key
+    try:
+        db.session.add(SchedulerLease(name=name, holder=holder, expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
 
-    due = Wish.query.filter(
+def release_lease(name: str, holder: str):
+    db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+        .values(expires_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def due_wishes_filter(now):
+    """Criteria for wishes due at `now`.
+
+    `sent_at IS NULL` must stay in the WHERE clause: it is what lets both SQLite and
+    Postgres answer the query from the partial index ix_wishes_due, which holds only
+    unsent rows and so stays flat as sent history grows.
+    """
+    return (
         Wish.scheduled_for.isnot(None),
         Wish.sent_at.is_(None),
-        Wish.scheduled_for <= now
-    ).all()
+        Wish.scheduled_for <= now,
+    )
 
-    if not due:
-        return
+@dataclass
+class DispatchStats:
+    """Per-run metrics for process_due_wishes."""
+    backlog: int = 0
+    dispatched: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    elapsed: float = 0.0
 
-    for wish in due:
-        # For now, we only mark as sent.
-        # You can integrate real email/notification here later.
-        wish.sent_at = now
+    @property
+    def rows_per_second(self) -> float:
+        return self.dispatched / self.elapsed if self.elapsed else 0.0
 
-    db.session.commit()
+def process_due_wishes(batch_size=None, now=None):
+    # Run inside app context when invoked by scheduler
+    now = now or datetime.utcnow()
+    batch_size = batch_size or current_app.config.get("SCHEDULER_BATCH_SIZE", 500)
+    started = time.perf_counter()
+
+    due = due_wishes_filter(now)
+    stats = DispatchStats(backlog=db.session.query(func.count(Wish.id)).filter(*due).scalar())
+    if not stats.backlog:
+        db.session.rollback()
+        return stats
+
+    # Keyset-paginate on (scheduled_for, id) so each chunk is a bounded index range
+    # and a chunk that fails is skipped rather than retried forever.
+    last = None
+    while True:
+        query = db.session.query(Wish.id, Wish.scheduled_for).filter(*due)
+        if last is not None:
+            query = query.filter(or_(
+                Wish.scheduled_for > last.scheduled_for,
+                and_(Wish.scheduled_for == last.scheduled_for, Wish.id > last.id),
+            ))
+
+        # SKIP LOCKED lets concurrent dispatchers on Postgres pass over each other's rows;
+        # SQLite ignores FOR UPDATE and relies on the conditional UPDATE below instead.
+        rows = (
+            query.order_by(Wish.scheduled_for.asc(), Wish.id.asc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.session.rollback()
+            break
+        last = rows[-1]
+
+        try:
+            # `sent_at IS NULL` makes this an atomic claim: a row already taken by another
+            # dispatcher is simply not updated again.
+            ids = [row.id for row in rows]
+            claimed = db.session.execute(
+                update(Wish)
+                .where(Wish.id.in_(ids), Wish.sent_at.is_(None))
+                .values(sent_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            # The outbox rows commit (or roll back) together with the claim
+            enqueue_wishes(ids, now)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            stats.failed_batches += 1
+            current_app.logger.exception("Dispatch batch ending at wish %s failed", last.id)
+            continue
+
+        stats.batches += 1
+        stats.dispatched += claimed
+        observe_dispatch_lag(now, [row.scheduled_for for row in rows])
+        if len(rows) < batch_size:
+            break
+
+    stats.elapsed = time.perf_counter() - started
+    observe_job("process_due_wishes", stats.elapsed)
+    current_app.logger.info(
+        "Dispatched %d/%d due wishes in %d batches (%d failed), %.0f rows/s",
+        stats.dispatched, stats.backlog, stats.batches, stats.failed_batches, stats.rows_per_second,
+    )
+    return stats
+
+class Dispatcher:
+    """Event-driven due-wish dispatcher.
+
+    Keeps a min-heap of upcoming `scheduled_for` (and outbox retry) instants and
+    sleeps until the earliest one. `wake()` pushes new instants from the web path.
+    Instants scheduled by other processes arrive through a wake listener (see
+    `_listen_for_wakes`), and a low-frequency safety poll re-reads the horizon
+    from the database so nothing is ever missed.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._reload = False
+        self._thread = None
+
+    def wake(self, when):
+        with self._cond:
+            heapq.heappush(self._heap, when)
+            self._cond.notify()
+
+    def reload_horizon(self):
+        """Re-read upcoming instants from the database soon, without a dispatch tick."""
+        with self._cond:
+            self._reload = True
+            self._cond.notify()
+
+    def start(self, app):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self.run, args=(app,), name="wish-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def run(self, app):
+        poll_seconds = app.config.get("SCHEDULER_POLL_SECONDS", 300)
+        next_poll = time.monotonic()
+        self._running = True
+        _start_wake_listener(app, self)
+
+        while True:
+            with self._cond:
+                while self._running:
+                    now = datetime.utcnow()
+                    if (self._heap and self._heap[0] <= now) or time.monotonic() >= next_poll or self._reload:
+                        break
+                    timeout = next_poll - time.monotonic()
+                    if self._heap:
+                        timeout = min(timeout, (self._heap[0] - now).total_seconds())
+                    self._cond.wait(timeout)
+                if not self._running:
+                    break
+
+                reload, self._reload = self._reload, False
+                now = datetime.utcnow()
+                due = bool(self._heap) and self._heap[0] <= now
+                while self._heap and self._heap[0] <= now:
+                    heapq.heappop(self._heap)
+
+            refresh = time.monotonic() >= next_poll
+            if refresh:
+                next_poll = time.monotonic() + poll_seconds
+            if due or refresh:
+                _run_with_context(app, lambda: self._tick(app, refresh))
+            elif reload:
+                _run_with_context(app, self._load_horizon)
+
+    def _load_horizon(self):
+        upcoming = [
+            row.scheduled_for for row in db.session.query(Wish.scheduled_for).filter(
+                Wish.scheduled_for.isnot(None),
+                Wish.sent_at.is_(None),
+                Wish.scheduled_for > datetime.utcnow(),
+            ).order_by(Wish.scheduled_for.asc()).limit(HORIZON_SIZE)
+        ]
+        db.session.rollback()
+        with self._cond:
+            # A sorted list is a valid heap; the set drops instants we already track
+            self._heap = sorted(set(self._heap).union(upcoming))
+            self._cond.notify()
+
+    def _tick(self, app, refresh):
+        # The lease is held only for the duration of a tick, so whichever process
+        # wakes first dispatches everything that is due, never two at once.
+        lease_seconds = app.config.get("SCHEDULER_LEASE_SECONDS", 90)
+        if acquire_lease(DISPATCH_LEASE, HOLDER_ID, lease_seconds):
+            try:
+                process_due_wishes()
+
+                # Drain due deliveries, renewing the lease between full batches
+                batch_size = app.config["DELIVERY_BATCH_SIZE"]
+                while deliver_pending(batch_size).claimed == batch_size:
+                    acquire_lease(DISPATCH_LEASE, HOLDER_ID, lease_seconds)
+
+                retry_at = next_delivery_at()
+                if retry_at is not None:
+                    self.wake(retry_at)
+            finally:
+                release_lease(DISPATCH_LEASE, HOLDER_ID)
+        else:
+            self.wake(datetime.utcnow() + timedelta(seconds=LEASE_RETRY_SECONDS))
+
+        if refresh:
+            self._load_horizon()
+
+    @property
+    def running(self):
+        return self._running
+
+dispatcher = Dispatcher()
+
+def wake_dispatcher(*wishes):
+    """Tell every dispatcher about newly scheduled (or moved) wishes; call after commit.
+
+    This process's dispatcher hears directly. On Postgres a NOTIFY reaches the
+    others, such as a dedicated `flask dispatch-worker`; on SQLite they notice the
+    commit itself (see `_watch_sqlite`).
+    """
+    instants = sorted({w.scheduled_for for w in wishes if w.scheduled_for is not None and w.sent_at is None})
+    # With SCHEDULER_ENABLED=false nothing here would ever pop them
+    if dispatcher.running:
+        for when in instants:
+            dispatcher.wake(when)
+    if instants and db.session.get_bind().dialect.name == "postgresql":
+        # NOTIFY payloads are capped at 8000 bytes; later instants come with the horizon
+        payload = ",".join(when.isoformat() for when in instants[:HORIZON_SIZE])
+        db.session.execute(sql_select(func.pg_notify(WAKE_CHANNEL, payload)))
+        db.session.commit()
+
+def _listen_postgres(app, target):
+    """Push instants NOTIFYed by other processes into `target`; reconnects on errors."""
+    while target.running:
+        try:
+            with app.app_context():
+                raw = db.engine.raw_connection()
+            # Keep this connection out of the pool: it sits in LISTEN for good
+            raw.detach()
+            conn = raw.driver_connection
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {WAKE_CHANNEL}")
+                # Whatever was scheduled while we weren't listening
+                target.reload_horizon()
+                while target.running:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        for value in conn.notifies.pop(0).payload.split(","):
+                            target.wake(datetime.fromisoformat(value))
+            finally:
+                raw.close()
+        except Exception:
+            app.logger.exception("Dispatcher wake listener failed; reconnecting")
+            time.sleep(5)
+
+def _watch_sqlite(app, path, target):
+    """Reload `target`'s horizon whenever another connection commits to the SQLite file.
+
+    PRAGMA data_version is read from the WAL index in shared memory, so checking
+    it touches no table and costs next to nothing while the database is idle.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        last = conn.execute("PRAGMA data_version").fetchone()[0]
+        while target.running:
+            time.sleep(DATA_VERSION_CHECK_SECONDS)
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != last:
+                last = version
+                target.reload_horizon()
+    except Exception:
+        app.logger.exception("Dispatcher SQLite watcher stopped; relying on the safety poll")
+    finally:
+        conn.close()
+
+def _start_wake_listener(app, target):
+    """Start the thread that hears about wishes scheduled by other processes, if the database can say."""
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() == "postgresql":
+        if url.get_driver_name() not in ("psycopg2", ""):
+            app.logger.warning("Dispatcher wakeups need psycopg2; relying on the safety poll")
+            return
+        listen, args = _listen_postgres, (app, target)
+    elif url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        listen, args = _watch_sqlite, (app, url.database, target)
+    else:
+        return
+    threading.Thread(target=listen, args=args, name="wish-dispatcher-wakes", daemon=True).start()
 
 def init_scheduler(app):
+    """Start the dispatcher with the first request this process serves.
+
+    CLI commands (`db upgrade`, `seed`, ...) and scripts that only build the app
+    never serve a request, so they never tick, least of all against tables that
+    do not exist yet. wsgi.py calls `start_scheduler` up front so an idle web
+    worker still sends on time.
+    """
+    if not app.config.get("SCHEDULER_ENABLED", True):
+        return
+
+    @app.before_request
+    def _start_dispatcher():
+        if not dispatcher.running:
+            start_scheduler(app)
+
+def start_scheduler(app):
     if not app.config.get("SCHEDULER_ENABLED", True):
         return
 
     # Avoid double start in debug reloader
     if app.debug and app.config.get("ENV") == "development":
-        import os
         if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
             return
 
-    with app.app_context():
-        if not scheduler.get_jobs():
-            scheduler.add_job(
-                func=lambda: _run_with_context(app, process_due_wishes),
-                trigger="interval",
-                minutes=1,
-                id="due_wishes_job",
-                replace_existing=True,
-            )
-        scheduler.start()
+    dispatcher.start(app)
+
+def run_dispatch_worker(app):
+    """Blocking dispatcher loop for a dedicated process (see `flask dispatch-worker`)."""
+
+    def _stop(signum, frame):
+        dispatcher.stop()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    app.logger.info("Dispatch worker %s started (safety poll every %ss)", HOLDER_ID, app.config.get("SCHEDULER_POLL_SECONDS", 300))
+    # The one loop of this process; join() with a timeout keeps the main thread
+    # free to run the signal handlers above
+    dispatcher.start(app)
+    while dispatcher._thread.is_alive():
+        dispatcher._thread.join(1)
+    app.logger.info("Dispatch worker %s stopped", HOLDER_ID)
 
 def _run_with_context(app, fn):
     with app.app_context():
         try:
-            fn()
+            return fn()
         except Exception as e:
             # Keep scheduler resilient; log error
+            db.session.rollback()
             app.logger.exception("Scheduler job failed: %s", e)
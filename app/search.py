@@ -0,0 +1,268 @@
+"""Full-text search over a user's friends, wishes, templates and card contributions.
+
+All four are indexed into one table: an FTS5 virtual table `search_index` on
+SQLite, or `search_documents` with a weighted tsvector column and a GIN index on
+Postgres. Database triggers on the source tables keep it current, so Core bulk
+inserts (imports, the contribution write buffer, seeding) are indexed too. Each
+document's key is `source id * 4 + kind code`, so a trigger finds the row it
+replaces without a lookup.
+
+Words are stemmed (Porter on SQLite, the english configuration on Postgres), so
+"pancake" also finds "pancakes". A trailing `*` makes a term a prefix match;
+that is opt-in because expanding a prefix costs far more than an exact term.
+Queries match every term within the user's own documents and rank by bm25 /
+ts_rank_cd, with titles weighted above bodies. Pages are keyset
+paginated on (score, key), like every other list.
+
+`flask search rebuild` reinstalls the table and triggers and reindexes
+everything. Run it after a SQLite batch migration of an indexed table, which
+recreates the table and loses its triggers.
+"""
+import re
+from dataclasses import dataclass
+
+from flask import url_for
+from markupsafe import Markup, escape
+from sqlalchemy import Float, Integer, column, event, text
+
+from .extensions import db
+from .pagination import Page, encode_cursor
+
+SQLITE_TABLE = "search_index"
+SQLITE_COLUMNS = "rowid, owner, kind, title, body, ref_id, parent_id"
+POSTGRES_TABLE = "search_documents"
+POSTGRES_COLUMNS = "id, user_id, kind, title, body, ref_id, parent_id"
+MAX_TERMS = 8
+# Page cursors hold (score, key) of the last hit; lower scores rank higher
+CURSOR_COLUMNS = (column("score", Float()), column("id", Integer()))
+SNIPPET_CHARS = 180
+
+@dataclass(frozen=True)
+class Source:
+    kind: str
+    code: int
+    table: str
+    # Changes to these columns re-index the row
+    columns: tuple
+    # SQL over the trigger row ({row} is NEW or OLD) or the rebuild's table alias
+    owner: str
+    title: str
+    body: str
+    parent: str = "NULL"
+
+SOURCES = (
+    Source(
+        "friend", 0, "friends", ("user_id", "full_name", "nickname", "notes"),
+        owner="{row}.user_id", title="{row}.full_name",
+        body="COALESCE({row}.nickname, '') || ' ' || COALESCE({row}.notes, '')",
+    ),
+    Source(
+        "wish", 1, "wishes", ("user_id", "title", "body"),
+        owner="{row}.user_id", title="{row}.title", body="{row}.body",
+    ),
+    Source(
+        "template", 2, "wish_templates", ("user_id", "title", "body"),
+        owner="{row}.user_id", title="{row}.title", body="{row}.body",
+    ),
+    Source(
+        "contribution", 3, "card_contributions", ("card_id", "author_name", "message"),
+        owner="(SELECT user_id FROM group_cards WHERE group_cards.id = {row}.card_id)",
+        title="{row}.author_name", body="{row}.message", parent="{row}.card_id",
+    ),
+)
+KINDS = {source.kind: source for source in SOURCES}
+
+# Where each kind of hit links to: (endpoint, URL argument, whether it takes the parent id)
+LINKS = {
+    "friend": ("friends.view_friend", "friend_id", False),
+    "wish": ("wishes.view_wish", "wish_id", False),
+    "template": ("templates.edit_template", "template_id", False),
+    "contribution": ("group_cards.view_card", "card_id", True),
+}
+
+def _select(source, row, sqlite):
+    """key, owner, kind, title, body, ref_id, parent_id of one source row."""
+    fill = lambda expr: expr.format(row=row)
+    owner = fill(source.owner)
+    if sqlite:
+        # FTS5 indexes text only, so the owner is stored and matched as the term "u<id>"
+        owner = f"'u' || {owner}"
+    return (
+        f"{row}.id * 4 + {source.code}, {owner}, '{source.kind}', "
+        f"{fill(source.title)}, {fill(source.body)}, {row}.id, {fill(source.parent)}"
+    )
+
+def _sqlite_schema():
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+        "owner, kind, title, body, ref_id UNINDEXED, parent_id UNINDEXED, "
+        "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')",
+    ]
+    for s in SOURCES:
+        insert = f"INSERT INTO {SQLITE_TABLE} ({SQLITE_COLUMNS}) SELECT {_select(s, 'NEW', True)}"
+        delete = f"DELETE FROM {SQLITE_TABLE} WHERE rowid = OLD.id * 4 + {s.code}"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {s.table}_search_insert AFTER INSERT ON {s.table} BEGIN {insert}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {s.table}_search_update AFTER UPDATE OF {', '.join(s.columns)} "
+            f"ON {s.table} BEGIN {delete}; {insert}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {s.table}_search_delete AFTER DELETE ON {s.table} BEGIN {delete}; END",
+        ]
+    return statements
+
+def _postgres_schema():
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+        "id BIGINT PRIMARY KEY, user_id INTEGER NOT NULL, kind VARCHAR(20) NOT NULL, "
+        "title TEXT NOT NULL, body TEXT NOT NULL, ref_id INTEGER NOT NULL, parent_id INTEGER, "
+        "document TSVECTOR GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')) STORED)",
+        f"CREATE INDEX IF NOT EXISTS ix_{POSTGRES_TABLE}_document ON {POSTGRES_TABLE} USING gin (document)",
+        f"CREATE INDEX IF NOT EXISTS ix_{POSTGRES_TABLE}_user_id ON {POSTGRES_TABLE} (user_id)",
+    ]
+    for s in SOURCES:
+        statements += [
+            f"CREATE OR REPLACE FUNCTION {s.table}_search_sync() RETURNS trigger AS $$ BEGIN "
+            f"IF TG_OP IN ('UPDATE', 'DELETE') THEN DELETE FROM {POSTGRES_TABLE} WHERE id = OLD.id * 4 + {s.code}; END IF; "
+            f"IF TG_OP IN ('INSERT', 'UPDATE') THEN INSERT INTO {POSTGRES_TABLE} ({POSTGRES_COLUMNS}) SELECT {_select(s, 'NEW', False)}; END IF; "
+            "RETURN NULL; END $$ LANGUAGE plpgsql",
+            f"DROP TRIGGER IF EXISTS {s.table}_search_sync ON {s.table}",
+            f"CREATE TRIGGER {s.table}_search_sync AFTER INSERT OR DELETE OR UPDATE OF {', '.join(s.columns)} "
+            f"ON {s.table} FOR EACH ROW EXECUTE FUNCTION {s.table}_search_sync()",
+        ]
+    return statements
+
+def install(connection):
+    """Create the index table and triggers if missing."""
+    sqlite = connection.dialect.name == "sqlite"
+    for statement in _sqlite_schema() if sqlite else _postgres_schema():
+        connection.exec_driver_sql(statement)
+
+def uninstall(connection):
+    if connection.dialect.name == "sqlite":
+        for s in SOURCES:
+            for action in ("insert", "update", "delete"):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {s.table}_search_{action}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    else:
+        for s in SOURCES:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {s.table}_search_sync ON {s.table}")
+            connection.exec_driver_sql(f"DROP FUNCTION IF EXISTS {s.table}_search_sync()")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+def rebuild(progress=None):
+    """Drop and refill the index from the source tables; returns documents indexed per kind."""
+    connection = db.session.connection()
+    sqlite = connection.dialect.name == "sqlite"
+    uninstall(connection)
+    install(connection)
+    table, columns = (SQLITE_TABLE, SQLITE_COLUMNS) if sqlite else (POSTGRES_TABLE, POSTGRES_COLUMNS)
+    counts = {}
+    for s in SOURCES:
+        counts[s.kind] = connection.exec_driver_sql(
+            f"INSERT INTO {table} ({columns}) SELECT {_select(s, 'src', sqlite)} FROM {s.table} AS src"
+        ).rowcount
+        if progress:
+            progress(s.kind, counts[s.kind])
+    if sqlite:
+        # Merge the b-trees written by the bulk load into one
+        connection.exec_driver_sql(f"INSERT INTO {SQLITE_TABLE} ({SQLITE_TABLE}) VALUES ('optimize')")
+    else:
+        connection.exec_driver_sql(f"ANALYZE {POSTGRES_TABLE}")
+    db.session.commit()
+    return counts
+
+@event.listens_for(db.metadata, "after_create")
+def _install_after_create_all(target, connection, **kw):
+    # db.create_all() (seed.py, benchmarks) gets the index too; migrations create it themselves
+    install(connection)
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Keep Alembic autogenerate away from the index and FTS5's shadow tables."""
+    return not (type_ == "table" and reflected and name.startswith((SQLITE_TABLE, POSTGRES_TABLE)))
+
+def parse_terms(query):
+    """(term, is_prefix) pairs from user input: letters and digits only, at most MAX_TERMS."""
+    return [(term, bool(star)) for term, star in re.findall(r"([^\W_]+)(\*)?", query.lower())[:MAX_TERMS]]
+
+@dataclass
+class Hit:
+    kind: str
+    ref_id: int
+    parent_id: int
+    title: Markup
+    snippet: Markup
+
+    @property
+    def url(self):
+        endpoint, argument, by_parent = LINKS[self.kind]
+        return url_for(endpoint, **{argument: self.parent_id if by_parent else self.ref_id})
+
+def highlight(value, terms, width=SNIPPET_CHARS):
+    """Escaped excerpt of `value` around the first match, with matched words in <mark>."""
+    value = value or ""
+    # Marks words starting with a term's rough stem, so "pancakes" also marks "pancake"
+    stems = (re.sub(r"(?:ing|ed|es|s)$", "", term) if len(term) > 4 else term for term, _ in terms)
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, stems)) + r")\w*", re.IGNORECASE)
+    first = pattern.search(value)
+    start = max(0, first.start() - width // 4) if first else 0
+    excerpt = value[start:start + width]
+    parts, last = [], 0
+    for match in pattern.finditer(excerpt):
+        parts += [escape(excerpt[last:match.start()]), Markup("<mark>%s</mark>") % match.group()]
+        last = match.end()
+    parts.append(escape(excerpt[last:]))
+    prefix = "…" if start else ""
+    suffix = "…" if start + width < len(value) else ""
+    return Markup(prefix) + Markup("").join(parts) + Markup(suffix)
+
+def _sqlite_query(user_id, terms, kind):
+    words = " AND ".join(f'"{term}" *' if prefix else f'"{term}"' for term, prefix in terms)
+    match = f'owner : "u{user_id}" AND {{title body}} : ({words})'
+    if kind:
+        match += f' AND kind : "{kind}"'
+    sql = (
+        f"SELECT rowid AS id, kind, title, body, ref_id, parent_id, bm25({SQLITE_TABLE}, 0, 0, 5.0, 1.0) AS score "
+        f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH :match"
+    )
+    return sql, {"match": match}
+
+def _postgres_query(user_id, terms, kind):
+    sql = (
+        f"SELECT id, kind, title, body, ref_id, parent_id, -ts_rank_cd(document, query) AS score "
+        f"FROM {POSTGRES_TABLE}, to_tsquery('english', :tsquery) AS query "
+        "WHERE user_id = :user_id AND document @@ query"
+    )
+    params = {"tsquery": " & ".join(f"{term}:*" if prefix else term for term, prefix in terms), "user_id": user_id}
+    if kind:
+        sql += " AND kind = :kind"
+        params["kind"] = kind
+    return sql, params
+
+def search(user_id, query, kind=None, after=None, per_page=50):
+    """One page of `user_id`'s documents matching `query`, best first.
+
+    `after` is the previous page's cursor decoded with CURSOR_COLUMNS.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return Page(items=[])
+    sqlite = db.session.get_bind().dialect.name == "sqlite"
+    sql, params = (_sqlite_query if sqlite else _postgres_query)(user_id, terms, kind)
+    sql = f"SELECT * FROM ({sql}) AS hits"
+    if after is not None:
+        sql += " WHERE score > :after_score OR (score = :after_score AND id > :after_id)"
+        params.update(after_score=after[0], after_id=after[1])
+    sql += " ORDER BY score, id LIMIT :limit"
+    rows = db.session.execute(text(sql), {**params, "limit": per_page + 1}).all()
+
+    page = Page(
+        items=[
+            Hit(row.kind, row.ref_id, row.parent_id, highlight(row.title, terms), highlight(row.body, terms))
+            for row in rows[:per_page]
+        ],
+        is_paged=after is not None,
+    )
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        page.next_cursor = encode_cursor([last.score, last.id])
+    return page
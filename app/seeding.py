@@ -0,0 +1,276 @@
+"""Bulk data generator behind `flask seed`.
+
+Rows come from per-table generators and are written in fixed-size batches with
+Core executemany INSERTs (which SQLAlchemy sends as multi-row VALUES on
+Postgres), committing per batch, so memory stays flat at any size. The same
+SeedSpec and seed always produce the same rows: ids continue from the current
+maximum, and every random choice comes from a per-table RNG derived from the seed.
+
+Distributions are meant to look like real accounts: birthdays follow monthly
+birth-rate weights (late summer peak, Feb 29 included in leap years), wishes
+skew towards a few close friends, `sent_ratio` of wishes are already delivered,
+and every `1 / viral_ratio`-th card goes viral with `viral_multiplier` times the
+usual contributions.
+"""
+import calendar
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .models import CardContribution, Friend, GroupCard, User, Wish, WishTemplate
+from .utils import birthday_ordinal, utc_to_local
+
+# Every seeded user can log in with this password
+SEED_PASSWORD = "seed-password"
+
+# Share of births per month, Jan..Dec
+MONTH_WEIGHTS = [0.080, 0.074, 0.082, 0.079, 0.083, 0.083, 0.088, 0.090, 0.088, 0.085, 0.080, 0.082]
+TIMEZONES = ["Europe/Dublin", "Europe/London", "America/New_York", "America/Los_Angeles", "Asia/Kolkata", "Asia/Tokyo", "Australia/Sydney", "UTC"]
+TIMEZONE_WEIGHTS = [30, 15, 15, 10, 15, 5, 5, 5]
+RELATIONSHIPS = ["Friend", "Best Friend", "Colleague", "Family", "Neighbour", None]
+TONES = ["warm", "funny", "formal", "emotional"]
+THEMES = ["cloud", "party", "sunset", "galaxy"]
+REACTIONS = ["🎉", "❤️", "🎂", "🥳", "✨", None, None]
+
+# Trade durability for load speed on the seeding connection only (see seed(fast=True))
+SQLITE_FAST_LOAD_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA temp_store=MEMORY",
+)
+
+@dataclass
+class SeedSpec:
+    users: int = 10
+    friends_per_user: int = 50
+    wishes_per_user: int = 100
+    templates_per_user: int = 3
+    cards_per_user: int = 5
+    contributions_per_card: int = 20
+    sent_ratio: float = 0.8
+    viral_ratio: float = 0.02
+    viral_multiplier: int = 50
+    seed: int = 42
+    batch_size: int = 5000
+
+def random_birth_date(rng):
+    month = rng.choices(range(1, 13), weights=MONTH_WEIGHTS)[0]
+    year = rng.randint(1950, 2012)
+    return date(year, month, rng.randint(1, calendar.monthrange(year, month)[1]))
+
+class _Ids:
+    """Next free primary key per table, read once before loading."""
+
+    def __init__(self, conn):
+        self.start = {
+            model: conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar() + 1
+            for model in (User, Friend, WishTemplate, Wish, GroupCard, CardContribution)
+        }
+
+def _users(spec, ids, now):
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    for n in range(spec.users):
+        user_id = ids.start[User] + n
+        yield dict(
+            id=user_id, name=f"Seed User {user_id}", email=f"seed-user-{user_id}@example.com",
+            password_hash=password_hash, created_at=now, updated_at=now,
+        )
+
+def _friends(spec, ids, now):
+    rng = random.Random(f"{spec.seed}:friends")
+    for n in range(spec.users * spec.friends_per_user):
+        friend_id = ids.start[Friend] + n
+        birth_date = random_birth_date(rng)
+        yield dict(
+            id=friend_id, user_id=ids.start[User] + n // spec.friends_per_user,
+            full_name=f"Friend {friend_id:07d}", nickname=None,
+            email=f"friend-{friend_id}@example.com" if rng.random() < 0.6 else None,
+            relationship=rng.choice(RELATIONSHIPS),
+            timezone=rng.choices(TIMEZONES, weights=TIMEZONE_WEIGHTS)[0],
+            birth_date=birth_date, birthday_ordinal=birthday_ordinal(birth_date),
+            created_at=now - timedelta(days=rng.randrange(1000)), updated_at=now,
+        )
+
+def _templates(spec, ids, now):
+    for n in range(spec.users * spec.templates_per_user):
+        yield dict(
+            user_id=ids.start[User] + n // spec.templates_per_user, title=f"Template {n + 1}",
+            tone=TONES[n % len(TONES)], body="Wishing you a day full of laughter and love!",
+            created_at=now, updated_at=now,
+        )
+
+def _wishes(spec, ids, now):
+    rng = random.Random(f"{spec.seed}:wishes")
+    total = spec.users * spec.wishes_per_user
+    for n in range(total):
+        wish_id = ids.start[Wish] + n
+        user_index = n // spec.wishes_per_user
+        # Squaring skews wishes towards each user's first few (closest) friends
+        friend_index = int(spec.friends_per_user * rng.random() ** 2)
+        created_at = now - timedelta(days=1095 * (1 - n / total))
+        sent = rng.random() < spec.sent_ratio
+        if sent:
+            scheduled_for = created_at + timedelta(hours=rng.randrange(1, 24 * 30)) if rng.random() < 0.5 else None
+        else:
+            scheduled_for = now + timedelta(hours=rng.randrange(1, 24 * 365)) if rng.random() < 0.5 else None
+        yield dict(
+            id=wish_id, user_id=ids.start[User] + user_index,
+            friend_id=ids.start[Friend] + user_index * spec.friends_per_user + friend_index,
+            title=f"Wish {wish_id}", body="Happy birthday! Have the best year yet.", tone=rng.choice(TONES),
+            is_time_capsule=rng.random() < 0.1,
+            # Seeded wall times are stored as UTC; good enough for test data
+            scheduled_local=scheduled_for, scheduled_for=scheduled_for,
+            sent_at=(scheduled_for or created_at) if sent else None,
+            reveal_token=f"seed-wish-{wish_id}", created_at=created_at, updated_at=created_at,
+        )
+
+def _is_viral(spec, card_index):
+    return spec.viral_ratio > 0 and card_index % round(1 / spec.viral_ratio) == 0
+
+def _cards(spec, ids, now):
+    rng = random.Random(f"{spec.seed}:cards")
+    for n in range(spec.users * spec.cards_per_user):
+        card_id = ids.start[GroupCard] + n
+        user_index = n // spec.cards_per_user
+        viral = _is_viral(spec, n)
+        yield dict(
+            id=card_id, user_id=ids.start[User] + user_index,
+            friend_id=ids.start[Friend] + user_index * spec.friends_per_user + rng.randrange(spec.friends_per_user),
+            title=f"Card {card_id}", description=None, theme=rng.choice(THEMES), slug=f"seed-card-{card_id}",
+            # Viral cards are the ones open for contributions
+            is_locked_until_bday=not viral and rng.random() < 0.2, contributions_count=0,
+            created_at=now - timedelta(days=rng.randrange(365)), updated_at=now,
+        )
+
+def _contributions(spec, ids, now):
+    rng = random.Random(f"{spec.seed}:contributions")
+    for n in range(spec.users * spec.cards_per_user):
+        if _is_viral(spec, n):
+            count = spec.contributions_per_card * spec.viral_multiplier
+        else:
+            count = rng.randint(0, 2 * spec.contributions_per_card)
+        for i in range(count):
+            yield dict(
+                card_id=ids.start[GroupCard] + n, author_name=f"Guest {i + 1}",
+                message="So happy for you, have an amazing day!", reaction=rng.choice(REACTIONS),
+                created_at=now - timedelta(seconds=count - i), updated_at=now,
+            )
+
+def insert_stream(conn, table, rows, batch_size, progress=None):
+    """Insert an iterable of row dicts in batches, committing each; returns the row count."""
+    rows = iter(rows)
+    total = 0
+    started = time.perf_counter()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        conn.execute(table.insert(), batch)
+        conn.commit()
+        total += len(batch)
+        if progress:
+            progress(table.name, total, time.perf_counter() - started)
+    return total
+
+def seed(spec: SeedSpec, fast=False, progress=None) -> dict:
+    """Load `spec`'s rows; returns the number of rows written per table.
+
+    `fast` applies SQLITE_FAST_LOAD_PRAGMAS to the loading connection, which is
+    discarded afterwards so no pooled connection keeps synchronous=OFF, then runs
+    ANALYZE so the planner sees the new row counts.
+    """
+    from .cache import bump_versions
+    from .counters import repair_card_counters
+
+    now = datetime.utcnow()
+    conn = db.engine.connect()
+    sqlite = conn.dialect.name == "sqlite"
+    try:
+        if fast and sqlite:
+            for pragma in SQLITE_FAST_LOAD_PRAGMAS:
+                conn.execute(text(pragma))
+            conn.commit()
+
+        ids = _Ids(conn)
+        counts = {}
+        for table, rows in (
+            (User.__table__, _users(spec, ids, now)),
+            (Friend.__table__, _friends(spec, ids, now)),
+            (WishTemplate.__table__, _templates(spec, ids, now)),
+            (Wish.__table__, _wishes(spec, ids, now)),
+            (GroupCard.__table__, _cards(spec, ids, now)),
+            (CardContribution.__table__, _contributions(spec, ids, now)),
+        ):
+            counts[table.name] = insert_stream(conn, table, rows, spec.batch_size, progress)
+
+        if fast:
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+    finally:
+        if fast and sqlite:
+            conn.invalidate()
+        conn.close()
+
+    # Bulk inserts bypass the counters and the fragment cache versions
+    repair_card_counters()
+    bump_versions(["*"])
+    db.session.commit()
+    return counts
+
+def seed_demo():
+    """The small hand-written demo account; returns False if it already exists."""
+    from .counters import record_contributions
+
+    if User.query.filter_by(email="demo@bwh.local").first():
+        return False
+
+    user = User(name="Demo User", email="demo@bwh.local")
+    user.set_password("password123")
+    db.session.add(user)
+    db.session.commit()
+
+    friend1 = Friend(
+        user_id=user.id, full_name="Aarav Sharma", nickname="Aaru",
+        relationship="Best Friend", timezone="Europe/Dublin",
+        birth_date=date(1999, 12, 10),
+        notes="That 2022 trip still cracks me up."
+    )
+    friend2 = Friend(
+        user_id=user.id, full_name="Meera Nair",
+        relationship="Colleague", timezone="Europe/Dublin",
+        birth_date=date(1998, 1, 3)
+    )
+    db.session.add_all([friend1, friend2])
+    db.session.commit()
+
+    t1 = WishTemplate(user_id=user.id, title="Warm Classic", tone="warm", body="Wishing you a day full of laughter and love!")
+    t2 = WishTemplate(user_id=user.id, title="Office Friendly", tone="formal", body="Wishing you continued success and happiness. Happy Birthday!")
+    db.session.add_all([t1, t2])
+    db.session.commit()
+
+    w1 = Wish(user_id=user.id, friend_id=friend1.id, title="Aaru's Big Day", tone="funny",
+              body="Happy birthday! May your cake be bigger than your problems 😂")
+    w2 = Wish(user_id=user.id, friend_id=friend1.id, title="Time Capsule Note", tone="emotional",
+              body="You’ve always been my constant. Proud of you.",
+              is_time_capsule=True)
+    w3 = Wish(user_id=user.id, friend_id=friend2.id, title="Scheduled Office Wish", tone="formal",
+              body="Happy Birthday! Hope you have a wonderful year ahead.")
+    w3.schedule(utc_to_local(datetime.utcnow() + timedelta(minutes=2), friend2.timezone), friend2.timezone)
+    db.session.add_all([w1, w2, w3])
+    db.session.commit()
+
+    card = GroupCard(user_id=user.id, friend_id=friend1.id, title="Aarav's Group Surprise", theme="party")
+    db.session.add(card)
+    db.session.commit()
+
+    c1 = CardContribution(card_id=card.id, author_name="Team Alpha", message="Have an amazing year ahead! 🎉", reaction="🎉")
+    db.session.add(c1)
+    record_contributions(card.id, 1, {c1.reaction: 1})
+    db.session.commit()
+    return True
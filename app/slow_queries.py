@@ -0,0 +1,243 @@
+"""Opt-in slow-query log (SLOW_QUERY_LOG=true).
+
+Every statement slower than SLOW_QUERY_THRESHOLD_MS is written as one JSON line
+to a size-rotated log of the process's own: the SQL, its parameters with strings and bytes redacted,
+the Flask endpoint that ran it and the innermost frame of our own code on the
+stack. The first time a process sees a statement shape (the SQL with literals
+and IN lists collapsed) it also captures the query plan, via EXPLAIN on Postgres
+or EXPLAIN QUERY PLAN on SQLite, run on a separate DBAPI cursor. Plain EXPLAIN
+only plans, so this never re-runs the statement.
+
+Rotating one file from several processes is unsafe (each renames it under the
+others), so every process writes `slow_queries.<pid>.log` next to the configured
+path, with its own backups. `flask slow-queries summarize` reads every process's
+files and ranks shapes by total time.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from .extensions import db
+
+LOGGER_NAME = "bwh.slow_queries"
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shapes whose plan was captured; bounded so a flood of ad-hoc SQL can't grow it forever
+MAX_EXPLAINED_SHAPES = 5000
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement):
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+def process_log_path(path, pid=None):
+    """The file the process `pid` (default: this one) logs to, for a configured `path`."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pid or os.getpid()}{ext}"
+
+def fingerprint(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+def _redact(value):
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value if not isinstance(value, Decimal) else str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+def code_origin():
+    """Where in our code the statement came from, as "app/x.py:12 in func"."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PACKAGE_DIR) and filename != __file__:
+            relative = os.path.relpath(filename, os.path.dirname(PACKAGE_DIR))
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, default=str, ensure_ascii=False)
+
+class SlowQueryRecorder:
+    def __init__(self, app):
+        config = app.config
+        self.threshold = config["SLOW_QUERY_THRESHOLD_MS"] / 1000
+        self.explain = config["SLOW_QUERY_EXPLAIN"]
+        self.path = config["SLOW_QUERY_LOG_PATH"] or os.path.join(app.instance_path, "slow_queries.log")
+        self.max_bytes = config["SLOW_QUERY_LOG_MAX_BYTES"]
+        self.backups = config["SLOW_QUERY_LOG_BACKUPS"]
+        self._explained = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+    def _open_for_process(self):
+        """Point the logger at this process's file; reopens after a fork (e.g. gunicorn --preload)."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            handler = RotatingFileHandler(
+                process_log_path(self.path, pid), maxBytes=self.max_bytes, backupCount=self.backups,
+                encoding="utf-8", delay=True,
+            )
+            handler.setFormatter(_JSONFormatter())
+            self.logger.handlers = [handler]
+            self._pid = pid
+
+    def install(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["slow_query_started"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("slow_query_started", time.perf_counter())
+        if elapsed < self.threshold:
+            return
+        try:
+            self.record(conn, cursor, statement, parameters, executemany, elapsed)
+        except Exception:
+            # Never let logging break the statement that was being measured
+            logging.getLogger(__name__).exception("Could not record slow query")
+
+    def record(self, conn, cursor, statement, parameters, executemany, elapsed):
+        shape = statement_shape(statement)
+        entry = {
+            "ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+            "duration_ms": round(elapsed * 1000, 3),
+            "fingerprint": fingerprint(shape),
+            "shape": shape,
+            "statement": statement,
+            "parameters": redact_parameters(parameters[0] if executemany and parameters else parameters),
+            "executemany": len(parameters) if executemany else None,
+            "endpoint": request.endpoint if has_request_context() else None,
+            "method": request.method if has_request_context() else None,
+            # The rule, not the path: paths can carry share slugs and reveal tokens
+            "rule": request.url_rule.rule if has_request_context() and request.url_rule else None,
+            "origin": code_origin(),
+            "pid": os.getpid(),
+        }
+        if self.explain and self._first_sighting(entry["fingerprint"]):
+            entry["plan"] = self._explain(conn, cursor, statement, parameters[0] if executemany else parameters)
+        self._open_for_process()
+        self.logger.info(entry)
+
+    def _first_sighting(self, key):
+        with self._lock:
+            if key in self._explained or len(self._explained) >= MAX_EXPLAINED_SHAPES:
+                return False
+            self._explained.add(key)
+            return True
+
+    def _explain(self, conn, cursor, statement, parameters):
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        sqlite = conn.dialect.name == "sqlite"
+        # A fresh DBAPI cursor bypasses the engine events, so this isn't timed or logged itself
+        explain_cursor = cursor.connection.cursor()
+        try:
+            if not sqlite:
+                # A failed EXPLAIN would otherwise abort the caller's Postgres transaction
+                explain_cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                explain_cursor.execute(("EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN ") + statement, parameters or ())
+                return [" ".join(str(col) for col in row) for row in explain_cursor.fetchall()]
+            except Exception as e:
+                if not sqlite:
+                    explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                return [f"EXPLAIN failed: {e}"]
+            finally:
+                if not sqlite:
+                    explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            explain_cursor.close()
+
+def init_slow_query_log(app):
+    if not app.config["SLOW_QUERY_LOG"]:
+        return None
+    recorder = SlowQueryRecorder(app)
+    with app.app_context():
+        recorder.install(db.engine)
+    app.extensions["slow_query_recorder"] = recorder
+    return recorder
+
+def log_files(path):
+    """Every process's log and rotated backups for a configured `path`, oldest backups first."""
+    root, ext = os.path.splitext(path)
+    current = [p for p in glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}") if p != path]
+    files = []
+    # path itself is where logs went before they were split per process
+    for file_path in sorted([*current, path]):
+        backups = [p for p in glob.glob(f"{glob.escape(file_path)}.*") if p.rsplit(".", 1)[-1].isdigit()]
+        backups.sort(key=lambda p: int(p.rsplit(".", 1)[-1]), reverse=True)
+        files += [p for p in (*backups, file_path) if os.path.exists(p)]
+    return files
+
+def read_entries(path):
+    """Entries from every process's log for `path`, file by file (path.1 is a file's newest backup)."""
+    for file_path in log_files(path):
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def summarize(entries, since=None):
+    """Per-shape totals from log entries, worst total time first."""
+    shapes = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "endpoints": Counter(), "origins": Counter()})
+    for entry in entries:
+        if since and entry["ts"] < since:
+            continue
+        shape = shapes[entry["fingerprint"]]
+        shape["count"] += 1
+        shape["total_ms"] += entry["duration_ms"]
+        shape["max_ms"] = max(shape["max_ms"], entry["duration_ms"])
+        shape["shape"] = entry["shape"]
+        shape["endpoints"][entry.get("endpoint") or "-"] += 1
+        shape["origins"][entry.get("origin") or "-"] += 1
+        if entry.get("plan"):
+            shape["plan"] = entry["plan"]
+    ranked = sorted(shapes.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+    return [{"fingerprint": key, **value} for key, value in ranked]
@@ -99,3 +99,57 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
 });
+
+// Live wishes on public group cards (Server-Sent Events)
+function buildContribution(c){
+    const card = document.createElement("div");
+    card.className = "contrib-card";
+    const head = document.createElement("div");
+    head.className = "d-flex justify-content-between";
+    const author = document.createElement("div");
+    author.className = "fw-semibold";
+    author.textContent = c.author_name;
+    const meta = document.createElement("div");
+    meta.className = "small text-soft";
+    meta.textContent = c.reaction ? `${c.date} • ${c.reaction}` : c.date;
+    head.append(author, meta);
+    const message = document.createElement("div");
+    message.className = "mt-1";
+    message.textContent = c.message;
+    card.append(head, message);
+    return card;
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    const wall = document.getElementById("liveWall");
+    if(!wall || !window.EventSource) return;
+
+    const list = () => {
+        let el = document.getElementById("contributionList");
+        if(!el){
+            el = document.createElement("div");
+            el.id = "contributionList";
+            el.className = "vstack gap-2";
+            const empty = document.getElementById("contributionEmpty");
+            if(empty) empty.replaceWith(el); else wall.append(el);
+        }
+        return el;
+    };
+
+    const current = document.getElementById("contributionList");
+    const cursor = current && current.dataset.liveCursor;
+    const url = wall.dataset.eventsUrl + (cursor ? `?after=${encodeURIComponent(cursor)}` : "");
+    // On reconnect the browser resumes from the last event id on its own
+    const source = new EventSource(url);
+
+    source.addEventListener("contribution", (e) => {
+        list().prepend(buildContribution(JSON.parse(e.data)));
+        document.querySelectorAll("[data-live-count]").forEach((el) => {
+            el.textContent = String((parseInt(el.textContent, 10) || 0) + 1);
+        });
+    });
+    source.addEventListener("reset", () => {
+        source.close();
+        document.getElementById("liveWallReset").classList.remove("d-none");
+    });
+});
@@ -0,0 +1,106 @@
+"""Per-process cache of the logged-in user, so most requests skip the users query.
+
+Flask-Login resolves `current_user` through `load_user` on every request. It
+now returns a detached UserSnapshot from an LRU keyed by user id, reloading
+from the database on a miss, after USER_CACHE_TTL seconds, or when the
+session's password version differs from the cached one. Session ids are
+"<id>:<password version>" (see User.get_id), so changing the password ends
+every other session once the new hash is seen. Older sessions carry a bare id;
+until LEGACY_SESSION_IDS_UNTIL they are accepted and rewritten to the versioned
+form, after that they have to sign in again. Updates and deletes of a User
+drop its entry when the session commits; other workers pick the change up
+within the TTL.
+
+Snapshots are read-only: views that modify the account must load the User row.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from flask import current_app, has_request_context, session
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from .cache import LRUCache
+from .extensions import db, login_manager
+from .metrics import USER_CACHE_LOOKUPS
+from .models import User
+
+@dataclass(frozen=True)
+class UserSnapshot(UserMixin):
+    id: int
+    name: str
+    email: str
+    password_version: str
+    calendar_token: str = None
+
+    @classmethod
+    def of(cls, user):
+        return cls(user.id, user.name, user.email, user.password_version, user.calendar_token)
+
+    def get_id(self):
+        return f"{self.id}:{self.password_version}"
+
+def init_user_cache(app):
+    app.extensions["user_cache"] = LRUCache(app.config["USER_CACHE_MAX_ENTRIES"], default_ttl=app.config["USER_CACHE_TTL"])
+
+def get_user_cache():
+    return current_app.extensions["user_cache"]
+
+def _legacy_ids_accepted():
+    until = current_app.config["LEGACY_SESSION_IDS_UNTIL"]
+    return bool(until) and datetime.utcnow().date() < date.fromisoformat(until)
+
+def _upgrade_legacy_session(snapshot):
+    # Pin the session to the current password from now on
+    if has_request_context() and session.get("_user_id") == str(snapshot.id):
+        session["_user_id"] = snapshot.get_id()
+    return snapshot
+
+@login_manager.user_loader
+def load_user(session_id):
+    user_id, _, version = session_id.partition(":")
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return None
+    if not version and not _legacy_ids_accepted():
+        return None
+
+    cache = get_user_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is not None and (not version or snapshot.password_version == version):
+        USER_CACHE_LOOKUPS.labels("hit").inc()
+        return snapshot if version else _upgrade_legacy_session(snapshot)
+
+    USER_CACHE_LOOKUPS.labels("miss").inc()
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    snapshot = UserSnapshot.of(user)
+    cache.set(user_id, snapshot)
+    if not version:
+        return _upgrade_legacy_session(snapshot)
+    if snapshot.password_version != version:
+        return None
+    return snapshot
+
+def _mark_stale(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_users", set()).add(target.id)
+
+event.listen(User, "after_update", _mark_stale)
+event.listen(User, "after_delete", _mark_stale)
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_users(session):
+    stale = session.info.pop("stale_users", ())
+    if stale:
+        cache = get_user_cache()
+        for user_id in stale:
+            cache.delete(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_users(session):
+    session.info.pop("stale_users", None)
@@ -1,8 +1,81 @@
+import calendar
 import secrets
-from datetime import datetime, timezone
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = "Europe/Dublin"
 
 def generate_token(nbytes: int = 16) -> str:
     return secrets.token_urlsafe(nbytes)
 
 def utcnow():
     return datetime.now(timezone.utc)
+
+def birthday_ordinal(d: date) -> int:
+    """Pack month/day as MMDD so birthdays sort in calendar order (Dec 10 -> 1210)."""
+    return d.month * 100 + d.day
+
+def observed_birthday(birth_date: date, year: int) -> date:
+    """Birthday as celebrated in `year`; Feb 29 falls back to Feb 28 in non-leap years."""
+    if birth_date.month == 2 and birth_date.day == 29 and not calendar.isleap(year):
+        return date(year, 2, 28)
+    return date(year, birth_date.month, birth_date.day)
+
+def next_birthday(birth_date: date, today: date) -> date:
+    upcoming = observed_birthday(birth_date, today.year)
+    if upcoming < today:
+        upcoming = observed_birthday(birth_date, today.year + 1)
+    return upcoming
+
+def is_birthday(birth_date: date, today: date) -> bool:
+    return observed_birthday(birth_date, today.year) == today
+
+def birthday_ordinals_on(day: date) -> list:
+    """Ordinals of every birthday celebrated on `day` (Feb 28 also covers Feb 29 in non-leap years)."""
+    ordinals = [birthday_ordinal(day)]
+    if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+        ordinals.append(229)
+    return ordinals
+
+@lru_cache(maxsize=None)
+def resolve_zone(name):
+    """ZoneInfo for an IANA name, memoised; unknown or empty names fall back to DEFAULT_TIMEZONE."""
+    try:
+        return ZoneInfo(name) if name else ZoneInfo(DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+def local_to_utc(local_dt: datetime, zone_name) -> datetime:
+    """Naive wall-clock time in `zone_name` -> naive UTC instant (what the DB stores)."""
+    aware = local_dt.replace(tzinfo=resolve_zone(zone_name))
+    return aware.astimezone(timezone.utc).replace(tzinfo=None)
+
+def utc_to_local(utc_dt: datetime, zone_name) -> datetime:
+    aware = utc_dt.replace(tzinfo=timezone.utc)
+    return aware.astimezone(resolve_zone(zone_name)).replace(tzinfo=None)
+
+def local_today(zone_name, now=None) -> date:
+    """Calendar date in `zone_name` at the aware UTC instant `now` (defaults to current time)."""
+    return (now or utcnow()).astimezone(resolve_zone(zone_name)).date()
+
+def zones_by_local_date(zone_names, now=None) -> dict:
+    """Group zone names by their current local date.
+
+    However many zones a user's friends span, at any instant they fall on at most
+    three calendar dates, so birthday lookups become one indexed range per date
+    instead of a conversion per row.
+    """
+    now = now or utcnow()
+    groups = defaultdict(list)
+    for name in zone_names:
+        groups[local_today(name, now)].append(name)
+    return dict(groups)
@@ -0,0 +1,127 @@
+"""Group commit for public card contributions.
+
+With CONTRIBUTION_WRITE_BUFFER on, `public_card` hands each contribution to a
+per-process writer thread instead of committing it itself. The writer collects
+whatever arrives within CONTRIBUTION_BUFFER_WINDOW_MS of the first row (up to
+CONTRIBUTION_BUFFER_MAX_BATCH rows), writes them with one multi-row INSERT and one
+counter update per card, and commits once. Each request blocks on its future until
+that commit returns, so a poster is only told "added" once the row is durable. If
+the wait times out or the writer fails, `write` raises ContributionUnconfirmed,
+which becomes a 503 asking the poster to check the card before posting again: a
+late batch may still commit the row.
+
+Only requests served by threads of the same process are batched together, so this
+pays off with threaded (gthread) or gevent workers rather than sync ones.
+"""
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from flask import current_app
+from sqlalchemy import select
+
+from .cache import bump_versions
+from .counters import record_contributions
+from .extensions import db
+from .models import CardContribution, GroupCard
+
+class ContributionUnconfirmed(Exception):
+    """The writer didn't confirm a contribution in time; it may or may not be saved."""
+
+    def __init__(self, retry_after):
+        super().__init__("Contribution was not confirmed by the write buffer")
+        self.retry_after = retry_after
+
+def write_contributions(rows):
+    """Insert contribution rows and bump their cards' counters; caller commits."""
+    # One INSERT ... VALUES (...), (...) statement rather than an executemany
+    db.session.execute(CardContribution.__table__.insert().values(rows))
+
+    totals = Counter(row["card_id"] for row in rows)
+    reactions = defaultdict(Counter)
+    for row in rows:
+        if row.get("reaction"):
+            reactions[row["card_id"]][row["reaction"]] += 1
+    for card_id, total in totals.items():
+        record_contributions(card_id, total, reactions[card_id])
+
+    # A Core insert fires no ORM events, so version the cached fragments here
+    friend_ids = db.session.execute(
+        select(GroupCard.friend_id).where(GroupCard.id.in_(totals))
+    ).scalars().all()
+    bump_versions([*(f"card:{i}" for i in totals), *(f"friend:{i}" for i in friend_ids)])
+
+class ContributionBuffer:
+    def __init__(self, app):
+        self.app = app
+        self.window = app.config["CONTRIBUTION_BUFFER_WINDOW_MS"] / 1000
+        self.max_batch = app.config["CONTRIBUTION_BUFFER_MAX_BATCH"]
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="contribution-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row) -> Future:
+        """Queue one contribution; the future resolves once it is committed."""
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def write(self, row, timeout):
+        """Submit one contribution and wait for its commit, or raise ContributionUnconfirmed."""
+        try:
+            self.submit(row).result(timeout=timeout)
+        except FutureTimeout:
+            self.app.logger.warning("Contribution to card %s not committed within %ss", row["card_id"], timeout)
+            raise ContributionUnconfirmed(timeout) from None
+        except Exception as e:
+            self.app.logger.error("Contribution to card %s failed in the write buffer: %s", row["card_id"], e)
+            raise ContributionUnconfirmed(timeout) from e
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the window, still take rows that are already waiting
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self.app.app_context():
+                self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            write_contributions([row for row, _ in batch])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Don't fail a whole batch for one bad row: retry each on its own
+            self.app.logger.warning("Contribution batch of %d failed (%s); retrying rows singly", len(batch), e)
+            for item in batch:
+                self._flush([item])
+            return
+        for _, future in batch:
+            future.set_result(None)
+
+_buffer_lock = threading.Lock()
+
+def get_contribution_buffer(app=None) -> ContributionBuffer:
+    """Process-wide buffer, started on first use."""
+    app = app or current_app._get_current_object()
+    with _buffer_lock:
+        buffer = app.extensions.get("contribution_buffer")
+        if buffer is None:
+            buffer = app.extensions["contribution_buffer"] = ContributionBuffer(app)
+        return buffer
@@ -0,0 +1,33 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import statistics
+import tempfile
+import time
+
+def make_app(database_url=None, **config):
+    """Create the app against a throwaway database (SQLite in a temp dir by default)."""
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bwh-bench-'), 'bench.db')}"
+    # Config reads the environment at import time, so set it before importing the app
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    # The load generators come from one address and would only measure the 429 path
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app()
+    app.config.update(config)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def timed(fn, repeat=20):
+    """Median wall time of `fn` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
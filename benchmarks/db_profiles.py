@@ -0,0 +1,117 @@
+"""Read/write throughput under each database engine profile.
+
+Usage:
+    python -m benchmarks.db_profiles [--profiles default,sqlite] [--readers 8] [--writers 4]
+                                     [--seconds 5] [--postgres-url postgresql+psycopg2://...]
+
+Runs a mixed workload against a fresh database per profile: readers fetch the
+newest page of a card's wall, writers add a contribution and bump the card's
+counter in one transaction, both as fast as they can for a fixed time.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, insert, select, update
+
+from ._common import make_app
+
+def _workload(engine, tables, readers, writers, seconds):
+    contributions, cards = tables["card_contributions"], tables["group_cards"]
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def reader():
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(
+                        select(contributions).where(contributions.c.card_id == 1)
+                        .order_by(contributions.c.created_at.desc(), contributions.c.id.desc()).limit(50)
+                    ).all()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["reads"] += done
+            counts["errors"] += errors
+
+    def writer(n):
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with engine.begin() as conn:
+                    now = datetime.utcnow()
+                    conn.execute(insert(contributions).values(
+                        card_id=1, author_name=f"writer {n}", message="bench", created_at=now, updated_at=now,
+                    ))
+                    conn.execute(update(cards).where(cards.c.id == 1).values(contributions_count=cards.c.contributions_count + 1))
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="default,sqlite", help="Comma-separated SQLite profiles to compare.")
+    parser.add_argument("--postgres-url", help="Also run the postgres profile against this (empty) database.")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    from app.db_profiles import PROFILES
+    from app.extensions import db
+
+    runs = [(name, f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bwh-bench-'), 'bench.db')}")
+            for name in args.profiles.split(",")]
+    if args.postgres_url:
+        runs.append(("postgres", args.postgres_url))
+
+    print(f"{'profile':>10} {'reads/s':>9} {'writes/s':>9} {'errors':>7}")
+    for name, url in runs:
+        profile = PROFILES[name](app.config)
+        engine = create_engine(url, **profile.engine_options)
+        profile.install(engine)
+        db.metadata.create_all(engine)
+        tables = db.metadata.tables
+        with engine.begin() as conn:
+            now = datetime.utcnow()
+            stamps = dict(created_at=now, updated_at=now)
+            conn.execute(insert(tables["users"]).values(id=1, name="Bench", email="bench@bwh.local", password_hash="x", **stamps))
+            conn.execute(insert(tables["friends"]).values(
+                id=1, user_id=1, full_name="Bench Friend", birth_date=date(1990, 1, 1), birthday_ordinal=101,
+                timezone="UTC", **stamps,
+            ))
+            conn.execute(insert(tables["group_cards"]).values(
+                id=1, user_id=1, friend_id=1, title="Bench", theme="cloud", slug="bench",
+                is_locked_until_bday=False, contributions_count=0, **stamps,
+            ))
+
+        counts = _workload(engine, tables, args.readers, args.writers, args.seconds)
+        print(
+            f"{name:>10} {counts['reads'] / args.seconds:>9.0f} {counts['writes'] / args.seconds:>9.0f} "
+            f"{counts['errors']:>7}"
+        )
+        if name == "postgres":
+            db.metadata.drop_all(engine)
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Due-queue poll cost as sent wish history grows.
+
+Usage:
+    python -m benchmarks.due_queue [--sizes 10000,100000,1000000] [--pending 200]
+
+Bulk-loads N already-sent wishes plus a fixed set of pending ones into a
+throwaway SQLite database, then times one dispatcher poll (backlog count +
+first batch) with and without the ix_wishes_due partial index.
+"""
+import argparse
+from datetime import date, datetime, timedelta
+
+from ._common import make_app, timed
+
+def _insert_wishes(db, Wish, start, count, sent_at, scheduled_for, chunk=10000):
+    for offset in range(start, start + count, chunk):
+        rows = [
+            dict(user_id=1, friend_id=1, title="bench", body="bench", tone="warm",
+                 is_time_capsule=False, scheduled_for=scheduled_for, sent_at=sent_at,
+                 reveal_token=f"bench-{i}")
+            for i in range(offset, min(offset + chunk, start + count))
+        ]
+        db.session.execute(Wish.__table__.insert(), rows)
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated sent-history sizes.")
+    parser.add_argument("--pending", type=int, default=200, help="Unsent due wishes kept in the queue.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    from app.extensions import db
+    from app.models import User, Friend, Wish
+    from app.scheduler import due_wishes_filter
+
+    with app.app_context():
+        db.session.add(User(id=1, name="Bench", email="bench@bwh.local", password_hash="x"))
+        db.session.add(Friend(id=1, user_id=1, full_name="Bench Friend", birth_date=date(1990, 1, 1)))
+        db.session.commit()
+
+        now = datetime.utcnow()
+        _insert_wishes(db, Wish, 0, args.pending, None, now - timedelta(minutes=5))
+        due = due_wishes_filter(now)
+        batch_size = app.config["SCHEDULER_BATCH_SIZE"]
+
+        def poll():
+            db.session.query(db.func.count(Wish.id)).filter(*due).scalar()
+            db.session.query(Wish.id, Wish.scheduled_for).filter(*due).order_by(
+                Wish.scheduled_for.asc(), Wish.id.asc()
+            ).limit(batch_size).all()
+            db.session.rollback()
+
+        print(f"{'sent rows':>12} {'indexed ms':>12} {'full scan ms':>14}")
+        loaded = 0
+        for size in (int(s) for s in args.sizes.split(",")):
+            _insert_wishes(db, Wish, args.pending + loaded, size - loaded, now - timedelta(days=1), now - timedelta(days=1))
+            loaded = size
+
+            indexed = timed(poll, args.repeat)
+            db.session.execute(db.text("DROP INDEX ix_wishes_due"))
+            db.session.commit()
+            full_scan = timed(poll, args.repeat)
+            db.session.execute(db.text(
+                "CREATE INDEX ix_wishes_due ON wishes (scheduled_for, id) WHERE sent_at IS NULL"
+            ))
+            db.session.commit()
+
+            print(f"{size:>12,} {indexed:>12.2f} {full_scan:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Login throughput against the latency of other pages while logins hammer the server.
+
+Usage:
+    python -m benchmarks.login [--modes inline,pool] [--login-threads 16] [--probe-threads 2]
+                               [--seconds 10] [--workers 2] [--max-pending 8]
+
+Serves the app from a threaded WSGI server and, for each mode, runs
+`--login-threads` clients posting logins back to back while `--probe-threads`
+logged-in clients fetch the dashboard. `inline` hashes on the request thread
+(PASSWORD_HASH_WORKERS=0); `pool` uses the hashing process pool, which sheds
+logins over `--max-pending` with a 503.
+"""
+import argparse
+import http.client
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from werkzeug.serving import make_server
+
+from ._common import make_app
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def _request(port, method, path, body=None, cookie=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"} if body else {}
+    if cookie:
+        headers["Cookie"] = cookie
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status, response.getheader("Set-Cookie")
+    finally:
+        conn.close()
+
+def run_mode(port, login_threads, probe_threads, seconds):
+    login_body = urlencode({"email": EMAIL, "password": PASSWORD})
+    status, set_cookie = _request(port, "POST", "/login", login_body)
+    if status != 302:
+        raise RuntimeError(f"Benchmark login returned {status}")
+    cookie = set_cookie.split(";", 1)[0]
+
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    counts = {"logins": 0, "rejected": 0, "errors": 0}
+    probe_latencies = []
+
+    def login_client():
+        done = rejected = errors = 0
+        while time.monotonic() < stop:
+            status, _ = _request(port, "POST", "/login", login_body)
+            if status == 302:
+                done += 1
+            elif status == 503:
+                rejected += 1
+                # Honour Retry-After loosely so the shed path isn't a busy loop
+                time.sleep(0.05)
+            else:
+                errors += 1
+        with lock:
+            counts["logins"] += done
+            counts["rejected"] += rejected
+            counts["errors"] += errors
+
+    def probe_client():
+        latencies = []
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            status, _ = _request(port, "GET", "/dashboard", cookie=cookie)
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+        with lock:
+            probe_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=login_client) for _ in range(login_threads)]
+    threads += [threading.Thread(target=probe_client) for _ in range(probe_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts, probe_latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="inline,pool")
+    parser.add_argument("--login-threads", type=int, default=16)
+    parser.add_argument("--probe-threads", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2, help="Hashing processes in pool mode.")
+    parser.add_argument("--max-pending", type=int, default=8)
+    args = parser.parse_args()
+
+    app = make_app(WTF_CSRF_ENABLED=False)
+    from app.extensions import db
+    from app.hashing import HashPool
+    from app.models import User
+
+    with app.app_context():
+        user = User(name="Bench", email=EMAIL)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{'mode':>7} {'logins/s':>9} {'503/s':>7} {'errors':>7} {'dash p50':>9} {'dash p95':>9} {'dash p99':>9}")
+    for mode in args.modes.split(","):
+        pool = HashPool(
+            args.workers if mode == "pool" else 0, args.max_pending,
+            app.config["PASSWORD_HASH_TIMEOUT"], app.config["PASSWORD_HASH_RETRY_AFTER"],
+        )
+        app.extensions["hash_pool"] = pool
+        counts, latencies = run_mode(server.port, args.login_threads, args.probe_threads, args.seconds)
+        pool.shutdown()
+        print(
+            f"{mode:>7} {counts['logins'] / args.seconds:>9.1f} {counts['rejected'] / args.seconds:>7.1f} "
+            f"{counts['errors']:>7} {_percentile(latencies, 50):>9.1f} {_percentile(latencies, 95):>9.1f} "
+            f"{_percentile(latencies, 99):>9.1f}"
+        )
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Per-route latency, throughput and SQL query counts against a generated dataset.
+
+Usage:
+    python -m benchmarks.routes [--scale 1k|100k|1m] [--requests 200] [--out results.json]
+                                [--baseline previous.json] [--no-fragment-cache]
+
+Builds a throwaway SQLite database with `--scale` friends, wishes and card
+contributions for one account (see app/seeding.py), then drives every page through the
+Flask test client as the logged-in owner or an anonymous visitor, plus the
+scheduler tick. Prints a table and optionally writes JSON for comparing commits;
+`--baseline` prints the p95 change against an earlier JSON file.
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy import event
+
+from ._common import make_app
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# (name, path, logged in)
+ROUTES = [
+    ("auth.home", "/", False),
+    ("auth.login", "/login", False),
+    ("auth.register", "/register", False),
+    ("dashboard.index", "/dashboard", True),
+    ("friends.list_friends", "/friends/", True),
+    ("friends.view_friend", "/friends/2", True),
+    ("friends.create_friend", "/friends/create", True),
+    ("friends.edit_friend", "/friends/2/edit", True),
+    ("wishes.list_wishes", "/wishes/", True),
+    ("wishes.view_wish", "/wishes/1", True),
+    ("wishes.create_wish", "/wishes/create", True),
+    ("wishes.edit_wish", "/wishes/1/edit", True),
+    ("wishes.public_reveal", "/wishes/reveal/seed-wish-1", False),
+    ("templates.list_templates", "/templates/", True),
+    ("templates.create_template", "/templates/create", True),
+    ("templates.edit_template", "/templates/1/edit", True),
+    ("group_cards.list_cards", "/cards/", True),
+    ("group_cards.view_card", "/cards/1", True),
+    ("group_cards.create_card", "/cards/create", True),
+    ("group_cards.public_card", "/cards/share/seed-card-1", False),
+]
+
+# Due wishes re-armed before every scheduler tick sample
+TICK_WISHES = 100
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def _summarize(latencies, queries):
+    total = sum(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "rps": round(len(latencies) / (total / 1000), 1) if total else 0.0,
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+    }
+
+def bench_route(client, counter, path, requests, warmup):
+    latencies, queries = [], []
+    for i in range(warmup + requests):
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.get(path)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(counter.count)
+    return _summarize(latencies, queries)
+
+def bench_scheduler_tick(app, counter, requests, warmup):
+    from app.delivery import deliver_pending
+    from app.extensions import db
+    from app.models import OutboxMessage, Wish
+    from app.scheduler import process_due_wishes
+
+    latencies, queries = [], []
+    with app.app_context():
+        ids = [row.id for row in db.session.query(Wish.id).order_by(Wish.id.desc()).limit(TICK_WISHES)]
+        for i in range(warmup + requests):
+            # Re-arm outside the timed section
+            db.session.query(OutboxMessage).filter(OutboxMessage.wish_id.in_(ids)).delete(synchronize_session=False)
+            db.session.query(Wish).filter(Wish.id.in_(ids)).update(
+                {Wish.sent_at: None, Wish.scheduled_for: datetime.utcnow() - timedelta(minutes=1)},
+                synchronize_session=False,
+            )
+            db.session.commit()
+
+            counter.count = 0
+            started = time.perf_counter()
+            process_due_wishes()
+            deliver_pending()
+            elapsed = (time.perf_counter() - started) * 1000
+            if i >= warmup:
+                latencies.append(elapsed)
+                queries.append(counter.count)
+    return _summarize(latencies, queries)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="Rows each of friends, wishes and contributions.")
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per route.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--out", help="Write results as JSON to this path.")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare p95 latency against.")
+    parser.add_argument("--no-fragment-cache", action="store_true", help="Measure with the fragment cache disabled.")
+    args = parser.parse_args()
+
+    app = make_app(WTF_CSRF_ENABLED=False, MAIL_BACKEND="console")
+    logging.getLogger(app.logger.name).setLevel(logging.WARNING)
+    from app.cache import NullCache
+    from app.extensions import db
+    from app.seeding import SEED_PASSWORD, SeedSpec, seed
+
+    if args.no_fragment_cache:
+        app.extensions["fragment_cache"] = NullCache()
+
+    rows = SCALES[args.scale]
+    started = time.perf_counter()
+    # One heavy account; card 1 is viral and about as many contributions as rows overall
+    spec = SeedSpec(
+        users=1, friends_per_user=rows, wishes_per_user=rows, templates_per_user=50,
+        cards_per_user=max(1, rows // 100), contributions_per_card=50, batch_size=10_000,
+    )
+    with app.app_context():
+        counts = seed(spec, fast=True)
+        counter = QueryCounter(db.engine)
+    print(f"Generated {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    owner, anonymous = app.test_client(), app.test_client()
+    if owner.post("/login", data=dict(email="seed-user-1@example.com", password=SEED_PASSWORD)).status_code != 302:
+        raise RuntimeError("Could not log in as the benchmark user")
+
+    results = {}
+    for name, path, logged_in in ROUTES:
+        results[name] = bench_route(owner if logged_in else anonymous, counter, path, args.requests, args.warmup)
+        print(f"{name:<28} done", file=sys.stderr)
+    results["scheduler.tick"] = bench_scheduler_tick(app, counter, max(args.requests // 10, 5), 1)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["routes"]
+
+    print(f"{'route':<28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8}" + (f" {'p95 vs base':>12}" if baseline else ""))
+    for name, r in results.items():
+        line = f"{name:<28} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['rps']:>8.0f} {r['queries_per_request']:>8.1f}"
+        if name in baseline:
+            line += f" {(r['p95_ms'] / baseline[name]['p95_ms'] - 1) * 100:>+11.1f}%"
+        print(line)
+
+    if args.out:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "scale": args.scale,
+                "rows": counts,
+                "requests": args.requests,
+                "fragment_cache": not args.no_fragment_cache,
+                "python": platform.python_version(),
+                "sqlalchemy": sqlalchemy.__version__,
+            },
+            "routes": results,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
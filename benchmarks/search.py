@@ -0,0 +1,177 @@
+"""Full-text search latency over a large index.
+
+Usage:
+    python -m benchmarks.search [--docs 1000000] [--users 1000] [--repeat 20] [--rebuild]
+
+Loads `--docs` documents (about 60% wishes, 29% card contributions, 10%
+friends, 1% templates) spread evenly over `--users` accounts, into a throwaway
+SQLite database. The text is drawn from a Zipf-distributed vocabulary, so
+some terms are in most documents and others in a handful. Rows go through the
+index triggers, so the load rate includes incremental indexing. Then, for
+random users, it times one page of results for common, mid-frequency and rare
+terms, a two-term query, a 3-letter prefix, a kind-filtered query and a second
+page. `--rebuild` also times `flask search rebuild`.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime
+
+from ._common import make_app
+
+SYLLABLES = ["ba", "ke", "lo", "mi", "nu", "ra", "so", "ti", "ve", "zo", "pa", "ce", "du", "fi", "go", "ha"]
+VOCABULARY_SIZE = 30_000
+SHARES = {"wish": 0.60, "contribution": 0.29, "friend": 0.10, "template": 0.01}
+CARDS_PER_USER = 5
+
+def _vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    # Position in the list is the word's Zipf rank; sets are unordered, so sort before shuffling
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+class Corpus:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.words = _vocabulary(self.rng)
+        self.cumulative = []
+        total = 0.0
+        for rank in range(1, len(self.words) + 1):
+            total += 1 / rank
+            self.cumulative.append(total)
+
+    def text(self, n):
+        return " ".join(self.rng.choices(self.words, cum_weights=self.cumulative, k=n))
+
+    def term(self, rank):
+        return self.words[rank]
+
+def _load(db, models, corpus, docs, users, batch=5000, progress=None):
+    User, Friend, WishTemplate, Wish, GroupCard, CardContribution = models
+    counts = {kind: int(docs * share) for kind, share in SHARES.items()}
+    per_user = {kind: max(1, n // users) for kind, n in counts.items()}
+    now = datetime.utcnow()
+
+    def insert(table, rows):
+        rows = list(rows)
+        for start in range(0, len(rows), batch):
+            db.session.execute(table.insert(), rows[start:start + batch])
+
+    started = time.perf_counter()
+    indexed = 0
+    for user_id in range(1, users + 1):
+        friend_base = (user_id - 1) * per_user["friend"]
+        card_base = (user_id - 1) * CARDS_PER_USER
+        insert(User.__table__, [dict(id=user_id, name=f"User {user_id}", email=f"u{user_id}@bench.local",
+                                     password_hash="x", created_at=now, updated_at=now)])
+        insert(Friend.__table__, (
+            dict(id=friend_base + i + 1, user_id=user_id, full_name=corpus.text(2).title(), nickname=corpus.text(1),
+                 notes=corpus.text(12), birth_date=date(1990, 1, 1), birthday_ordinal=101,
+                 created_at=now, updated_at=now)
+            for i in range(per_user["friend"])
+        ))
+        insert(WishTemplate.__table__, (
+            dict(user_id=user_id, title=corpus.text(3), body=corpus.text(30), tone="warm",
+                 created_at=now, updated_at=now)
+            for _ in range(per_user["template"])
+        ))
+        insert(Wish.__table__, (
+            dict(user_id=user_id, friend_id=friend_base + 1 + i % per_user["friend"], title=corpus.text(4),
+                 body=corpus.text(40), tone="warm", is_time_capsule=False, reveal_token=f"bench-{user_id}-{i}",
+                 created_at=now, updated_at=now)
+            for i in range(per_user["wish"])
+        ))
+        insert(GroupCard.__table__, (
+            dict(id=card_base + i + 1, user_id=user_id, friend_id=friend_base + 1, title=f"Card {i}",
+                 theme="cloud", slug=f"bench-{user_id}-{i}", is_locked_until_bday=False, contributions_count=0,
+                 created_at=now, updated_at=now)
+            for i in range(CARDS_PER_USER)
+        ))
+        insert(CardContribution.__table__, (
+            dict(card_id=card_base + 1 + i % CARDS_PER_USER, author_name=corpus.text(1).title(),
+                 message=corpus.text(15), created_at=now, updated_at=now)
+            for i in range(per_user["contribution"])
+        ))
+        indexed += sum(per_user.values())
+        if user_id % 50 == 0 or user_id == users:
+            db.session.commit()
+            if progress:
+                progress(indexed, time.perf_counter() - started)
+    db.session.commit()
+    return indexed, time.perf_counter() - started
+
+def _time_queries(search, user_ids, query, repeat, **kwargs):
+    samples, hits = [], 0
+    for user_id in user_ids[:repeat]:
+        started = time.perf_counter()
+        page = search(user_id, query, **kwargs)
+        samples.append((time.perf_counter() - started) * 1000)
+        hits += len(page)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))], hits / len(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20, help="Users sampled per query.")
+    parser.add_argument("--rebuild", action="store_true", help="Also time a full index rebuild.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = make_app()
+    from app.extensions import db
+    from app.models import CardContribution, Friend, GroupCard, User, Wish, WishTemplate
+    from app.pagination import decode_cursor
+    from app.search import CURSOR_COLUMNS, rebuild, search
+
+    corpus = Corpus(args.seed)
+    with app.app_context():
+        def progress(n, seconds):
+            print(f"\rloaded {n:>10,} docs  {n / seconds:>8,.0f} docs/s", end="", flush=True)
+
+        indexed, seconds = _load(
+            db, (User, Friend, WishTemplate, Wish, GroupCard, CardContribution), corpus,
+            args.docs, args.users, progress=progress,
+        )
+        print(f"\rloaded {indexed:,} docs through the index triggers in {seconds:.1f}s ({indexed / seconds:,.0f} docs/s)")
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+        if args.rebuild:
+            started = time.perf_counter()
+            rebuild()
+            print(f"rebuild: {time.perf_counter() - started:.1f}s")
+
+        user_ids = random.Random(args.seed).sample(range(1, args.users + 1), min(args.repeat, args.users))
+        per_page = app.config["PAGE_SIZE"]
+
+        def second_page(user_id, query):
+            first = search(user_id, query, per_page=per_page)
+            after = decode_cursor(first.next_cursor, CURSOR_COLUMNS) if first.next_cursor else None
+            return search(user_id, query, after=after, per_page=per_page)
+
+        cases = [
+            ("common term", dict(query=corpus.term(0))),
+            ("mid term (#100)", dict(query=corpus.term(100))),
+            ("rare term (#20000)", dict(query=corpus.term(20_000))),
+            ("two terms", dict(query=f"{corpus.term(0)} {corpus.term(10)}")),
+            ("3-letter prefix", dict(query=corpus.term(5)[:3] + "*")),
+            ("common, wishes only", dict(query=corpus.term(0), kind="wish")),
+        ]
+        print(f"{'query':>22} {'p50 ms':>8} {'p95 ms':>8} {'hits/page':>10}")
+        for label, kwargs in cases:
+            p50, p95, hits = _time_queries(
+                lambda u, q, **kw: search(u, q, per_page=per_page, **kw), user_ids, kwargs.pop("query"),
+                args.repeat, **kwargs,
+            )
+            print(f"{label:>22} {p50:>8.2f} {p95:>8.2f} {hits:>10.1f}")
+        p50, p95, hits = _time_queries(second_page, user_ids, corpus.term(0), args.repeat)
+        print(f"{'common, page 1+2':>22} {p50:>8.2f} {p95:>8.2f} {hits:>10.1f}")
+
+if __name__ == "__main__":
+    main()
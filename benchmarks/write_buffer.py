@@ -0,0 +1,90 @@
+"""Public contribution throughput: per-request commits vs. the group-commit buffer.
+
+Usage:
+    python -m benchmarks.write_buffer [--writers 50,100,250,500] [--posts 4]
+
+Each writer is a thread posting `--posts` contributions to one shared card through
+the full request stack, the way a viral card is hit. Reports throughput, latency
+percentiles and failed requests (e.g. "database is locked") for both paths.
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import date
+
+from ._common import make_app
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(app, slug, writers, posts):
+    latencies, failures = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(writers)
+
+    def writer(n):
+        client = app.test_client()
+        start.wait()
+        for i in range(posts):
+            began = time.perf_counter()
+            try:
+                status = client.post(
+                    f"/cards/share/{slug}",
+                    data=dict(author_name=f"writer {n}", message=f"wish {i}", reaction="🎉"),
+                ).status_code
+            except Exception as e:
+                status = repr(e)
+            elapsed = (time.perf_counter() - began) * 1000
+            with lock:
+                (latencies if status == 302 else failures).append(elapsed if status == 302 else status)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - began
+    return len(latencies) / wall, latencies, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="50,100,250,500", help="Comma-separated concurrent writer counts.")
+    parser.add_argument("--posts", type=int, default=4, help="Contributions posted by each writer.")
+    args = parser.parse_args()
+
+    app = make_app(WTF_CSRF_ENABLED=False)
+    from app.extensions import db
+    from app.models import CardContribution, Friend, GroupCard, User
+
+    with app.app_context():
+        db.session.add(User(id=1, name="Bench", email="bench@bwh.local", password_hash="x"))
+        db.session.add(Friend(id=1, user_id=1, full_name="Bench Friend", birth_date=date(1990, 1, 1)))
+        db.session.add(GroupCard(id=1, user_id=1, friend_id=1, title="Viral", slug="viral"))
+        db.session.commit()
+
+    app.logger.disabled = True
+    print(f"{'writers':>8} {'mode':>9} {'ok/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for writers in (int(w) for w in args.writers.split(",")):
+        for buffered in (False, True):
+            app.config["CONTRIBUTION_WRITE_BUFFER"] = buffered
+            rate, latencies, failures = run(app, "viral", writers, args.posts)
+            mode = "buffered" if buffered else "direct"
+            print(
+                f"{writers:>8} {mode:>9} {rate:>8.0f} {_percentile(latencies, 50):>8.1f} "
+                f"{_percentile(latencies, 95):>8.1f} {_percentile(latencies, 99):>8.1f} {len(failures):>7}"
+            )
+            if failures:
+                print(f"{'':>8} first failure: {statistics.mode(map(str, failures))[:100]}")
+
+    with app.app_context():
+        card = db.session.get(GroupCard, 1)
+        stored = db.session.query(db.func.count(CardContribution.id)).scalar()
+        print(f"\nStored {stored} contributions; card counter says {card.contributions_count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Gunicorn settings: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Sets up prometheus_client multiprocess mode so /metrics adds up every worker
+(see app/metrics.py). Metric files are per worker pid; the directory is wiped
+at startup so counters from a previous run don't leak in.
+
+Workers are gevent by default: each live card feed (app/live_feed.py) holds its
+connection open, and a greenlet per connection lets one worker keep thousands
+of them idle. With Postgres, post_fork patches psycopg2 through psycogreen (in
+requirements.txt) so a query yields to the worker's other greenlets instead of
+blocking all of them.
+
+This is the deployment behind Nginx: gunicorn listens on localhost only and the
+app trusts one X-Forwarded-For hop, so rate limits see real client addresses.
+"""
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+# Nginx appends the client address; read by app/config.py when the workers import the app
+os.environ.setdefault("PROXY_FIX_X_FOR", "1")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+# Concurrent connections per gevent worker, live feeds included
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "5000"))
+
+# Must be in the environment before prometheus_client is first imported
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "bwh-prometheus"))
+
+from prometheus_client import multiprocess  # noqa: E402
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+def post_fork(server, worker):
+    if worker_class != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        if os.getenv("DATABASE_URL", "").startswith("postgres"):
+            server.log.error("psycogreen is not installed: every Postgres query will block the whole gevent worker")
+        return
+    patch_psycopg()
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges; its counters and histograms keep counting
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,47 @@
+"""group card counters
+
+Revision ID: 1c8f5a3e9d42
+Revises: e6a04c9d3b18
+Create Date: 2026-10-18 18:02:55.640219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c8f5a3e9d42'
+down_revision = 'e6a04c9d3b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('group_cards', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('contributions_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('card_reaction_counts',
+    sa.Column('card_id', sa.Integer(), nullable=False),
+    sa.Column('reaction', sa.String(length=10), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['card_id'], ['group_cards.id'], ),
+    sa.PrimaryKeyConstraint('card_id', 'reaction')
+    )
+
+    # Backfill both counters from the existing contribution rows
+    op.execute(
+        'UPDATE group_cards SET contributions_count = '
+        '(SELECT COUNT(*) FROM card_contributions WHERE card_contributions.card_id = group_cards.id)'
+    )
+    op.execute(
+        'INSERT INTO card_reaction_counts (card_id, reaction, count) '
+        'SELECT card_id, reaction, COUNT(*) FROM card_contributions '
+        'WHERE reaction IS NOT NULL GROUP BY card_id, reaction'
+    )
+
+
+def downgrade():
+    op.drop_table('card_reaction_counts')
+
+    with op.batch_alter_table('group_cards', schema=None) as batch_op:
+        batch_op.drop_column('contributions_count')
@@ -0,0 +1,28 @@
+"""user calendar token
+
+Revision ID: 1dab501f78e1
+Revises: 8a5c3f1e7b26
+Create Date: 2026-10-18 20:04:51.306218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1dab501f78e1'
+down_revision = '8a5c3f1e7b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('calendar_token', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_users_calendar_token'), ['calendar_token'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_calendar_token'))
+        batch_op.drop_column('calendar_token')
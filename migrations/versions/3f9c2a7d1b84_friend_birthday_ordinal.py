@@ -0,0 +1,43 @@
+"""friend birthday ordinal
+
+Revision ID: 3f9c2a7d1b84
+Revises: 76531b1ec65b
+Create Date: 2026-10-18 09:12:41.530118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b84'
+down_revision = '76531b1ec65b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('birthday_ordinal', sa.Integer(), nullable=True))
+
+    # Backfill MMDD from birth_date in a single set-based UPDATE
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "UPDATE friends SET birthday_ordinal = "
+            "CAST(strftime('%m', birth_date) AS INTEGER) * 100 + CAST(strftime('%d', birth_date) AS INTEGER)"
+        )
+    else:
+        op.execute(
+            "UPDATE friends SET birthday_ordinal = "
+            "CAST(EXTRACT(MONTH FROM birth_date) AS INTEGER) * 100 + CAST(EXTRACT(DAY FROM birth_date) AS INTEGER)"
+        )
+
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.alter_column('birthday_ordinal', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_friends_user_birthday_ordinal', ['user_id', 'birthday_ordinal'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.drop_index('ix_friends_user_birthday_ordinal')
+        batch_op.drop_column('birthday_ordinal')
@@ -0,0 +1,56 @@
+"""keyset pagination indexes
+
+Revision ID: 4d7e2a9c61f0
+Revises: 1c8f5a3e9d42
+Create Date: 2026-10-18 18:40:12.803114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d7e2a9c61f0'
+down_revision = '1c8f5a3e9d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('card_contributions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_card_contributions_card_id'))
+        batch_op.create_index('ix_card_contributions_card_created_at_id', ['card_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.create_index('ix_friends_user_full_name_id', ['user_id', 'full_name', 'id'], unique=False)
+
+    with op.batch_alter_table('group_cards', schema=None) as batch_op:
+        batch_op.create_index('ix_group_cards_friend_created_at_id', ['friend_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_group_cards_user_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('wish_templates', schema=None) as batch_op:
+        batch_op.create_index('ix_wish_templates_user_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('wishes', schema=None) as batch_op:
+        batch_op.create_index('ix_wishes_friend_created_at_id', ['friend_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_wishes_user_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('wishes', schema=None) as batch_op:
+        batch_op.drop_index('ix_wishes_user_created_at_id')
+        batch_op.drop_index('ix_wishes_friend_created_at_id')
+
+    with op.batch_alter_table('wish_templates', schema=None) as batch_op:
+        batch_op.drop_index('ix_wish_templates_user_created_at_id')
+
+    with op.batch_alter_table('group_cards', schema=None) as batch_op:
+        batch_op.drop_index('ix_group_cards_user_created_at_id')
+        batch_op.drop_index('ix_group_cards_friend_created_at_id')
+
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.drop_index('ix_friends_user_full_name_id')
+
+    with op.batch_alter_table('card_contributions', schema=None) as batch_op:
+        batch_op.drop_index('ix_card_contributions_card_created_at_id')
+        batch_op.create_index(batch_op.f('ix_card_contributions_card_id'), ['card_id'], unique=False)
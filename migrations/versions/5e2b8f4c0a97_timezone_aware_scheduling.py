@@ -0,0 +1,64 @@
+"""timezone aware scheduling
+
+Revision ID: 5e2b8f4c0a97
+Revises: c47e19b8d2a6
+Create Date: 2026-10-18 13:25:48.106342
+
+"""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2b8f4c0a97'
+down_revision = 'c47e19b8d2a6'
+branch_labels = None
+depends_on = None
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or 'Europe/Dublin')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('Europe/Dublin')
+
+
+def upgrade():
+    with op.batch_alter_table('wishes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('scheduled_local', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.create_index('ix_friends_user_timezone_birthday_ordinal', ['user_id', 'timezone', 'birthday_ordinal'], unique=False)
+
+    # Until now the form value was stored as-is and compared against UTC, so it is
+    # the wall-clock time the user meant. Keep it as scheduled_local everywhere...
+    op.execute('UPDATE wishes SET scheduled_local = scheduled_for')
+
+    # ...and re-resolve still-pending wishes against the friend's timezone.
+    bind = op.get_bind()
+    pending = bind.execute(sa.text(
+        'SELECT wishes.id, wishes.scheduled_local, friends.timezone FROM wishes '
+        'JOIN friends ON friends.id = wishes.friend_id '
+        'WHERE wishes.sent_at IS NULL AND wishes.scheduled_local IS NOT NULL'
+    )).fetchall()
+    reschedule = sa.text('UPDATE wishes SET scheduled_for = :utc WHERE id = :id').bindparams(
+        sa.bindparam('utc', type_=sa.DateTime()),
+    )
+    for wish_id, local_dt, zone_name in pending:
+        if isinstance(local_dt, str):  # SQLite hands back text
+            local_dt = datetime.fromisoformat(local_dt)
+        utc_dt = local_dt.replace(tzinfo=_zone(zone_name)).astimezone(timezone.utc).replace(tzinfo=None)
+        bind.execute(reschedule, {'utc': utc_dt, 'id': wish_id})
+
+
+def downgrade():
+    op.execute('UPDATE wishes SET scheduled_for = scheduled_local WHERE sent_at IS NULL AND scheduled_local IS NOT NULL')
+
+    with op.batch_alter_table('friends', schema=None) as batch_op:
+        batch_op.drop_index('ix_friends_user_timezone_birthday_ordinal')
+
+    with op.batch_alter_table('wishes', schema=None) as batch_op:
+        batch_op.drop_column('scheduled_local')
@@ -0,0 +1,28 @@
+"""cache versions
+
+Revision ID: 8a5c3f1e7b26
+Revises: 4d7e2a9c61f0
+Create Date: 2026-10-18 19:21:37.114092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a5c3f1e7b26'
+down_revision = '4d7e2a9c61f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,29 @@
+"""scheduler leases
+
+Revision ID: a81d5e0c6f23
+Revises: 3f9c2a7d1b84
+Create Date: 2026-10-18 10:02:17.284511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81d5e0c6f23'
+down_revision = '3f9c2a7d1b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduler_leases',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('holder', sa.String(length=120), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_leases')
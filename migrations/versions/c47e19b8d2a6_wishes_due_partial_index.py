@@ -0,0 +1,30 @@
+"""wishes due partial index
+
+Revision ID: c47e19b8d2a6
+Revises: a81d5e0c6f23
+Create Date: 2026-10-18 11:40:03.771925
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e19b8d2a6'
+down_revision = 'a81d5e0c6f23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('wishes', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_wishes_due', ['scheduled_for', 'id'], unique=False,
+            sqlite_where=sa.text('sent_at IS NULL'),
+            postgresql_where=sa.text('sent_at IS NULL'),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('wishes', schema=None) as batch_op:
+        batch_op.drop_index('ix_wishes_due')
@@ -0,0 +1,26 @@
+"""card contributions card_id index
+
+Revision ID: e6a04c9d3b18
+Revises: 9b3d6e21f7c5
+Create Date: 2026-10-18 16:44:10.517730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a04c9d3b18'
+down_revision = '9b3d6e21f7c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('card_contributions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_card_contributions_card_id'), ['card_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('card_contributions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_card_contributions_card_id'))
@@ -0,0 +1,97 @@
+"""full text search
+
+Revision ID: f1d06142a196
+Revises: 1dab501f78e1
+Create Date: 2026-10-18 22:41:07.512894
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d06142a196'
+down_revision = '1dab501f78e1'
+branch_labels = None
+depends_on = None
+
+
+# (kind, code, table, re-indexing columns, owner, title, body, parent); see app/search.py
+SOURCES = (
+    ('friend', 0, 'friends', 'user_id, full_name, nickname, notes', '{row}.user_id', '{row}.full_name',
+     "COALESCE({row}.nickname, '') || ' ' || COALESCE({row}.notes, '')", 'NULL'),
+    ('wish', 1, 'wishes', 'user_id, title, body', '{row}.user_id', '{row}.title', '{row}.body', 'NULL'),
+    ('template', 2, 'wish_templates', 'user_id, title, body', '{row}.user_id', '{row}.title', '{row}.body', 'NULL'),
+    ('contribution', 3, 'card_contributions', 'card_id, author_name, message',
+     '(SELECT user_id FROM group_cards WHERE group_cards.id = {row}.card_id)',
+     '{row}.author_name', '{row}.message', '{row}.card_id'),
+)
+
+
+def _select(source, row, sqlite):
+    kind, code, _, _, owner, title, body, parent = (
+        part.format(row=row) if isinstance(part, str) else part for part in source
+    )
+    if sqlite:
+        owner = f"'u' || {owner}"
+    return f"{row}.id * 4 + {code}, {owner}, '{kind}', {title}, {body}, {row}.id, {parent}"
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        op.execute(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "owner, kind, title, body, ref_id UNINDEXED, parent_id UNINDEXED, "
+            "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        columns = 'rowid, owner, kind, title, body, ref_id, parent_id'
+        for source in SOURCES:
+            code, table, watched = source[1], source[2], source[3]
+            insert = f"INSERT INTO search_index ({columns}) SELECT {_select(source, 'NEW', True)}"
+            delete = f"DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code}"
+            op.execute(f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {insert}; END")
+            op.execute(f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF {watched} ON {table} BEGIN {delete}; {insert}; END")
+            op.execute(f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN {delete}; END")
+            op.execute(f"INSERT INTO search_index ({columns}) SELECT {_select(source, 'src', True)} FROM {table} AS src")
+        op.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+        return
+
+    op.execute(
+        "CREATE TABLE search_documents ("
+        "id BIGINT PRIMARY KEY, user_id INTEGER NOT NULL, kind VARCHAR(20) NOT NULL, "
+        "title TEXT NOT NULL, body TEXT NOT NULL, ref_id INTEGER NOT NULL, parent_id INTEGER, "
+        "document TSVECTOR GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')) STORED)"
+    )
+    columns = 'id, user_id, kind, title, body, ref_id, parent_id'
+    for source in SOURCES:
+        code, table, watched = source[1], source[2], source[3]
+        op.execute(
+            f"CREATE FUNCTION {table}_search_sync() RETURNS trigger AS $$ BEGIN "
+            f"IF TG_OP IN ('UPDATE', 'DELETE') THEN DELETE FROM search_documents WHERE id = OLD.id * 4 + {code}; END IF; "
+            f"IF TG_OP IN ('INSERT', 'UPDATE') THEN INSERT INTO search_documents ({columns}) "
+            f"SELECT {_select(source, 'NEW', False)}; END IF; "
+            "RETURN NULL; END $$ LANGUAGE plpgsql"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_search_sync AFTER INSERT OR DELETE OR UPDATE OF {watched} "
+            f"ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_search_sync()"
+        )
+        op.execute(f"INSERT INTO search_documents ({columns}) SELECT {_select(source, 'src', False)} FROM {table} AS src")
+    # Built after the backfill: one bulk GIN build is far cheaper than a million inserts into it
+    op.create_index('ix_search_documents_document', 'search_documents', ['document'], postgresql_using='gin')
+    op.create_index('ix_search_documents_user_id', 'search_documents', ['user_id'])
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for source in SOURCES:
+        table = source[2]
+        if sqlite:
+            for action in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER {table}_search_{action}")
+        else:
+            op.execute(f"DROP TRIGGER {table}_search_sync ON {table}")
+            op.execute(f"DROP FUNCTION {table}_search_sync()")
+    op.execute('DROP TABLE search_index' if sqlite else 'DROP TABLE search_documents')
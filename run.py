@@ -1,6 +1,10 @@
 from app import create_app
+from app.scheduler import start_scheduler
 
-app = create_app()
-
+# `flask --app run.py` finds the create_app factory. Building the app only under
+# __main__ keeps the password-hashing pool's spawned children, which re-import
+# this script, from running create_app() themselves.
 if __name__ == "__main__":
+    app = create_app()
+    start_scheduler(app)
     app.run()
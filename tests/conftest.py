@@ -0,0 +1,54 @@
+import os
+from datetime import date
+
+import pytest
+
+# Config reads the environment at import time, so set it before importing the app
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["PROXY_FIX_X_FOR"] = "0"
+
+from app import create_app  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Friend, GroupCard, User  # noqa: E402
+
+@pytest.fixture
+def make_app(monkeypatch):
+    """Build an app on a fresh in-memory database, with Config overrides."""
+    def make(**config):
+        for key, value in config.items():
+            monkeypatch.setattr(Config, key, value)
+        app = create_app()
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        with app.app_context():
+            db.create_all()
+        return app
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def card(app):
+    """(user id, friend id, card slug) of an open group card."""
+    with app.app_context():
+        user = User(name="Ann", email="ann@example.com", password_hash="x")
+        friend = Friend(owner=user, full_name="Bea", birth_date=date(1990, 6, 15), timezone="UTC")
+        card = GroupCard(owner=user, friend=friend, title="Happy birthday Bea")
+        db.session.add(card)
+        db.session.commit()
+        return user.id, friend.id, card.slug
+
+@pytest.fixture
+def login():
+    """Sign `client` in as `user_id` without going through the password form."""
+    def login(client, user_id):
+        with client.application.app_context():
+            session_id = db.session.get(User, user_id).get_id()
+        with client.session_transaction() as session:
+            session["_user_id"] = session_id
+            session["_fresh"] = True
+    return login
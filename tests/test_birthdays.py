@@ -0,0 +1,39 @@
+from datetime import date, datetime, timezone
+
+from app.extensions import db
+from app.models import Friend, User, Wish
+from app.utils import DEFAULT_TIMEZONE
+
+# 12:30 UTC on March 10th is already March 11th in Kiritimati (UTC+14) and
+# still March 10th in Pago Pago (UTC-11)
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+def test_upcoming_birthdays_count_from_each_friends_local_date(app):
+    with app.app_context():
+        user = User(name="Ann", email="ann@example.com", password_hash="x")
+        db.session.add_all([
+            Friend(owner=user, full_name="Kiri", birth_date=date(1990, 3, 10), timezone="Pacific/Kiritimati"),
+            Friend(owner=user, full_name="Pago", birth_date=date(1990, 3, 10), timezone="Pacific/Pago_Pago"),
+            Friend(owner=user, full_name="Utc", birth_date=date(1990, 3, 12), timezone="UTC"),
+        ])
+        db.session.commit()
+
+        upcoming = Friend.upcoming_birthdays(user.id, limit=3, now=NOW)
+        assert [f.full_name for f in upcoming] == ["Pago", "Utc", "Kiri"]
+        assert [f.days_until_birthday(f.local_today(NOW)) for f in upcoming] == [0, 2, 364]
+        assert [f.full_name for f in Friend.birthdays_today(user.id, now=NOW)] == ["Pago"]
+
+def test_wish_page_falls_back_to_the_default_timezone(app, login):
+    with app.app_context():
+        user = User(name="Ann", email="ann@example.com", password_hash="x")
+        friend = Friend(owner=user, full_name="Bea", birth_date=date(1990, 6, 15), timezone=None)
+        wish = Wish(owner=user, friend=friend, title="Hi", body="Happy birthday")
+        wish.schedule(datetime(2026, 6, 15, 9, 0), None)
+        db.session.add(wish)
+        db.session.commit()
+        user_id, wish_id = user.id, wish.id
+
+    client = app.test_client()
+    login(client, user_id)
+    page = client.get(f"/wishes/{wish_id}").get_data(as_text=True)
+    assert f"({DEFAULT_TIMEZONE})" in page
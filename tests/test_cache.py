@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+
+from app.cache import cached_fragment, current_versions
+from app.extensions import db
+from app.models import CardContribution, Friend, GroupCard, Wish
+
+@pytest.fixture
+def app(make_app):
+    return make_app(FRAGMENT_CACHE_BACKEND="memory")
+
+def _versions(app, *scopes):
+    with app.app_context():
+        return dict(zip(scopes, current_versions(list(scopes))))
+
+def _bumped(before, after):
+    return {scope for scope in before if after[scope] > before[scope]}
+
+def test_contribution_bumps_its_card_and_friend(app, card):
+    user_id, friend_id, slug = card
+    with app.app_context():
+        card_id = GroupCard.query.filter_by(slug=slug).one().id
+    scopes = (f"user:{user_id}", f"friend:{friend_id}", f"card:{card_id}")
+    before = _versions(app, *scopes)
+    with app.app_context():
+        db.session.add(CardContribution(card_id=card_id, author_name="Cy", message="Happy day!"))
+        db.session.commit()
+    assert _bumped(before, _versions(app, *scopes)) == {f"friend:{friend_id}", f"card:{card_id}"}
+
+def test_moving_a_wish_bumps_both_friends(app, card):
+    user_id, friend_id, _ = card
+    with app.app_context():
+        other = Friend(user_id=user_id, full_name="Cy", birth_date=date(1991, 1, 1), timezone="UTC")
+        wish = Wish(user_id=user_id, friend_id=friend_id, title="Hi", body="Happy birthday")
+        db.session.add_all([other, wish])
+        db.session.commit()
+        other_id, wish_id = other.id, wish.id
+
+    scopes = (f"user:{user_id}", f"friend:{friend_id}", f"friend:{other_id}")
+    before = _versions(app, *scopes)
+    with app.app_context():
+        db.session.get(Wish, wish_id).friend_id = other_id
+        db.session.commit()
+    assert _bumped(before, _versions(app, *scopes)) == set(scopes)
+
+def test_rolled_back_change_keeps_versions(app, card):
+    user_id, friend_id, _ = card
+    scopes = (f"user:{user_id}", f"friend:{friend_id}")
+    before = _versions(app, *scopes)
+    with app.app_context():
+        db.session.get(Friend, friend_id).full_name = "Beatrice"
+        db.session.flush()
+        db.session.rollback()
+    assert _versions(app, *scopes) == before
+
+def test_cached_fragment_renders_again_after_a_change(app, card):
+    _, friend_id, _ = card
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f"<p>{len(renders)}</p>"
+
+    with app.test_request_context("/friends/1"):
+        assert cached_fragment("wall", [f"friend:{friend_id}"], render) == "<p>1</p>"
+        assert cached_fragment("wall", [f"friend:{friend_id}"], render) == "<p>1</p>"
+        # Other extra parts are a different fragment
+        assert cached_fragment("wall", [f"friend:{friend_id}"], render, "2026-03-10") == "<p>2</p>"
+
+        db.session.get(Friend, friend_id).nickname = "B"
+        db.session.commit()
+        assert cached_fragment("wall", [f"friend:{friend_id}"], render) == "<p>3</p>"
+    assert len(renders) == 3
@@ -0,0 +1,42 @@
+import pytest
+
+from app.calendar_feed import rotate_token
+from app.extensions import db
+from app.models import Friend, User
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    # A file database, so a second app can stand in for another worker
+    return make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}")
+
+def _token(app, user_id):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        token = rotate_token(user)
+        db.session.commit()
+        return token
+
+def test_rotated_token_stops_working_in_other_workers(app, make_app, card, login):
+    # Same database, its own memory cache
+    other_worker = make_app()
+
+    user_id, _, _ = card
+    old = _token(app, user_id)
+    assert other_worker.test_client().get(f"/friends/calendar.ics?token={old}").status_code == 200
+
+    client = app.test_client()
+    login(client, user_id)
+    client.post("/friends/calendar/token")
+    assert other_worker.test_client().get(f"/friends/calendar.ics?token={old}").status_code == 404
+
+def test_friend_changes_reach_a_cached_feed(app, card):
+    user_id, friend_id, _ = card
+    token = _token(app, user_id)
+    client = app.test_client()
+    first = client.get(f"/friends/calendar.ics?token={token}")
+    assert "Bea" in first.get_data(as_text=True)
+
+    with app.app_context():
+        db.session.get(Friend, friend_id).full_name = "Beatrice"
+        db.session.commit()
+    assert "Beatrice" in client.get(f"/friends/calendar.ics?token={token}").get_data(as_text=True)
@@ -0,0 +1,37 @@
+from sqlalchemy import update
+
+from app.counters import repair_card_counters
+from app.extensions import db
+from app.models import CardContribution, CardReactionCount, GroupCard
+
+def _reactions(card_id):
+    return dict(db.session.execute(
+        db.select(CardReactionCount.reaction, CardReactionCount.count).where(CardReactionCount.card_id == card_id)
+    ).all())
+
+def test_repair_counts_reaction_drift(app, card):
+    with app.app_context():
+        card = GroupCard.query.one()
+        for reaction in ("🎉", "🎉", "❤️"):
+            db.session.add(CardContribution(card=card, author_name="Cy", message="Hi", reaction=reaction))
+        db.session.commit()
+        assert repair_card_counters().reactions == 1  # built from nothing: the fixture skipped record_contributions
+        assert repair_card_counters().reactions == 0
+
+        # Wrong tally, and a tally for a reaction nobody left; the total is right
+        db.session.execute(update(CardReactionCount).where(CardReactionCount.reaction == "🎉").values(count=7))
+        db.session.add(CardReactionCount(card_id=card.id, reaction="🎂", count=1))
+        db.session.commit()
+
+        result = repair_card_counters()
+        assert (result.totals, result.reactions) == (0, 1)
+        assert _reactions(card.id) == {"🎉": 2, "❤️": 1}
+
+def test_repair_counts_total_drift(app, card):
+    with app.app_context():
+        card = GroupCard.query.one()
+        card.contributions_count = 5
+        db.session.commit()
+        result = repair_card_counters([card.id])
+        assert (result.totals, result.reactions) == (1, 0)
+        assert db.session.get(GroupCard, card.id).contributions_count == 0
@@ -0,0 +1,136 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.delivery import DeliveryError, Sender, deliver_pending
+from app.extensions import db
+from app.models import OutboxMessage, Wish
+
+class StubSender(Sender):
+    """Records what it sent; `failures` maps a recipient to the error to raise."""
+
+    def __init__(self):
+        self.sent = []
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        error = self.failures.get(message.recipient)
+        if error:
+            raise error
+        with self._lock:
+            self.sent.append(message.id)
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    # A file database, so concurrent calls use separate connections
+    return make_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}",
+        DELIVERY_MAX_ATTEMPTS=3, DELIVERY_BACKOFF_SECONDS=30, DELIVERY_BACKOFF_MAX_SECONDS=60,
+    )
+
+@pytest.fixture
+def sender(app):
+    sender = app.extensions["wish_sender"] = StubSender()
+    return sender
+
+def _enqueue(app, card, *recipients):
+    user_id, friend_id, _ = card
+    due = datetime.utcnow() - timedelta(seconds=1)
+    with app.app_context():
+        wish = Wish(user_id=user_id, friend_id=friend_id, title="Hi", body="Happy birthday", sent_at=due)
+        db.session.add(wish)
+        db.session.flush()
+        messages = [
+            OutboxMessage(wish_id=wish.id, recipient=recipient, subject="Hi", body="Happy birthday", next_attempt_at=due)
+            for recipient in recipients
+        ]
+        db.session.add_all(messages)
+        db.session.commit()
+        return [message.id for message in messages]
+
+def _outbox(app):
+    with app.app_context():
+        return {m.recipient: m for m in OutboxMessage.query.all()}
+
+def test_claims_and_delivers_due_rows(app, card, sender):
+    ids = _enqueue(app, card, "a@example.com", "b@example.com")
+    with app.app_context():
+        stats = deliver_pending()
+        assert (stats.claimed, stats.delivered) == (2, 2)
+        # Nothing left to claim
+        assert deliver_pending().claimed == 0
+    assert sorted(sender.sent) == ids
+    assert all(m.status == OutboxMessage.SENT and m.attempts == 1 for m in _outbox(app).values())
+
+def test_transient_failure_is_retried_with_backoff(app, card, sender):
+    _enqueue(app, card, "a@example.com")
+    sender.failures["a@example.com"] = DeliveryError("421 try later")
+    with app.app_context():
+        stats = deliver_pending()
+    assert (stats.claimed, stats.retried) == (1, 1)
+    message = _outbox(app)["a@example.com"]
+    assert message.status == OutboxMessage.PENDING
+    assert message.last_error == "421 try later"
+    assert message.next_attempt_at >= datetime.utcnow() + timedelta(seconds=25)
+
+    # Not due yet, then delivered once the backoff has passed
+    del sender.failures["a@example.com"]
+    with app.app_context():
+        assert deliver_pending().claimed == 0
+        OutboxMessage.query.update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert deliver_pending().delivered == 1
+    message = _outbox(app)["a@example.com"]
+    assert (message.status, message.attempts) == (OutboxMessage.SENT, 2)
+
+def test_permanent_failure_is_dead_lettered(app, card, sender):
+    _enqueue(app, card, "gone@example.com")
+    sender.failures["gone@example.com"] = DeliveryError("550 no such user", permanent=True)
+    with app.app_context():
+        stats = deliver_pending()
+    assert (stats.claimed, stats.dead) == (1, 1)
+    message = _outbox(app)["gone@example.com"]
+    assert (message.status, message.attempts) == (OutboxMessage.DEAD, 1)
+
+def test_gives_up_after_max_attempts(app, card, sender):
+    _enqueue(app, card, "a@example.com")
+    sender.failures["a@example.com"] = DeliveryError("421 try later")
+    with app.app_context():
+        for _ in range(3):
+            OutboxMessage.query.update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+            stats = deliver_pending()
+    assert stats.dead == 1
+    assert _outbox(app)["a@example.com"].status == OutboxMessage.DEAD
+
+def test_concurrent_calls_never_send_a_row_twice(app, card, sender):
+    ids = _enqueue(app, card, "a@example.com", "b@example.com")
+    main = threading.current_thread()
+    raced = []
+
+    def race():
+        with app.app_context():
+            raced.append(deliver_pending())
+
+    def claim_in_between(conn, cursor, statement, parameters, context, executemany):
+        # Between our SELECT and our claiming UPDATE, another worker claims,
+        # sends and commits the same rows (SQLite has no FOR UPDATE to stop it)
+        if statement.startswith("UPDATE outbox") and not raced and threading.current_thread() is main:
+            other = threading.Thread(target=race)
+            other.start()
+            other.join()
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, "before_cursor_execute", claim_in_between)
+        try:
+            stats = deliver_pending()
+        finally:
+            event.remove(engine, "before_cursor_execute", claim_in_between)
+
+    assert raced[0].claimed == 2
+    assert stats.claimed == 0
+    assert sorted(sender.sent) == ids
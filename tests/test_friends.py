@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db
+from app.models import Wish
+from app.routes import friends
+
+LOCAL = datetime(2030, 6, 15, 9, 0)
+
+@pytest.fixture
+def wishes(app, card):
+    """(pending wish id, sent wish id) for Bea, both due at 09:00 her time (UTC)."""
+    user_id, friend_id, _ = card
+    with app.app_context():
+        pending = Wish(user_id=user_id, friend_id=friend_id, title="Hi", body="Happy birthday")
+        pending.schedule(LOCAL, "UTC")
+        sent = Wish(user_id=user_id, friend_id=friend_id, title="Old", body="Last year", sent_at=datetime(2029, 6, 15, 9, 0))
+        sent.schedule(datetime(2029, 6, 15, 9, 0), "UTC")
+        db.session.add_all([pending, sent])
+        db.session.commit()
+        return pending.id, sent.id
+
+@pytest.fixture
+def woken(monkeypatch):
+    calls = []
+    monkeypatch.setattr(friends, "wake_dispatcher", lambda *wishes: calls.append([w.id for w in wishes]))
+    return calls
+
+def _edit(client, friend_id, timezone):
+    return client.post(f"/friends/{friend_id}/edit", data={
+        "full_name": "Bea", "birth_date": "1990-06-15", "timezone": timezone,
+    })
+
+def _scheduled(app, wish_id):
+    with app.app_context():
+        wish = db.session.get(Wish, wish_id)
+        return wish.scheduled_local, wish.scheduled_for
+
+def test_timezone_change_keeps_the_local_time_of_pending_wishes(app, card, wishes, woken, login):
+    user_id, friend_id, _ = card
+    pending_id, sent_id = wishes
+    sent_before = _scheduled(app, sent_id)
+    client = app.test_client()
+    login(client, user_id)
+
+    assert _edit(client, friend_id, "America/New_York").status_code == 302
+
+    # 09:00 in New York in June (EDT, UTC-4) is 13:00 UTC
+    assert _scheduled(app, pending_id) == (LOCAL, datetime(2030, 6, 15, 13, 0))
+    assert _scheduled(app, sent_id) == sent_before
+    assert woken == [[pending_id]]
+
+def test_edit_without_timezone_change_leaves_schedules_alone(app, card, wishes, woken, login):
+    user_id, friend_id, _ = card
+    pending_id, _ = wishes
+    client = app.test_client()
+    login(client, user_id)
+
+    assert _edit(client, friend_id, "UTC").status_code == 302
+    assert _scheduled(app, pending_id) == (LOCAL, datetime(2030, 6, 15, 9, 0))
+    assert woken == [[]]
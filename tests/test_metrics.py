@@ -0,0 +1,24 @@
+import pytest
+
+REMOTE = {"REMOTE_ADDR": "203.0.113.5"}
+
+@pytest.mark.parametrize("environ, headers, status", [
+    ({}, {}, 200),
+    ({"REMOTE_ADDR": "::1"}, {}, 200),
+    (REMOTE, {}, 403),
+    # Nginx on the same host connects from loopback; what it forwards is not local
+    ({}, {"X-Forwarded-For": "203.0.113.5"}, 403),
+])
+def test_without_token_only_local_scrapes_are_served(app, environ, headers, status):
+    response = app.test_client().get("/metrics", environ_base=environ, headers=headers)
+    assert response.status_code == status
+
+def test_token_is_required_from_anywhere_once_set(make_app):
+    app = make_app(METRICS_TOKEN="s3cret")
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", environ_base=REMOTE, headers={"Authorization": "Bearer wrong"}).status_code == 403
+
+    response = client.get("/metrics", environ_base=REMOTE, headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert b"# TYPE" in response.data
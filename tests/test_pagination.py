@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from app.extensions import db
+from app.models import Wish
+from app.pagination import decode_cursor, encode_cursor, paginate
+
+COLUMNS = (Wish.created_at, Wish.id)
+
+# Two wishes share every timestamp, so only the id breaks the ties
+STAMPS = [datetime(2026, 3, 10, 12, minute) for minute in (0, 0, 1, 1, 2)]
+
+@pytest.fixture
+def wish_ids(app, card):
+    user_id, friend_id, _ = card
+    with app.app_context():
+        wishes = [
+            Wish(user_id=user_id, friend_id=friend_id, title=f"Wish {i}", body="Happy birthday", created_at=stamp)
+            for i, stamp in enumerate(STAMPS)
+        ]
+        db.session.add_all(wishes)
+        db.session.commit()
+        return [wish.id for wish in wishes]
+
+def _walk(app, descending):
+    """Ids of every page, following next_cursor from the first page."""
+    pages, cursor = [], None
+    while True:
+        path = f"/wishes/?cursor={cursor}" if cursor else "/wishes/"
+        with app.test_request_context(path):
+            page = paginate(Wish.query, *COLUMNS, descending=descending, per_page=2)
+            pages.append([wish.id for wish in page])
+            assert page.is_paged == bool(cursor)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+def test_cursor_round_trips_typed_values():
+    values = [datetime(2026, 3, 10, 12, 30, 15, 123456), 42]
+    assert decode_cursor(encode_cursor(values), COLUMNS) == values
+
+@pytest.mark.parametrize("token", ["not base64!", encode_cursor([1]), encode_cursor(["yesterday", 1]), "bnVsbA"])
+def test_bad_cursor_is_a_400(token):
+    with pytest.raises(BadRequest):
+        decode_cursor(token, COLUMNS)
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_every_row_once_across_ties(app, wish_ids, descending):
+    expected = list(reversed(wish_ids)) if descending else wish_ids
+    assert _walk(app, descending) == [expected[0:2], expected[2:4], expected[4:5]]
+
+def test_rows_added_between_requests_do_not_shift_pages(app, card, wish_ids):
+    with app.test_request_context("/wishes/"):
+        first = paginate(Wish.query, *COLUMNS, descending=True, per_page=2)
+    user_id, friend_id, _ = card
+    with app.app_context():
+        db.session.add(Wish(user_id=user_id, friend_id=friend_id, title="New", body="Hi", created_at=datetime(2026, 3, 10, 13, 0)))
+        db.session.commit()
+    with app.test_request_context(f"/wishes/?cursor={first.next_cursor}"):
+        second = paginate(Wish.query, *COLUMNS, descending=True, per_page=2)
+    assert [wish.id for wish in second] == [wish_ids[2], wish_ids[1]]
+
+def test_list_view_rejects_a_tampered_cursor(app, card, login):
+    user_id, _, _ = card
+    client = app.test_client()
+    login(client, user_id)
+    assert client.get("/wishes/?cursor=garbage").status_code == 400
@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import CardContribution, Friend, GroupCard, User, Wish
+
+@pytest.fixture
+def app(make_app):
+    # Render every fragment, so cached fragments can't hide queries
+    return make_app(FRAGMENT_CACHE_BACKEND="null", RATE_LIMIT_ENABLED=False)
+
+def _seed(app, rows):
+    """A user whose list pages and first friend's page each show `rows` rows."""
+    with app.app_context():
+        user = User(name="Ann", email=f"ann{rows}@example.com", password_hash="x")
+        friends = [
+            Friend(owner=user, full_name=f"Friend {i}", birth_date=date(1990, 1 + i % 12, 1 + i % 28))
+            for i in range(rows)
+        ]
+        for i, friend in enumerate(friends):
+            db.session.add(Wish(owner=user, friend=friend, title=f"Wish {i}", body="Happy birthday!"))
+            card = GroupCard(owner=user, friend=friend, title=f"Card {i}")
+            card.contributions = [CardContribution(author_name="Cy", message="Hi", reaction="🎉")]
+            db.session.add(card)
+        # The friend page shows every wish and card of one friend
+        for i in range(rows - 1):
+            db.session.add(Wish(owner=user, friend=friends[0], title=f"Extra wish {i}", body="Hi"))
+            db.session.add(GroupCard(owner=user, friend=friends[0], title=f"Extra card {i}"))
+        db.session.commit()
+        return user.id, friends[0].id
+
+def _count_queries(app, client, path):
+    client.get(path)  # warm the per-worker user cache
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            response = client.get(path)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return len(statements)
+
+@pytest.mark.parametrize("page", ["/wishes/", "/cards/", "/friends/", "/friends/{friend_id}"])
+def test_list_pages_run_a_constant_number_of_queries(app, login, page):
+    counts = []
+    for rows in (1, 20):
+        user_id, friend_id = _seed(app, rows)
+        client = app.test_client()
+        login(client, user_id)
+        counts.append(_count_queries(app, client, page.format(friend_id=friend_id)))
+    assert counts[0] == counts[1]
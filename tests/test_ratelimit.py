@@ -0,0 +1,36 @@
+import logging
+
+from app.ratelimit import parse_limits
+
+LIMITS = "group_cards.public_card=5/minute, group_cards.public_card:slug=20/minute"
+
+def _get(client, address, slug="party"):
+    return client.get(f"/cards/share/{slug}", environ_base={"REMOTE_ADDR": address})
+
+def test_client_buckets_are_checked_before_shared_ones():
+    limits = parse_limits("group_cards.public_card:slug=20/minute, group_cards.public_card=5/minute")
+    assert [limit.scope for limit in limits["group_cards.public_card"]] == ["ip", "slug"]
+
+def test_refused_requests_do_not_drain_the_shared_bucket(make_app):
+    client = make_app(RATE_LIMITS=LIMITS).test_client()
+    statuses = [_get(client, "203.0.113.1").status_code for _ in range(100)]
+    assert statuses.count(429) == 95
+    # Only the five admitted requests spent slug tokens, so other visitors still get in
+    assert _get(client, "203.0.113.2").status_code != 429
+
+def test_shared_bucket_limits_all_clients(make_app):
+    client = make_app(RATE_LIMITS=LIMITS).test_client()
+    statuses = [_get(client, f"203.0.113.{i}").status_code for i in range(25)]
+    assert statuses.count(429) == 5
+    refused = _get(client, "203.0.113.200")
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+    assert _get(client, "203.0.113.200", slug="other").status_code != 429
+
+def test_untrusted_local_proxy_is_reported_once(make_app, caplog):
+    client = make_app(RATE_LIMITS=LIMITS).test_client()
+    with caplog.at_level(logging.ERROR, logger="app.ratelimit"):
+        for _ in range(2):
+            client.get("/cards/share/party", headers={"X-Forwarded-For": "198.51.100.7"},
+                       environ_base={"REMOTE_ADDR": "127.0.0.1"})
+    assert len([r for r in caplog.records if "PROXY_FIX_X_FOR" in r.getMessage()]) == 1
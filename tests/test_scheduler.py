@@ -0,0 +1,111 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import scheduler
+from app.extensions import db
+from app.models import SchedulerLease, Wish
+from app.scheduler import Dispatcher, acquire_lease, release_lease, wake_dispatcher
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    # A file database: the dispatcher thread works on its own connection.
+    # The safety poll is far away, so only wake-ups can get a wish out in time.
+    return make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}", SCHEDULER_POLL_SECONDS=300)
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """A fresh dispatcher in place of the process-wide one, stopped after the test."""
+    dispatcher = Dispatcher()
+    monkeypatch.setattr(scheduler, "dispatcher", dispatcher)
+    yield dispatcher
+    dispatcher.stop()
+
+def _schedule(app, card, seconds):
+    user_id, friend_id, _ = card
+    with app.app_context():
+        wish = Wish(
+            user_id=user_id, friend_id=friend_id, title="Hi", body="Happy birthday",
+            scheduled_for=datetime.utcnow() + timedelta(seconds=seconds),
+        )
+        db.session.add(wish)
+        db.session.commit()
+        return wish.id, wish.scheduled_for
+
+def _sent_at(app, wish_id, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            sent_at = db.session.get(Wish, wish_id).sent_at
+        if sent_at is not None:
+            return sent_at
+        time.sleep(0.05)
+    return None
+
+def test_lease_is_exclusive_until_released_or_expired(app):
+    with app.app_context():
+        assert acquire_lease("job", "a", 60)
+        assert acquire_lease("job", "a", 60), "the holder renews"
+        assert not acquire_lease("job", "b", 60)
+
+        # Only the holder can release
+        release_lease("job", "b")
+        assert not acquire_lease("job", "b", 60)
+        release_lease("job", "a")
+        assert acquire_lease("job", "b", 60)
+
+        # An expired lease is up for grabs
+        SchedulerLease.query.update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert acquire_lease("job", "a", 60)
+        assert SchedulerLease.query.one().holder == "a"
+
+def test_wake_sends_a_wish_scheduled_after_startup(app, card, dispatcher, monkeypatch):
+    # Without the cross-process watcher only the direct wake can fire in time
+    monkeypatch.setattr(scheduler, "_start_wake_listener", lambda app, target: None)
+    dispatcher.start(app)
+    # Let the startup tick load an empty horizon
+    time.sleep(0.3)
+    wish_id, when = _schedule(app, card, 0.5)
+    with app.app_context():
+        wake_dispatcher(db.session.get(Wish, wish_id))
+
+    sent_at = _sent_at(app, wish_id, 5)
+    assert sent_at is not None
+    assert sent_at >= when
+
+def test_commit_from_another_process_reloads_the_horizon(app, card, dispatcher):
+    dispatcher.start(app)
+    time.sleep(0.3)
+    # No wake_dispatcher call: the SQLite data_version watcher has to notice the commit
+    wish_id, _ = _schedule(app, card, 0.5)
+    assert _sent_at(app, wish_id, 5) is not None
+
+def test_wake_dispatcher_skips_a_stopped_dispatcher(app, card, dispatcher):
+    wish_id, _ = _schedule(app, card, 60)
+    with app.app_context():
+        wake_dispatcher(db.session.get(Wish, wish_id))
+    assert dispatcher._heap == []
+
+def test_stop_ends_the_loop_promptly(app, dispatcher):
+    dispatcher.start(app)
+    time.sleep(0.3)
+    started = time.monotonic()
+    dispatcher.stop()
+    dispatcher._thread.join(2)
+    assert not dispatcher._thread.is_alive()
+    assert time.monotonic() - started < 2
+
+def test_only_servers_start_the_dispatcher(make_app, dispatcher):
+    app = make_app(SCHEDULER_ENABLED=True)
+    assert not dispatcher.running
+
+    # CLI commands build the app too, but never serve a request
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["cards", "repair-counters"])
+    assert result.exit_code == 0
+    assert not dispatcher.running
+
+    app.test_client().get("/login")
+    assert dispatcher.running
@@ -0,0 +1,39 @@
+import json
+import os
+
+from sqlalchemy import text
+
+from app import slow_queries
+from app.extensions import db
+from app.slow_queries import process_log_path, read_entries
+
+def _entry(fingerprint):
+    return json.dumps({"ts": "2026-01-01T00:00:00Z", "fingerprint": fingerprint, "shape": "SELECT ?", "duration_ms": 1.0})
+
+def test_each_process_writes_its_own_file(make_app, tmp_path, monkeypatch):
+    path = str(tmp_path / "slow_queries.log")
+    app = make_app(SLOW_QUERY_LOG=True, SLOW_QUERY_THRESHOLD_MS=0.0, SLOW_QUERY_EXPLAIN=False, SLOW_QUERY_LOG_PATH=path)
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        # A forked worker (say under gunicorn --preload) must not share the parent's file
+        monkeypatch.setattr(slow_queries.os, "getpid", lambda: 424242)
+        db.session.execute(text("SELECT 2"))
+    for handler in slow_queries.logging.getLogger(slow_queries.LOGGER_NAME).handlers:
+        handler.flush()
+
+    assert os.path.exists(process_log_path(path, os.getpid()))
+    assert os.path.exists(process_log_path(path, 424242))
+    assert not os.path.exists(path)
+
+def test_summaries_read_every_process_and_backup(tmp_path):
+    path = str(tmp_path / "slow_queries.log")
+    files = {
+        process_log_path(path, 1): "a",
+        process_log_path(path, 1) + ".1": "b",
+        process_log_path(path, 2): "c",
+        path: "d",  # written before logs were split per process
+    }
+    for file_path, fingerprint in files.items():
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(_entry(fingerprint) + "\n")
+    assert sorted(entry["fingerprint"] for entry in read_entries(path)) == ["a", "b", "c", "d"]
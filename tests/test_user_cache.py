@@ -0,0 +1,40 @@
+import pytest
+
+from app.extensions import db
+from app.models import User
+
+def _get_with_session_id(client, session_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = session_id
+        session["_fresh"] = True
+    return client.get("/wishes/")
+
+def _versioned_id(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).get_id()
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_legacy_session_is_upgraded_during_the_window(app, card, login, cached):
+    user_id, _, _ = card
+    app.config["LEGACY_SESSION_IDS_UNTIL"] = "2999-01-01"
+    if cached:
+        warm = app.test_client()
+        login(warm, user_id)
+        warm.get("/wishes/")
+
+    client = app.test_client()
+    assert _get_with_session_id(client, str(user_id)).status_code == 200
+    with client.session_transaction() as session:
+        assert session["_user_id"] == _versioned_id(app, user_id)
+
+def test_legacy_session_is_refused_after_the_window(app, card):
+    user_id, _, _ = card
+    app.config["LEGACY_SESSION_IDS_UNTIL"] = "2000-01-01"
+    response = _get_with_session_id(app.test_client(), str(user_id))
+    assert response.status_code == 302
+    assert "/login" in response.headers["Location"]
+
+def test_session_from_an_old_password_is_refused(app, card):
+    user_id, _, _ = card
+    response = _get_with_session_id(app.test_client(), f"{user_id}:0123456789ab")
+    assert response.status_code == 302
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from app import write_buffer
+from app.extensions import db
+from app.models import CardContribution, GroupCard
+
+@pytest.fixture
+def app(make_app):
+    return make_app(CONTRIBUTION_WRITE_BUFFER=True, CONTRIBUTION_BUFFER_TIMEOUT=1, RATE_LIMIT_ENABLED=False)
+
+def _post(client, slug):
+    return client.post(f"/cards/share/{slug}", data={"author_name": "Cy", "message": "Happy day!", "reaction": ""})
+
+def test_slow_writer_gets_503_not_500(app, card, monkeypatch):
+    _, _, slug = card
+    release, done = threading.Event(), threading.Event()
+    write = write_buffer.write_contributions
+
+    def slow_write(rows):
+        release.wait(5)
+        write(rows)
+
+    flush = write_buffer.ContributionBuffer._flush
+
+    def flush_and_signal(self, batch):
+        flush(self, batch)
+        done.set()
+
+    monkeypatch.setattr(write_buffer, "write_contributions", slow_write)
+    monkeypatch.setattr(write_buffer.ContributionBuffer, "_flush", flush_and_signal)
+    response = _post(app.test_client(), slug)
+    assert response.status_code == 503
+    assert b"check the card before posting it again" in response.data
+    assert response.headers["Retry-After"] == "1"
+
+    # The late batch still commits, which is why the page says "may"
+    release.set()
+    assert done.wait(5)
+    with app.app_context():
+        assert CardContribution.query.count() == 1
+
+def test_writer_error_gets_503(app, card, monkeypatch):
+    _, _, slug = card
+
+    def failing_write(rows):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(write_buffer, "write_contributions", failing_write)
+    response = _post(app.test_client(), slug)
+    assert response.status_code == 503
+    with app.app_context():
+        assert CardContribution.query.count() == 0
+
+def test_batch_is_one_insert_statement(app, card):
+    statements = []
+    with app.app_context():
+        card_id = GroupCard.query.one().id
+        rows = [dict(card_id=card_id, author_name=f"Guest {i}", message="Hi", reaction=None) for i in range(3)]
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            write_buffer.write_contributions(rows)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        inserts = [s for s in statements if s.startswith("INSERT INTO card_contributions")]
+        assert len(inserts) == 1
+        assert all(c.created_at is not None for c in CardContribution.query)
+        assert db.session.get(GroupCard, card_id).contributions_count == 3